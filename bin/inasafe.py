@@ -19,6 +19,7 @@ Contact : jannes@kartoza.com
 __author__ = 'Jannes Engelbrecht'
 __date__ = '16/04/15'
 
+import json
 import logging
 import os
 import tempfile
@@ -40,6 +41,7 @@ from safe.test.utilities import get_qgis_app
 from safe.utilities.gis import qgis_version, validate_geo_array
 from safe.utilities.keyword_io import KeywordIO
 from safe.utilities.osm_downloader import download
+from safe.utilities.profiling import performance_summary
 
 current_dir = os.path.abspath(
     os.path.realpath(os.getcwd()))
@@ -69,6 +71,7 @@ class CommandLineArguments(object):
         self.impact_function = arguments_['--impact-function']
         self.report_template = arguments_['--report-template']
         # optional arguments
+        self.performance = arguments_.get('--performance', False)
         if not arguments_['--extent'] is None:
             self.extent = arguments_['--extent'].replace(',', '.').split(':')
         else:
@@ -315,6 +318,9 @@ def run_impact_function(command_line_arguments):
     impact_function.run_analysis()
     impact_layer = impact_function.impact
     write_results(command_line_arguments, impact_layer)
+    write_performance(command_line_arguments, impact_function.performance)
+    if getattr(command_line_arguments, 'performance', False):
+        print performance_summary(impact_function.performance)
 
     return impact_layer
 
@@ -394,6 +400,31 @@ def write_results(cli_arguments, impact_layer):
         raise RuntimeError(exception.message)
 
 
+def write_performance(cli_arguments, performance):
+    """Write the time and memory used by the analysis steps to json.
+
+    The file is written next to the impact layer, named after it with a
+    _performance.json suffix.
+
+    .. versionadded:: 3.5
+
+    :param cli_arguments: User inputs.
+    :type cli_arguments: CommandLineArguments
+
+    :param performance: Figures for each step of the analysis as given by
+        ImpactFunction.performance.
+    :type performance: OrderedDict
+
+    :returns: Path of the json file.
+    :rtype: str
+    """
+    abs_path = join_if_relative(cli_arguments.output_file)
+    json_path = os.path.splitext(abs_path)[0] + '_performance.json'
+    with open(json_path, 'w') as json_file:
+        json.dump(performance, json_file, indent=2)
+    return json_path
+
+
 if __name__ == '__main__':
     print "inasafe"
     print ""
@@ -0,0 +1,355 @@
+# coding=utf-8
+"""
+InaSAFE Disaster risk assessment tool developed by AusAid -
+**Headless batch runner for scenario files.**
+
+Runs the scenarios of the batch runner's .txt files without the GUI. The
+scenarios are independent so they are spread over a pool of processes.
+Each scenario runs in a new process with its own QGIS application, so the
+peak memory of a scenario is not that of an earlier one. The main process
+does not load Qt or QGIS before the processes are forked.
+
+Usage:
+    inasafe_batch.py SCENARIO_PATH... --output-dir=DIR [--workers=N]
+
+Options:
+    -o --output-dir=DIR     Directory for the impact layers and the report.
+    -w --workers=N          Number of processes running scenarios. Defaults
+                            to the number of CPUs.
+    -h --help               Print this help text.
+
+Arguments:
+    SCENARIO_PATH           A scenario .txt file or a directory of them, in
+                            the format read by the batch runner dialog.
+
+For each scenario the impact layer and its performance figures are written
+to the output directory, named after the scenario. A text report like the
+batch runner dialog's and a json summary are written along with them.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+.. versionadded:: 3.5
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import logging
+import multiprocessing
+from collections import OrderedDict
+from datetime import datetime
+from StringIO import StringIO
+from ConfigParser import ConfigParser, MissingSectionHeaderError, ParsingError
+
+from docopt import docopt
+
+LOGGER = logging.getLogger('InaSAFE')
+
+# QGIS application of a worker process, see initialise_worker.
+QGIS_APP = None
+
+
+def read_scenarios(filename):
+    """Read the scenarios of a scenario file.
+
+    The file is read like the batch runner dialog does, without importing
+    the dialog, as it loads Qt and QGIS.
+
+    :param filename: Path to the scenario file. If it has no section header
+        the file name is used as the scenario name.
+    :type filename: str
+
+    :returns: The options of each scenario, by scenario name.
+    :rtype: dict
+
+    :raises: ParsingError
+    """
+    filename = os.path.abspath(filename)
+    parser = ConfigParser()
+    try:
+        parser.read(filename)
+    except MissingSectionHeaderError:
+        name = os.path.splitext(os.path.basename(filename))[0]
+        content = '[%s]\n' % name + open(filename).read()
+        parser.readfp(StringIO(content))
+
+    scenarios = {}
+    for section in parser.sections():
+        scenarios[section] = dict(parser.items(section))
+    return scenarios
+
+
+def find_scenarios(paths):
+    """Read the scenarios of files and directories of scenario files.
+
+    :param paths: Paths to .txt scenario files or directories with them.
+    :type paths: list
+
+    :returns: Tuples of the scenario name, its options and the directory
+        its paths are relative to, sorted by file and scenario name. Files
+        which can not be parsed are skipped.
+    :rtype: list
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if os.path.splitext(name)[1] == '.txt')
+        else:
+            files.append(path)
+
+    scenarios = []
+    for scenario_file in files:
+        directory = os.path.dirname(os.path.abspath(scenario_file))
+        try:
+            file_scenarios = read_scenarios(scenario_file)
+        except ParsingError:
+            LOGGER.warning('Skipping unparsable file %s' % scenario_file)
+            continue
+        for name, items in sorted(file_scenarios.items()):
+            scenarios.append((name, items, directory))
+    return scenarios
+
+
+def output_name(index, name):
+    """File name for the outputs of a scenario, without extension.
+
+    :param index: Position of the scenario in the batch, from 1.
+    :type index: int
+
+    :param name: Scenario name.
+    :type name: str
+
+    :rtype: str
+    """
+    return '%s_%s' % (index, re.sub(r'[^\w\-]+', '_', name).strip('_'))
+
+
+def initialise_worker():
+    """Start a QGIS application without GUI and register the impact functions.
+
+    Run once in each worker process of the pool. QGIS_PREFIX_PATH must be
+    set if QGIS is not installed in the default prefix.
+    """
+    global QGIS_APP
+    from qgis.core import QgsApplication
+    from safe.impact_functions import register_impact_functions
+    QGIS_APP = QgsApplication([], False)
+    QGIS_APP.initQgis()
+    register_impact_functions()
+
+
+def load_layer(path):
+    """Load a layer of a scenario.
+
+    :param path: Path to the layer file.
+    :type path: str
+
+    :returns: The layer.
+    :rtype: QgsMapLayer
+
+    :raises: ValueError if the layer is not valid.
+    """
+    from safe.storage.core import read_qgis_layer
+    base_name = os.path.splitext(os.path.basename(path))[0]
+    layer = read_qgis_layer(path, base_name)
+    if not layer.isValid():
+        raise ValueError('Layer %s is not valid.' % path)
+    return layer
+
+
+def run_scenario(task):
+    """Run the analysis of a scenario and write its impact layer.
+
+    :param task: Tuple of the scenario index, name, options, the directory
+        its paths are relative to and the output directory.
+    :type task: tuple
+
+    :returns: The scenario result with its status ('passed' or 'failed'),
+        impact layer path, wall time, performance figures and error.
+    :rtype: OrderedDict
+    """
+    from qgis.core import QgsRectangle, QgsCoordinateReferenceSystem
+    from safe.common.signals import ERROR_MESSAGE_SIGNAL
+    from safe.impact_functions.impact_function_manager import \
+        ImpactFunctionManager
+    from safe.utilities.gis import extent_string_to_array
+    from safe_extras.pydispatch import dispatcher
+
+    index, name, items, scenario_directory, output_directory = task
+    result = OrderedDict([
+        ('index', index),
+        ('name', name),
+        ('status', 'failed'),
+        ('impact_layer', None),
+        ('wall_time', None),
+        ('performance', None),
+        ('error', None)])
+    errors = []
+
+    def record_error(message):
+        """Keep the error messages sent by the impact function."""
+        errors.append(message.to_text())
+
+    start_time = time.time()
+    try:
+        if 'function' not in items:
+            raise ValueError('No impact function given.')
+        impact_function = ImpactFunctionManager().get(items['function'])
+        for key in ['hazard', 'exposure', 'aggregation']:
+            if key in items:
+                path = os.path.normpath(
+                    os.path.join(scenario_directory, items[key]))
+                setattr(impact_function, key, load_layer(path))
+
+        if 'extent' in items:
+            crs = QgsCoordinateReferenceSystem(
+                items.get('extent_crs', 'EPSG:4326'))
+            impact_function.requested_extent_crs = crs
+            impact_function.requested_extent = QgsRectangle(
+                *extent_string_to_array(items['extent']))
+
+        dispatcher.connect(
+            record_error, signal=ERROR_MESSAGE_SIGNAL, sender=impact_function)
+        try:
+            impact_function.run_analysis()
+        finally:
+            dispatcher.disconnect(
+                record_error,
+                signal=ERROR_MESSAGE_SIGNAL,
+                sender=impact_function)
+
+        impact_layer = impact_function.impact
+        if impact_layer is None or errors:
+            raise RuntimeError(
+                '\n'.join(errors) or 'No impact layer was generated.')
+
+        extension = '.tif' if impact_layer.is_raster else '.shp'
+        base_path = os.path.join(output_directory, output_name(index, name))
+        impact_layer.write_to_file(base_path + extension)
+        with open(base_path + '_performance.json', 'w') as json_file:
+            json.dump(impact_function.performance, json_file, indent=2)
+
+        result['status'] = 'passed'
+        result['impact_layer'] = base_path + extension
+        result['performance'] = impact_function.performance
+    except Exception, e:  # pylint: disable=W0703
+        LOGGER.exception('Scenario %s failed.' % name)
+        result['error'] = str(e)
+    result['wall_time'] = round(time.time() - start_time, 3)
+    return result
+
+
+def run_batch(scenarios, output_directory, workers=None):
+    """Run scenarios in a pool of processes.
+
+    :param scenarios: Scenarios as given by find_scenarios.
+    :type scenarios: list
+
+    :param output_directory: Directory for the outputs of the scenarios.
+    :type output_directory: str
+
+    :param workers: Number of processes, the number of CPUs if None.
+    :type workers: int
+
+    :returns: The result of each scenario in the order of the scenarios.
+    :rtype: list
+    """
+    tasks = [
+        (index, name, items, directory, output_directory)
+        for index, (name, items, directory) in enumerate(scenarios, 1)]
+    # One scenario per process, so that the memory of a scenario is freed
+    # and its performance figures are its own.
+    pool = multiprocessing.Pool(
+        processes=workers, initializer=initialise_worker, maxtasksperchild=1)
+    try:
+        results = []
+        for result in pool.imap_unordered(run_scenario, tasks):
+            LOGGER.info('Scenario %s %s in %ss.' % (
+                result['name'], result['status'], result['wall_time']))
+            results.append(result)
+    finally:
+        pool.close()
+        pool.join()
+    return sorted(results, key=lambda item: item['index'])
+
+
+def write_report(results, output_directory):
+    """Write the text report and json summary of a batch.
+
+    The text report follows the one of the batch runner dialog.
+
+    :param results: Results as given by run_batch.
+    :type results: list
+
+    :param output_directory: Directory of the reports.
+    :type output_directory: str
+
+    :returns: Paths to the text report and the json summary.
+    :rtype: (str, str)
+    """
+    pass_count = len(
+        [result for result in results if result['status'] == 'passed'])
+    fail_count = len(results) - pass_count
+    current_time = datetime.now().strftime('%Y%m%d%H%M%S')
+    report_path = os.path.join(
+        output_directory, 'batch-report-' + current_time + '.txt')
+    summary_path = os.path.splitext(report_path)[0] + '.json'
+
+    separator = '-----------------------------\n'
+    with open(report_path, 'w') as report_file:
+        report_file.write('InaSAFE Batch Report File\n')
+        report_file.write(separator)
+        for result in results:
+            report_file.write('%s: %s\n' % (
+                'P' if result['status'] == 'passed' else 'F',
+                result['name']))
+        report_file.write(separator)
+        report_file.write('Total passed: %s\n' % pass_count)
+        report_file.write('Total failed: %s\n' % fail_count)
+        report_file.write('Total tasks: %s\n' % len(results))
+        report_file.write(separator)
+
+    with open(summary_path, 'w') as summary_file:
+        json.dump(OrderedDict([
+            ('passed', pass_count),
+            ('failed', fail_count),
+            ('scenarios', results)]), summary_file, indent=2)
+    return report_path, summary_path
+
+
+def main(arguments=None):
+    """Run the batch from the command line.
+
+    :param arguments: Command line arguments, sys.argv is used if None.
+    :type arguments: list
+
+    :returns: Exit status, 1 if a scenario failed.
+    :rtype: int
+    """
+    arguments = docopt(__doc__, argv=arguments)
+    output_directory = os.path.abspath(arguments['--output-dir'])
+    if not os.path.exists(output_directory):
+        os.makedirs(output_directory)
+    workers = None
+    if arguments['--workers']:
+        workers = int(arguments['--workers'])
+
+    scenarios = find_scenarios(arguments['SCENARIO_PATH'])
+    results = run_batch(scenarios, output_directory, workers)
+    report_path, summary_path = write_report(results, output_directory)
+    print 'Report: %s' % report_path
+    print 'Summary: %s' % summary_path
+    if any(result['status'] != 'passed' for result in results):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
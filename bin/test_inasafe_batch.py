@@ -0,0 +1,61 @@
+# coding=utf-8
+"""Tests for the headless batch runner."""
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from bin.inasafe_batch import find_scenarios, output_name, write_report
+from safe.test.utilities import test_data_path
+
+
+class TestInasafeBatch(unittest.TestCase):
+    """Tests for reading scenarios and writing the batch report."""
+
+    def setUp(self):
+        self.output_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_directory)
+
+    def test_find_scenarios(self):
+        """Scenarios are read from files and directories."""
+        scenario_directory = test_data_path('control', 'scenarios')
+        scenarios = find_scenarios([scenario_directory])
+        names = [name for name, _, _ in scenarios]
+        # The batch report in the directory has no scenario in it
+        self.assertEqual(names, ['Flood Polygon', 'dummy test'])
+        name, items, directory = scenarios[0]
+        self.assertEqual(
+            items['function'], 'FloodEvacuationVectorHazardFunction')
+        self.assertEqual(directory, scenario_directory)
+
+        scenarios = find_scenarios(
+            [os.path.join(scenario_directory, 'scenario1.txt')])
+        self.assertEqual(len(scenarios), 2)
+
+    def test_output_name(self):
+        """Scenario names are made safe for file names."""
+        self.assertEqual(output_name(3, 'Flood Polygon'), '3_Flood_Polygon')
+        self.assertEqual(output_name(1, 'a/b: c'), '1_a_b_c')
+
+    def test_write_report(self):
+        """The report counts passed and failed scenarios."""
+        results = [
+            {'index': 1, 'name': 'one', 'status': 'passed'},
+            {'index': 2, 'name': 'two', 'status': 'failed'}]
+        report_path, summary_path = write_report(
+            results, self.output_directory)
+        report = open(report_path).read()
+        self.assertIn('P: one\n', report)
+        self.assertIn('F: two\n', report)
+        self.assertIn('Total failed: 1\n', report)
+        summary = json.load(open(summary_path))
+        self.assertEqual(summary['passed'], 1)
+        self.assertEqual(len(summary['scenarios']), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
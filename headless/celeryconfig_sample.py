@@ -17,6 +17,18 @@ BROKER_URL = os.environ.get('INASAFE_HEADLESS_BROKER_HOST')
 CELERY_RESULT_BACKEND = BROKER_URL
 
 CELERY_ROUTES = {
+    'headless.tasks.inasafe_wrapper.run_analysis_compute': {
+        'queue': 'inasafe-headless-analysis'
+    },
+    'headless.tasks.inasafe_wrapper.render_report': {
+        'queue': 'inasafe-headless-report'
+    },
+    'headless.tasks.inasafe_wrapper.publish_analysis': {
+        'queue': 'inasafe-headless-publish'
+    },
+    'headless.tasks.inasafe_wrapper.attach_performance': {
+        'queue': 'inasafe-headless-publish'
+    },
     'headless.tasks.inasafe_wrapper': {
         'queue': 'inasafe-headless'
     }
@@ -37,6 +49,11 @@ CELERY_ROUTES = {
 # **NIGHTMARE** to your celery worker. Read about this particular settings
 # here:
 # http://docs.celeryproject.org/en/latest/configuration.html#celeryd-concurrency
+#
+# Only report rendering (the inasafe-headless-report queue) needs this.
+# Analysis compute (the inasafe-headless-analysis queue) doesn't render
+# anything, so its worker can be started with more processes, e.g.
+# celery -A headless.celery_app worker -Q inasafe-headless-analysis -c 8
 CELERYD_CONCURRENCY = 1
 
 CELERY_ALWAYS_EAGER = os.environ.get('CELERY_ALWAYS_EAGER', 'False') == 'True'
@@ -1,17 +1,21 @@
 # coding=utf-8
 import datetime
+import json
 import logging
 import os
 import shutil
 import tempfile
 import urlparse
 
+from celery import chain
+
 from headless.celery_app import app
 from headless.celeryconfig import DEPLOY_OUTPUT_DIR, DEPLOY_OUTPUT_URL
 from headless.tasks.utilities import download_layer, archive_layer, \
     generate_styles, download_file
 from bin.inasafe import CommandLineArguments, get_impact_function_list, \
     run_impact_function, build_report
+from safe.utilities.profiling import performance_summary
 from safe.storage.utilities import safe_to_qgis_layer
 from safe.utilities.keyword_io import KeywordIO
 
@@ -51,10 +55,16 @@ def filter_impact_function(hazard=None, exposure=None):
     return result
 
 
-@app.task(queue='inasafe-headless')
-def run_analysis(hazard, exposure, function, aggregation=None,
-                 generate_report=False):
-    """Run analysis"""
+@app.task(queue='inasafe-headless-analysis')
+def run_analysis_compute(hazard, exposure, function, aggregation=None):
+    """Run the impact function and aggregation of an analysis.
+
+    This task does not render anything, so it can run on a worker with
+    more than one process. See run_analysis for the parameters.
+
+    :return: File path of the impact layer
+    :rtype: str
+    """
     hazard_file = download_layer(hazard)
     exposure_file = download_layer(exposure)
     aggregation_file = None
@@ -85,28 +95,177 @@ def run_analysis(hazard, exposure, function, aggregation=None,
     else:
         new_name = '%s.shp' % tmp
 
-    # if asked to generate report
-    if generate_report:
-        arguments.report_template = ''
-        arguments.output_file = new_name
-        build_report(arguments)
+    performance = read_performance(new_name)
+    if performance:
+        LOGGER.info('Performance of %s on %s with %s:\n%s' % (
+            function, exposure, hazard, performance_summary(performance)))
 
     # generating qml styles file
     qgis_impact_layer = safe_to_qgis_layer(impact_layer)
     generate_styles(impact_layer, qgis_impact_layer)
 
+    return new_name
+
+
+@app.task(queue='inasafe-headless-report')
+def render_report(impact_file):
+    """Build the map and table reports of an analysis.
+
+    Rendering is not thread safe under Xvfb, so this task has its own queue
+    to be consumed by a single process worker.
+
+    :param impact_file: File path of the impact layer
+    :type impact_file: str
+
+    :return: File path of the impact layer
+    :rtype: str
+    """
+    arguments = CommandLineArguments()
+    arguments.report_template = ''
+    arguments.output_file = impact_file
+    build_report(arguments)
+    return impact_file
+
+
+@app.task(queue='inasafe-headless-publish')
+def publish_analysis(impact_file):
+    """Archive the outputs of an analysis and return their url.
+
+    :param impact_file: File path of the impact layer
+    :type impact_file: str
+
+    :return: Url of the archived impact layer
+    :rtype: str
+    """
     # archiving the layer
-    new_name = archive_layer(new_name)
-    # new_name is a file path to archived layer
+    archive_name = archive_layer(impact_file)
+    # archive_name is a file path to archived layer
     # we need to return the url
-    new_basename = os.path.basename(new_name)
+    date_folder = os.path.basename(os.path.dirname(archive_name))
+    archive_basename = os.path.basename(archive_name)
     output_url = urlparse.urljoin(
         DEPLOY_OUTPUT_URL,
-        '%s/%s' % (date_folder, new_basename)
+        '%s/%s' % (date_folder, archive_basename)
     )
     return output_url
 
 
+@app.task(queue='inasafe-headless-publish')
+def attach_performance(output_url):
+    """Add the time and memory used by an analysis to its url.
+
+    :param output_url: Url of the archived impact layer
+    :type output_url: str
+
+    :return: The url and the performance figures
+    :rtype: dict
+    """
+    # The archive is published from DEPLOY_OUTPUT_DIR/date/name.zip
+    relative_path = output_url[len(DEPLOY_OUTPUT_URL):].lstrip('/')
+    impact_file = os.path.join(DEPLOY_OUTPUT_DIR, relative_path)
+    return {
+        'url': output_url,
+        'performance': read_performance(impact_file)
+    }
+
+
+def analysis_workflow(
+        hazard, exposure, function, aggregation=None, generate_report=False,
+        include_performance=False):
+    """Build the chain of tasks for an analysis.
+
+    Compute, report rendering and publishing run on separate queues, so
+    compute workers can scale with cores while a single worker renders.
+    The result of the chain is the url of the archived impact layer, or a
+    dict with the url and the performance figures if include_performance
+    is set.
+
+    The steps pass file paths of the impact layer to each other, so the
+    workers of these queues must share DEPLOY_OUTPUT_DIR, e.g. on the same
+    host or on a network file system.
+
+    See run_analysis for the parameters.
+
+    :return: Chain of run_analysis_compute, render_report (if asked for),
+        publish_analysis and attach_performance (if asked for)
+    :rtype: celery.canvas.chain
+    """
+    steps = [run_analysis_compute.s(
+        hazard, exposure, function, aggregation=aggregation)]
+    if generate_report:
+        steps.append(render_report.s())
+    steps.append(publish_analysis.s())
+    if include_performance:
+        steps.append(attach_performance.s())
+    return chain(*steps)
+
+
+def read_performance(impact_file):
+    """Read the time and memory used by the steps of an analysis.
+
+    The figures are written next to the impact layer by the command line
+    runner and archived with it.
+
+    :param impact_file: File path of the impact layer
+    :type impact_file: str
+
+    :return: Figures for each step of the analysis, or None if they were
+        not recorded.
+    :rtype: dict
+    """
+    json_path = os.path.splitext(impact_file)[0] + '_performance.json'
+    try:
+        with open(json_path) as json_file:
+            return json.load(json_file)
+    except (IOError, ValueError):
+        return None
+
+
+@app.task(queue='inasafe-headless')
+def run_analysis(hazard, exposure, function, aggregation=None,
+                 generate_report=False, include_performance=False):
+    """Run analysis
+
+    Starts the tasks of analysis_workflow and returns without waiting for
+    them, so no worker is held while the analysis runs. The url of the
+    archived impact layer is the result of the last task, which clients get
+    with app.AsyncResult(task_id).get().
+
+    :param hazard: URL or filepath of hazard
+    :type hazard: str
+
+    :param exposure: URL or filepath of exposure
+    :type exposure: str
+
+    :param function: Impact Function ID
+    :type function: str
+
+    :param aggregation: URL or filepath of aggregation
+    :type aggregation: str
+
+    :param generate_report: Whether to render pdf reports
+    :type generate_report: bool
+
+    :param include_performance: Whether the result is a dict with the url
+        and the time and memory used by each step of the analysis
+    :type include_performance: bool
+
+    :return: Id of the result of the analysis. When tasks run eagerly, e.g.
+        in tests, the analysis is over and its result is returned instead.
+    :rtype: str, dict
+    """
+    workflow = analysis_workflow(
+        hazard,
+        exposure,
+        function,
+        aggregation=aggregation,
+        generate_report=generate_report,
+        include_performance=include_performance)
+    if app.conf.CELERY_ALWAYS_EAGER:
+        return workflow.apply().get()
+    return workflow.apply_async().id
+
+
 @app.task(queue='inasafe-headless')
 def read_keywords_iso_metadata(metadata_url, keyword=None):
     """Read xml metadata of a layer"""
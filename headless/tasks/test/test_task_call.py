@@ -9,7 +9,7 @@ import urlparse
 from headless.celery_app import app
 from headless.celeryconfig import DEPLOY_OUTPUT_DIR, DEPLOY_OUTPUT_URL
 from headless.tasks.inasafe_wrapper import filter_impact_function, \
-    run_analysis, read_keywords_iso_metadata
+    run_analysis, read_keywords_iso_metadata, analysis_workflow
 from headless.tasks.celery_test_setup import \
     update_celery_configuration
 from headless.tasks.utilities import archive_layer
@@ -93,6 +93,9 @@ class TestTaskCall(unittest.TestCase):
                 generate_report=True)
 
         url_name = celery_result.get()
+        if not app.conf.CELERY_ALWAYS_EAGER:
+            # run_analysis returns the id of the result of the analysis
+            url_name = app.AsyncResult(url_name).get()
 
         self.assertTrue(url_name)
 
@@ -114,6 +117,28 @@ class TestTaskCall(unittest.TestCase):
         folder_name, _ = os.path.split(absolute_name)
         shutil.rmtree(folder_name)
 
+    def test_analysis_workflow(self):
+        workflow = analysis_workflow(
+                self.hazard_temp,
+                self.exposure_temp,
+                'FloodEvacuationRasterHazardFunction')
+        task_names = [task.task for task in workflow.tasks]
+        self.assertEqual(task_names, [
+            'headless.tasks.inasafe_wrapper.run_analysis_compute',
+            'headless.tasks.inasafe_wrapper.publish_analysis'])
+
+        url_name = workflow.apply_async().get()
+
+        relative_name = url_name.replace(DEPLOY_OUTPUT_URL, '')
+        absolute_name = os.path.join(DEPLOY_OUTPUT_DIR, relative_name)
+        self.assertTrue(os.path.exists(absolute_name), absolute_name)
+        # no report was asked for
+        basename, _ = os.path.splitext(absolute_name)
+        self.assertFalse(os.path.exists(basename + '.pdf'))
+
+        folder_name, _ = os.path.split(absolute_name)
+        shutil.rmtree(folder_name)
+
     def test_read_keywords(self):
         result = read_keywords_iso_metadata.delay(self.keywords_file)
         expected = {
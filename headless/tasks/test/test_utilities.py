@@ -0,0 +1,78 @@
+# coding=utf-8
+import os
+import shutil
+import tempfile
+import unittest
+from zipfile import ZipFile
+
+from headless.tasks.utilities import download_layer, evict_layer_cache, \
+    layer_cache_key, CACHE_MARKER
+
+
+class TestLayerCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.old_cache_dir = os.environ.get('INASAFE_HEADLESS_CACHE_DIR')
+        os.environ['INASAFE_HEADLESS_CACHE_DIR'] = self.cache_dir
+
+        self.inasafe_work_dir = os.environ['InaSAFEQGIS']
+        layer_dir = os.path.join(
+            self.inasafe_work_dir, 'safe/test/data/hazard')
+        self.archive = tempfile.mktemp(suffix='.zip')
+        with ZipFile(self.archive, 'w') as zipf:
+            for extension in ['.asc', '.prj', '.xml']:
+                name = 'continuous_flood_20_20' + extension
+                zipf.write(os.path.join(layer_dir, name), arcname=name)
+
+    def tearDown(self):
+        if self.old_cache_dir is None:
+            del os.environ['INASAFE_HEADLESS_CACHE_DIR']
+        else:
+            os.environ['INASAFE_HEADLESS_CACHE_DIR'] = self.old_cache_dir
+        shutil.rmtree(self.cache_dir)
+        os.remove(self.archive)
+
+    def test_download_layer_cached(self):
+        layer_file = download_layer(self.archive)
+        self.assertTrue(os.path.exists(layer_file))
+        self.assertEqual(
+            os.path.basename(layer_file), 'continuous_flood_20_20.asc')
+        self.assertTrue(layer_file.startswith(self.cache_dir))
+
+        # Second time we get the same extracted layer
+        self.assertEqual(download_layer(self.archive), layer_file)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+        # Updating the archive changes the key
+        key = layer_cache_key(self.archive)
+        os.utime(self.archive, (0, 0))
+        self.assertNotEqual(layer_cache_key(self.archive), key)
+
+    def test_evict_layer_cache(self):
+        layer_file = download_layer(self.archive)
+        cache_path = os.path.dirname(layer_file)
+        self.assertTrue(os.path.exists(
+            os.path.join(cache_path, CACHE_MARKER)))
+
+        evict_layer_cache(max_size=0, keep=cache_path, grace=0)
+        self.assertTrue(os.path.exists(cache_path))
+
+        # Just used, another task may be reading it
+        evict_layer_cache(max_size=0)
+        self.assertTrue(os.path.exists(cache_path))
+
+        evict_layer_cache(max_size=0, grace=0)
+        self.assertFalse(os.path.exists(cache_path))
+
+    def test_download_layer_corrupt(self):
+        with open(self.archive, 'r+b') as archive:
+            archive.truncate(100)
+        with self.assertRaises(Exception):
+            download_layer(self.archive)
+        # No partial extraction is left in the cache
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 # coding=utf-8
+import hashlib
 import os
 import tempfile
+import time
 import urlparse
 from zipfile import ZipFile
 
@@ -13,18 +15,27 @@ from safe.utilities.styling import set_vector_categorized_style, \
 __author__ = 'Rizky Maulana Nugraha <lana.pcfre@gmail.com>'
 __date__ = '1/27/16'
 
+# Assign User-Agent to emulate browser
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; U; Linux i686) '
+                  'Gecko/20071127 Firefox/2.0.0.11'
+}
+
+# Written in a cached layer directory once it is completely extracted
+CACHE_MARKER = '.inasafe-cache-complete'
+
+DEFAULT_CACHE_SIZE = 20 * 1024 ** 3
+# Cached layers used within this many seconds may be read by a running
+# task, so they are not evicted. Must be longer than any analysis.
+DEFAULT_CACHE_GRACE = 6 * 3600
+
 
 def download_file(url):
     parsed_uri = urlparse.urlparse(url)
     if parsed_uri.scheme == 'http' or parsed_uri.scheme == 'https':
         tmpfile = tempfile.mktemp()
         # NOTE the stream=True parameter
-        # Assign User-Agent to emulate browser
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (X11; U; Linux i686) '
-                          'Gecko/20071127 Firefox/2.0.0.11'
-        }
-        r = requests.get(url, headers=headers, stream=True)
+        r = requests.get(url, headers=HEADERS, stream=True)
         with open(tmpfile, 'wb') as f:
             for chunk in r.iter_content(chunk_size=1024):
                 if chunk:
@@ -36,35 +47,206 @@ def download_file(url):
         return tmpfile
 
 
+def layer_cache_dir():
+    """Get the directory where downloaded layers are cached.
+
+    It can be set with INASAFE_HEADLESS_CACHE_DIR. Defaults to a
+    inasafe-headless-cache directory in the system temp dir.
+
+    :return: The cache directory
+    :rtype: str
+    """
+    cache_dir = os.environ.get(
+        'INASAFE_HEADLESS_CACHE_DIR',
+        os.path.join(tempfile.gettempdir(), 'inasafe-headless-cache'))
+    if not os.path.exists(cache_dir):
+        try:
+            os.makedirs(cache_dir)
+        except OSError:
+            # Another worker created it in the meantime
+            pass
+    return cache_dir
+
+
+def layer_cache_key(url):
+    """Compute the cache key of the archive at url.
+
+    Remote archives are identified by url, ETag (or Last-Modified) and
+    size, as given by a HEAD request. Local archives are identified by
+    their real path, size and modification time, which avoids reading a
+    multi-GB file just to hash it.
+
+    :param url: The url or file path of the zip file
+    :type url: str
+
+    :return: The key, or None if the archive can not be identified
+    :rtype: str, None
+    """
+    parsed_uri = urlparse.urlparse(url)
+    if parsed_uri.scheme == 'http' or parsed_uri.scheme == 'https':
+        try:
+            r = requests.head(url, headers=HEADERS, allow_redirects=True)
+        except requests.RequestException:
+            return None
+        version = r.headers.get('ETag') or r.headers.get('Last-Modified')
+        size = r.headers.get('Content-Length')
+        if not r.ok or not version or not size:
+            # We can't tell if the archive changed, so don't cache it
+            return None
+        identity = '%s|%s|%s' % (url, version, size)
+    elif parsed_uri.scheme == 'file' or not parsed_uri.scheme:
+        path = os.path.realpath(parsed_uri.path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        identity = '%s|%s|%s' % (path, stat.st_size, stat.st_mtime)
+    else:
+        return None
+    return hashlib.sha1(identity).hexdigest()
+
+
+def find_layer_file(dir_name, name_list):
+    """Find the layer file amongst the extracted files of an archive.
+
+    :param dir_name: The directory the archive was extracted to
+    :type dir_name: str
+
+    :param name_list: Names of the files in the archive
+    :type name_list: list(str)
+
+    :return: The file path of the layer or None if there is no layer
+    :rtype: str, None
+    """
+    layer_extensions = ['.shp', '.tif', '.asc']
+    for name in name_list:
+        for ext in layer_extensions:
+            if name.endswith(ext):
+                return os.path.join(dir_name, name)
+    return None
+
+
+def _directory_size(path):
+    """Total size in bytes of the files in a directory."""
+    size = 0
+    for root, dirs, files in os.walk(path):
+        for f in files:
+            size += os.path.getsize(os.path.join(root, f))
+    return size
+
+
+def evict_layer_cache(max_size=None, keep=None, grace=None):
+    """Remove the least recently used cached layers above a size limit.
+
+    Tasks running concurrently may read any cached layer they got from
+    download_layer. Layers used within the grace period are therefore
+    never removed, even if the cache stays above the size limit.
+
+    :param max_size: Size limit in bytes. Defaults to
+        INASAFE_HEADLESS_CACHE_SIZE or 20 GB.
+    :type max_size: int
+
+    :param keep: Path of a cached layer which must not be removed, even if
+        the cache is still too big without it.
+    :type keep: str
+
+    :param grace: Seconds since its last use before a cached layer may be
+        removed. Defaults to INASAFE_HEADLESS_CACHE_GRACE or 6 hours.
+    :type grace: int
+    """
+    if max_size is None:
+        max_size = int(os.environ.get(
+            'INASAFE_HEADLESS_CACHE_SIZE', DEFAULT_CACHE_SIZE))
+    if grace is None:
+        grace = int(os.environ.get(
+            'INASAFE_HEADLESS_CACHE_GRACE', DEFAULT_CACHE_GRACE))
+    used_since = time.time() - grace
+    cache_dir = layer_cache_dir()
+    entries = []
+    total_size = 0
+    for key in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, key)
+        if not os.path.exists(os.path.join(path, CACHE_MARKER)):
+            # Partially extracted or not one of ours
+            continue
+        size = _directory_size(path)
+        total_size += size
+        entries.append((os.path.getmtime(path), size, path))
+
+    # Oldest access time first
+    entries.sort()
+    for last_used, size, path in entries:
+        if total_size <= max_size or last_used > used_since:
+            break
+        if path == keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total_size -= size
+
+
 def download_layer(url):
     """Download a layer specified by url to a directory
 
+    Extracted layers are cached on disk by layer_cache_key, so repeated
+    analyses using the same archive skip the download and extraction.
+    Files in the returned directory are shared between tasks and must not
+    be modified.
+
     :param url: The url or file path of the zip file
     :type url: str
 
     :return: The file path of extracted layer
     :rtype: str
     """
-    # download archive file
-    filename = download_file(url)
-    base_name, _ = os.path.splitext(filename)
-    dir_name = os.path.dirname(filename)
-    layer_base_name = None
-    with ZipFile(filename) as zipf:
-        name_list = zipf.namelist()
-        zipf.extractall(path=dir_name)
-        layer_extensions = ['.shp', '.tif', '.asc']
-        layer_ext = None
-        for name in name_list:
-            for ext in layer_extensions:
-                if name.endswith(ext):
-                    layer_ext = ext
-                    layer_base_name = name
-                    break
-            if layer_ext:
-                break
-
-    return os.path.join(dir_name, layer_base_name)
+    key = layer_cache_key(url)
+    if key:
+        cache_path = os.path.join(layer_cache_dir(), key)
+        marker = os.path.join(cache_path, CACHE_MARKER)
+        if os.path.exists(marker):
+            # Mark as recently used for eviction
+            os.utime(cache_path, None)
+            with open(marker) as f:
+                name_list = f.read().splitlines()
+            return find_layer_file(cache_path, name_list)
+
+    parsed_uri = urlparse.urlparse(url)
+    is_local = parsed_uri.scheme == 'file' or not parsed_uri.scheme
+    if key and is_local:
+        # No need to copy a local archive we only extract from
+        filename = parsed_uri.path
+    else:
+        # download archive file
+        filename = download_file(url)
+
+    if key:
+        dir_name = tempfile.mkdtemp(dir=layer_cache_dir())
+    else:
+        dir_name = os.path.dirname(filename)
+    try:
+        with ZipFile(filename) as zipf:
+            name_list = zipf.namelist()
+            zipf.extractall(path=dir_name)
+    except Exception:
+        # Eviction skips directories without a marker, so a partial
+        # extraction would stay in the cache forever.
+        if key:
+            shutil.rmtree(dir_name, ignore_errors=True)
+        raise
+
+    if not key:
+        return find_layer_file(dir_name, name_list)
+
+    if not is_local:
+        os.remove(filename)
+    with open(os.path.join(dir_name, CACHE_MARKER), 'w') as f:
+        f.write('\n'.join(name_list))
+    try:
+        os.rename(dir_name, cache_path)
+    except OSError:
+        # Another task cached the same archive first, use theirs
+        shutil.rmtree(dir_name, ignore_errors=True)
+    evict_layer_cache(keep=cache_path)
+    return find_layer_file(cache_path, name_list)
 
 
 def archive_layer(layer_name):
@@ -0,0 +1,352 @@
+# coding=utf-8
+"""
+InaSAFE Disaster risk assessment tool developed by AusAid and World Bank
+- **In-memory population raster cache for the realtime worker.**
+
+The realtime earthquake worker clips the same national population raster
+for every shake event and every locale. Rather than shelling out to gdalwarp
+each time, the worker opens the raster once at start up and keeps the tiles
+it has read in memory. Window reads for an event's bounding box are then
+served from those tiles.
+
+Contact : ole.moller.nielsen@gmail.com
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+import os
+import logging
+from collections import OrderedDict
+
+import numpy
+from osgeo import gdal, gdal_array, osr
+
+from realtime.utilities import realtime_logger_name
+from realtime.exceptions import FileNotFoundError
+
+LOGGER = logging.getLogger(realtime_logger_name())
+
+# Default nodata value used by SAFE when a raster does not define one.
+DEFAULT_NODATA = -9999
+
+# Caches created by preload_exposure_cache, keyed on the real raster path.
+_EXPOSURE_CACHES = {}
+
+
+class ExposureRasterCache(object):
+    """Tiled, least recently used, in-memory copy of a raster layer.
+
+    The raster is split into square tiles of ``tile_size`` pixels. Tiles are
+    read on demand (or all at once with :func:`preload`) and at most
+    ``max_tiles`` of them are kept in memory.
+    """
+
+    def __init__(self, raster_path, tile_size=512, max_tiles=256):
+        """Constructor.
+
+        :param raster_path: Path to a single band raster in EPSG:4326.
+        :type raster_path: str
+
+        :param tile_size: Width and height of a tile in pixels.
+        :type tile_size: int
+
+        :param max_tiles: Maximum number of tiles kept in memory.
+        :type max_tiles: int
+
+        :raises: FileNotFoundError, IOError
+        """
+        if not os.path.exists(raster_path):
+            raise FileNotFoundError(
+                'Population raster %s does not exist.' % raster_path)
+
+        self.raster_path = raster_path
+        self.tile_size = int(tile_size)
+        self.max_tiles = int(max_tiles)
+
+        self._dataset = gdal.Open(raster_path, gdal.GA_ReadOnly)
+        if self._dataset is None:
+            raise IOError('Could not open raster %s.' % raster_path)
+        self._band = self._dataset.GetRasterBand(1)
+
+        self.width = self._dataset.RasterXSize
+        self.height = self._dataset.RasterYSize
+        self.geotransform = self._dataset.GetGeoTransform()
+        self.projection = self._dataset.GetProjection()
+        self.nodata = self._band.GetNoDataValue()
+        # Tiles keep the data type of the raster, windows are read as
+        # floating point to hold NaN for no data.
+        self.data_type = self._band.DataType
+        self.dtype = numpy.dtype(gdal_array.GDALTypeCodeToNumericTypeCode(
+            self._band.DataType))
+        self.window_dtype = numpy.promote_types(self.dtype, numpy.float32)
+
+        self._tiles = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cell_size(self):
+        """Native cell size of the raster in (x, y) as positive numbers.
+
+        :rtype: tuple
+        """
+        return abs(self.geotransform[1]), abs(self.geotransform[5])
+
+    def is_geographic(self):
+        """Check whether the raster is in EPSG:4326.
+
+        :returns: True if the raster can be clipped with geographic extents.
+        :rtype: bool
+        """
+        # Rotated rasters can not be served by axis aligned window reads.
+        if self.geotransform[2] != 0 or self.geotransform[4] != 0:
+            return False
+        spatial_reference = osr.SpatialReference()
+        if spatial_reference.ImportFromWkt(self.projection) != 0:
+            return False
+        wgs84 = osr.SpatialReference()
+        wgs84.ImportFromEPSG(4326)
+        return bool(spatial_reference.IsSame(wgs84))
+
+    def preload(self):
+        """Read tiles into memory until the cache is full.
+
+        Tiles are read row by row from the top left corner of the raster.
+        For a national population raster this is normally all of it.
+        """
+        tile_rows = (self.height + self.tile_size - 1) // self.tile_size
+        tile_columns = (self.width + self.tile_size - 1) // self.tile_size
+        loaded = 0
+        for tile_row in range(tile_rows):
+            for tile_column in range(tile_columns):
+                if loaded >= self.max_tiles:
+                    LOGGER.info(
+                        'Exposure cache full after %s tiles.' % loaded)
+                    return
+                self._tile(tile_row, tile_column)
+                loaded += 1
+        LOGGER.info(
+            'Preloaded %s tiles of %s into memory.' % (
+                loaded, self.raster_path))
+
+    def _tile(self, tile_row, tile_column):
+        """Get a tile, reading it from the raster if it is not cached.
+
+        :param tile_row: Row index of the tile.
+        :type tile_row: int
+
+        :param tile_column: Column index of the tile.
+        :type tile_column: int
+
+        :returns: The tile data as read from the raster, in its data type.
+        :rtype: numpy.ndarray
+        """
+        key = (tile_row, tile_column)
+        try:
+            tile = self._tiles.pop(key)
+            self.hits += 1
+        except KeyError:
+            self.misses += 1
+            x_offset = tile_column * self.tile_size
+            y_offset = tile_row * self.tile_size
+            x_size = min(self.tile_size, self.width - x_offset)
+            y_size = min(self.tile_size, self.height - y_offset)
+            tile = self._band.ReadAsArray(x_offset, y_offset, x_size, y_size)
+            while len(self._tiles) >= self.max_tiles:
+                self._tiles.popitem(last=False)
+        # Most recently used tiles live at the end of the ordered dict.
+        self._tiles[key] = tile
+        return tile
+
+    def read_window(self, x_offset, y_offset, x_size, y_size):
+        """Read a window of pixels from the cached tiles.
+
+        Pixels of the window that fall outside the raster or have no data
+        are set to NaN.
+
+        :param x_offset: Column of the top left pixel of the window.
+        :type x_offset: int
+
+        :param y_offset: Row of the top left pixel of the window.
+        :type y_offset: int
+
+        :param x_size: Number of columns in the window.
+        :type x_size: int
+
+        :param y_size: Number of rows in the window.
+        :type y_size: int
+
+        :returns: Window of data of shape (y_size, x_size). It is in the
+            data type of the raster if that is floating point, otherwise in
+            the smallest floating point type holding its values.
+        :rtype: numpy.ndarray
+        """
+        window = numpy.empty((y_size, x_size), dtype=self.window_dtype)
+        window.fill(numpy.nan)
+
+        column_start = max(x_offset, 0)
+        column_end = min(x_offset + x_size, self.width)
+        row_start = max(y_offset, 0)
+        row_end = min(y_offset + y_size, self.height)
+        if column_start >= column_end or row_start >= row_end:
+            return window
+
+        size = self.tile_size
+        for tile_row in range(row_start // size, (row_end - 1) // size + 1):
+            for tile_column in range(
+                    column_start // size, (column_end - 1) // size + 1):
+                tile = self._tile(tile_row, tile_column)
+                tile_top = tile_row * size
+                tile_left = tile_column * size
+                top = max(row_start, tile_top)
+                bottom = min(row_end, tile_top + tile.shape[0])
+                left = max(column_start, tile_left)
+                right = min(column_end, tile_left + tile.shape[1])
+                window[
+                    top - y_offset:bottom - y_offset,
+                    left - x_offset:right - x_offset] = tile[
+                        top - tile_top:bottom - tile_top,
+                        left - tile_left:right - tile_left]
+        if self.nodata is not None:
+            window[window == self.nodata] = numpy.nan
+        return window
+
+    def clip(self, extent, cell_size=None):
+        """Clip and resample the raster to an extent.
+
+        Resampling uses nearest neighbour, like ``gdalwarp -r near``.
+
+        :param extent: Extent in the form [xmin, ymin, xmax, ymax] in
+            EPSG:4326.
+        :type extent: list
+
+        :param cell_size: Output cell size. If None, the native cell size
+            of the raster will be used.
+        :type cell_size: float
+
+        :returns: A tuple of the clipped data (NaN where there is no data)
+            and the geotransform of the clipped data.
+        :rtype: (numpy.ndarray, tuple)
+        """
+        x_min, y_min, x_max, y_max = extent
+        if cell_size is None:
+            cell_x, cell_y = self.cell_size
+        else:
+            cell_x = cell_y = cell_size
+        columns = max(int(round((x_max - x_min) / cell_x)), 1)
+        rows = max(int(round((y_max - y_min) / cell_y)), 1)
+
+        origin_x, pixel_x, _, origin_y, _, pixel_y = self.geotransform
+        # Source pixel for the centre of every output pixel.
+        centres_x = x_min + (numpy.arange(columns) + 0.5) * cell_x
+        centres_y = y_max - (numpy.arange(rows) + 0.5) * cell_y
+        source_columns = numpy.floor(
+            (centres_x - origin_x) / pixel_x).astype(numpy.int64)
+        source_rows = numpy.floor(
+            (centres_y - origin_y) / pixel_y).astype(numpy.int64)
+
+        x_offset = int(source_columns.min())
+        y_offset = int(source_rows.min())
+        window = self.read_window(
+            x_offset,
+            y_offset,
+            int(source_columns.max()) - x_offset + 1,
+            int(source_rows.max()) - y_offset + 1)
+        data = window[numpy.ix_(source_rows - y_offset,
+                                source_columns - x_offset)]
+
+        geotransform = (x_min, cell_x, 0.0, y_max, 0.0, -cell_y)
+        return data, geotransform
+
+    def clip_to_file(self, extent, output_path, cell_size=None):
+        """Clip the raster to an extent and write it as a GeoTIFF.
+
+        The output mirrors what :func:`safe.utilities.clipper.clip_layer`
+        produces: a GeoTIFF in EPSG:4326 with the data type of the raster.
+
+        :param extent: Extent in the form [xmin, ymin, xmax, ymax] in
+            EPSG:4326.
+        :type extent: list
+
+        :param output_path: Path of the GeoTIFF to write.
+        :type output_path: str
+
+        :param cell_size: Output cell size. If None, the native cell size
+            of the raster will be used.
+        :type cell_size: float
+
+        :returns: The output path.
+        :rtype: str
+        """
+        data, geotransform = self.clip(extent, cell_size)
+        nodata = self.nodata
+        if nodata is None:
+            nodata = DEFAULT_NODATA
+            if numpy.issubdtype(self.dtype, numpy.integer):
+                limits = numpy.iinfo(self.dtype)
+                if not limits.min <= nodata <= limits.max:
+                    nodata = limits.max
+        data[numpy.isnan(data)] = nodata
+
+        driver = gdal.GetDriverByName('GTiff')
+        output = driver.Create(
+            output_path,
+            data.shape[1],
+            data.shape[0],
+            1,
+            self.data_type)
+        output.SetProjection(self.projection)
+        output.SetGeoTransform(geotransform)
+        band = output.GetRasterBand(1)
+        band.SetNoDataValue(nodata)
+        band.WriteArray(data.astype(self.dtype))
+        output.FlushCache()
+        del output
+        return output_path
+
+
+def preload_exposure_cache(raster_path, tile_size=512, max_tiles=256):
+    """Create a cache for a raster, preload it and register it.
+
+    Intended to be called once when the worker process starts. Subsequent
+    calls for the same raster return the existing cache.
+
+    :param raster_path: Path to the population raster.
+    :type raster_path: str
+
+    :param tile_size: Width and height of a tile in pixels.
+    :type tile_size: int
+
+    :param max_tiles: Maximum number of tiles kept in memory.
+    :type max_tiles: int
+
+    :returns: The registered cache.
+    :rtype: ExposureRasterCache
+    """
+    key = os.path.realpath(raster_path)
+    if key not in _EXPOSURE_CACHES:
+        cache = ExposureRasterCache(
+            raster_path, tile_size=tile_size, max_tiles=max_tiles)
+        cache.preload()
+        _EXPOSURE_CACHES[key] = cache
+    return _EXPOSURE_CACHES[key]
+
+
+def exposure_cache(raster_path):
+    """Get the cache registered for a raster, if any.
+
+    :param raster_path: Path to the population raster.
+    :type raster_path: str
+
+    :returns: The cache or None if the raster was not preloaded.
+    :rtype: ExposureRasterCache, None
+    """
+    return _EXPOSURE_CACHES.get(os.path.realpath(raster_path))
+
+
+def clear_exposure_caches():
+    """Drop all registered caches."""
+    _EXPOSURE_CACHES.clear()
@@ -29,7 +29,8 @@ from realtime.earthquake.shake_event import ShakeEvent
 from realtime.earthquake.push_shake import push_shake_event_to_rest
 from realtime.earthquake.shake_data import ShakeData
 from realtime.exceptions import EmptyShakeDirectoryError
-from realtime.utilities import data_dir, is_event_id, realtime_logger_name
+from realtime.utilities import (
+    is_event_id, population_path, realtime_logger_name)
 
 # Initialised in realtime.__init__
 LOGGER = logging.getLogger(realtime_logger_name())
@@ -48,10 +49,7 @@ def process_event(working_dir=None, event_id=None, locale='en'):
     :return: Return True if succeeded
     :rtype: bool
     """
-    population_path = os.path.join(
-        data_dir(),
-        'exposure',
-        'population.tif')
+    population_raster_path = population_path()
 
     # Use cached data where available
     # Whether we should always regenerate the products
@@ -76,7 +74,7 @@ def process_event(working_dir=None, event_id=None, locale='en'):
                 event_id=event_id,
                 force_flag=force_flag,
                 locale=locale,
-                population_path=population_path,
+                population_path=population_raster_path,
                 working_dir=working_dir)
         except (BadZipfile, URLError):
             # retry with force flag true
@@ -84,7 +82,7 @@ def process_event(working_dir=None, event_id=None, locale='en'):
                 event_id=event_id,
                 force_flag=True,
                 locale=locale,
-                population_path=population_path,
+                population_path=population_raster_path,
                 working_dir=working_dir)
         except EmptyShakeDirectoryError as ex:
             LOGGER.info(ex)
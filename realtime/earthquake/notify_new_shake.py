@@ -3,16 +3,20 @@
 
 This will make new shakemap processed after a user is pushing a shakemap.
 """
+import importlib
+import json
 import logging
 import os
 import re
+import subprocess
 import sys
+import threading
+from multiprocessing.pool import ThreadPool
 
 import datetime
 import pyinotify
 from tzlocal import get_localzone
 
-from realtime.earthquake.make_map import process_event
 from realtime.earthquake.push_shake import notify_realtime_rest
 from realtime.utilities import realtime_logger_name
 
@@ -59,6 +63,207 @@ class ShakemapPushHandler(pyinotify.ProcessEvent):
         self.process_IN_CREATE(event)
 
 
+def _import_function(function_path):
+    """Import a module level function from its dotted path.
+
+    :param function_path: Path of the function, e.g.
+        realtime.earthquake.make_map.process_event
+    :type function_path: str
+
+    :rtype: callable
+    """
+    module_name, function_name = function_path.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def _process_shakemap(function_path, shake_id, kwargs):
+    """Process a shakemap in the current process.
+
+    This is run by the process started by _run_task.
+
+    :returns: Whether the processing succeeded.
+    :rtype: bool
+    """
+    try:
+        function = _import_function(function_path)
+        return bool(function(event_id=shake_id, **kwargs))
+    except Exception as e:  # pylint: disable=W0703
+        LOGGER.info('Process event %s failed' % shake_id)
+        LOGGER.exception(e)
+        return False
+
+
+def _run_task(function_path, shake_id, kwargs):
+    """Process a shakemap in a new Python process.
+
+    The process is started afresh rather than forked, so it builds its own
+    QGIS application. Qt and QGIS state can not be shared with a forked
+    child.
+
+    :returns: Whether the processing succeeded.
+    :rtype: bool
+    """
+    environment = dict(os.environ)
+    environment['PYTHONPATH'] = os.pathsep.join(sys.path)
+    command = [
+        sys.executable, '-m', 'realtime.earthquake.notify_new_shake',
+        '--process', function_path, shake_id, json.dumps(kwargs)]
+    try:
+        return subprocess.call(command, env=environment) == 0
+    except OSError as e:
+        LOGGER.info('Process event %s could not be started' % shake_id)
+        LOGGER.exception(e)
+        return False
+
+
+class ShakemapProcessingQueue(object):
+    """Process pushed shakemaps in worker processes.
+
+    Each processing runs in its own new Python process. Updates of a
+    shakemap arriving within the debounce delay of each other
+    are processed once, with the latest grid. An update arriving while the
+    shakemap is processed schedules it again once the processing is over.
+    Different shakemaps are processed concurrently.
+
+    A failing processing is retried after a delay doubling at each attempt,
+    up to max_retry_delay, and given up after max_attempts.
+    """
+
+    def __init__(
+            self, function_path, kwargs=None, workers=2, debounce=5.0,
+            max_attempts=5, retry_delay=10.0, max_retry_delay=300.0):
+        """Constructor.
+
+        :param function_path: Dotted path of the module level function
+            processing a shakemap, called with event_id=shake_id and kwargs.
+            It returns True if it succeeded.
+        :type function_path: str
+
+        :param kwargs: Other keyword arguments of the function. They must
+            be serialisable to json.
+        :type kwargs: dict
+
+        :param workers: Number of shakemaps processed at once.
+        :type workers: int
+
+        :param debounce: Seconds to wait for further updates of a shakemap
+            before processing it.
+        :type debounce: float
+
+        :param max_attempts: Number of times a shakemap is processed before
+            giving up.
+        :type max_attempts: int
+
+        :param retry_delay: Seconds before the first retry.
+        :type retry_delay: float
+
+        :param max_retry_delay: Maximum seconds between two retries.
+        :type max_retry_delay: float
+        """
+        self.function_path = function_path
+        self.kwargs = kwargs or {}
+        self.debounce = debounce
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        # Threads waiting for the processes
+        self._pool = ThreadPool(processes=workers)
+        self._lock = threading.Lock()
+        # Shakemaps waiting to be processed, with their timer
+        self._timers = {}
+        # Shakemaps being processed
+        self._running = set()
+        # Shakemaps updated while they were processed
+        self._updated = set()
+
+    def push(self, shake_id):
+        """Schedule the processing of a new or updated shakemap.
+
+        :param shake_id: The shakemap ID.
+        :type shake_id: str
+        """
+        with self._lock:
+            if shake_id in self._running:
+                LOGGER.info(
+                    'Shakemap %s updated while processed, it will be '
+                    'processed again' % shake_id)
+                self._updated.add(shake_id)
+                return
+            self._schedule(shake_id, 1, self.debounce)
+
+    def _schedule(self, shake_id, attempt, delay):
+        """Process a shakemap after a delay, replacing a pending processing.
+
+        Must be called with the lock held.
+        """
+        timer = self._timers.pop(shake_id, None)
+        if timer is not None:
+            timer.cancel()
+        timer = threading.Timer(delay, self._submit, (shake_id, attempt))
+        timer.daemon = True
+        self._timers[shake_id] = timer
+        timer.start()
+
+    def _submit(self, shake_id, attempt):
+        """Start the processing of a shakemap."""
+        with self._lock:
+            if self._timers.get(shake_id) is not threading.current_thread():
+                # Replaced by a later update
+                return
+            del self._timers[shake_id]
+            self._running.add(shake_id)
+
+        LOGGER.info('Processing shakemap %s, attempt %s' % (
+            shake_id, attempt))
+
+        def finished(succeeded):
+            self._finished(shake_id, attempt, succeeded)
+
+        self._pool.apply_async(
+            _run_task,
+            (self.function_path, shake_id, self.kwargs),
+            callback=finished)
+
+    def _finished(self, shake_id, attempt, succeeded):
+        """Handle the end of the processing of a shakemap."""
+        with self._lock:
+            self._running.discard(shake_id)
+            if shake_id in self._updated:
+                # The result is obsolete whether it succeeded or not
+                self._updated.discard(shake_id)
+                self._schedule(shake_id, 1, self.debounce)
+            elif succeeded:
+                LOGGER.info('Shakemap %s handled' % shake_id)
+            elif attempt >= self.max_attempts:
+                LOGGER.error('Giving up shakemap %s after %s attempts' % (
+                    shake_id, attempt))
+            else:
+                delay = min(
+                    self.retry_delay * 2 ** (attempt - 1),
+                    self.max_retry_delay)
+                LOGGER.info('Retrying shakemap %s in %s seconds' % (
+                    shake_id, delay))
+                self._schedule(shake_id, attempt + 1, delay)
+
+    @property
+    def pending(self):
+        """Whether shakemaps are waiting or being processed.
+
+        :rtype: bool
+        """
+        with self._lock:
+            return bool(self._timers or self._running)
+
+    def close(self):
+        """Drop the waiting shakemaps and wait for the running ones."""
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers = {}
+        self._pool.close()
+        self._pool.join()
+
+
 def watch_shakemaps_push(
         working_dir, timeout=None, handler=None, daemon=False):
     wm = pyinotify.WatchManager()
@@ -72,6 +277,11 @@ def watch_shakemaps_push(
 
 
 if __name__ == '__main__':
+    if sys.argv[1] == '--process':
+        # Started by _run_task to process a shakemap
+        sys.exit(not _process_shakemap(
+            sys.argv[2], sys.argv[3], json.loads(sys.argv[4])))
+
     working_dir = sys.argv[1]
 
     if 'INASAFE_LOCALE' in os.environ:
@@ -79,23 +289,16 @@ if __name__ == '__main__':
     else:
         locale_option = 'en'
 
+    processing_queue = ShakemapProcessingQueue(
+        'realtime.earthquake.make_map.process_event',
+        kwargs={'working_dir': working_dir, 'locale': locale_option})
+
     def process_shakemap(shake_id=None):
-        """Process a given shake_id for realtime shake"""
+        """Queue a given shake_id for realtime shake processing"""
         LOGGER.info('Inotify received new shakemap')
         tz = get_localzone()
         notify_realtime_rest(datetime.datetime.now(tz=tz))
-        done = False
-        while not done:
-            try:
-                done = process_event(
-                    working_dir=working_dir,
-                    event_id=shake_id,
-                    locale=locale_option)
-            except Exception as e:  # pylint: disable=W0702
-                LOGGER.info('Process event failed')
-                LOGGER.exception(e)
-                LOGGER.info('Retrying to process event')
-        LOGGER.info('Shakemap %s handled' % (shake_id, ))
+        processing_queue.push(shake_id)
 
     handler = ShakemapPushHandler(working_dir, callback=process_shakemap)
     notifier = watch_shakemaps_push(working_dir, daemon=True, handler=handler)
@@ -21,6 +21,7 @@ __copyright__ = ('Copyright 2012, Australia Indonesia Facility for '
 
 import os
 import shutil
+import tempfile
 # noinspection PyPep8Naming
 import cPickle as pickle
 import math
@@ -71,15 +72,17 @@ QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
 from safe.impact_functions.impact_function_manager import ImpactFunctionManager
 from safe.storage.core import read_layer as safe_read_layer
 from safe.common.version import get_version
-from safe.common.utilities import romanise
+from safe.common.utilities import romanise, temp_dir
 from safe.utilities.clipper import extent_to_geoarray, clip_layer
 from safe.utilities.styling import mmi_colour
 from safe.utilities.gis import get_wgs84_resolution
 from safe.utilities.resources import resources_path
 from safe.common.exceptions import TranslationLoadError
+from safe.utilities.keyword_io import KeywordIO
 from safe.gui.tools.shake_grid.shake_grid import ShakeGrid
 import safe.messaging as m
 from realtime.earthquake.shake_data import ShakeData
+from realtime.earthquake.exposure_cache import exposure_cache
 from realtime.utilities import (
     shakemap_extract_dir,
     data_dir,
@@ -1174,14 +1177,63 @@ class ShakeEvent(QObject):
             extent=hazard_geo_extent,
             cell_size=cell_size)
 
-        clipped_exposure = clip_layer(
-            layer=exposure_layer,
-            extent=hazard_geo_extent,
-            cell_size=cell_size,
-            extra_keywords=extra_exposure_keywords)
+        # The worker may hold the population raster in memory already, in
+        # which case we can skip gdalwarp and read the event window directly.
+        cache = exposure_cache(population_raster_path)
+        if cache is not None and cache.is_geographic():
+            clipped_exposure = self._clip_cached_exposure(
+                cache,
+                exposure_layer,
+                hazard_geo_extent,
+                cell_size,
+                extra_exposure_keywords)
+        else:
+            clipped_exposure = clip_layer(
+                layer=exposure_layer,
+                extent=hazard_geo_extent,
+                cell_size=cell_size,
+                extra_keywords=extra_exposure_keywords)
 
         return clipped_hazard, clipped_exposure
 
+    # noinspection PyMethodMayBeStatic
+    def _clip_cached_exposure(
+            self, cache, exposure_layer, extent, cell_size, extra_keywords):
+        """Clip the population layer using the in-memory exposure cache.
+
+        :param cache: Preloaded cache of the population raster.
+        :type cache: ExposureRasterCache
+
+        :param exposure_layer: The population layer, used to copy keywords.
+        :type exposure_layer: QgsRasterLayer
+
+        :param extent: Clip extent in the form [xmin, ymin, xmax, ymax] in
+            EPSG:4326.
+        :type extent: list
+
+        :param cell_size: Cell size the layer should be resampled to.
+        :type cell_size: float
+
+        :param extra_keywords: Keywords to add to the clipped layer.
+        :type extra_keywords: dict
+
+        :return: The clipped population layer.
+        :rtype: QgsRasterLayer
+        """
+        handle, file_name = tempfile.mkstemp('.tif', 'clip_', temp_dir())
+        os.close(handle)
+        os.remove(file_name)
+
+        cache.clip_to_file(extent, file_name, cell_size=cell_size)
+        LOGGER.debug(
+            'Clipped population from memory (tile hits: %s, misses: %s)' % (
+                cache.hits, cache.misses))
+
+        KeywordIO().copy_keywords(
+            exposure_layer, file_name, extra_keywords=extra_keywords)
+        base_name = '%s clipped' % exposure_layer.name()
+        return QgsRasterLayer(file_name, base_name)
+
     def _get_sqlite_path(self):
         """Helper to determine sqlite file with geonames places in it.
 
@@ -4,10 +4,13 @@ import logging
 
 import os
 
+from celery.signals import worker_process_init
+
 from realtime.celery_app import app
 from realtime.celeryconfig import EARTHQUAKE_WORKING_DIRECTORY
+from realtime.earthquake.exposure_cache import preload_exposure_cache
 from realtime.earthquake.make_map import process_event
-from realtime.utilities import realtime_logger_name
+from realtime.utilities import population_path, realtime_logger_name
 
 __author__ = 'Rizky Maulana Nugraha <lana.pcfre@gmail.com>'
 __date__ = '2/16/16'
@@ -17,6 +20,27 @@ __date__ = '2/16/16'
 LOGGER = logging.getLogger(realtime_logger_name())
 
 
+@worker_process_init.connect
+def preload_population(**kwargs):
+    """Load the population raster into memory when a worker starts.
+
+    Every shake event clips the same population raster, so the worker keeps
+    it in memory instead of running gdalwarp against it for each event.
+    The raster is the one process_event uses, see
+    realtime.utilities.population_path. Set INASAFE_POPULATION_CACHE_TILES
+    to 0 to disable the cache.
+    """
+    raster_path = population_path()
+    max_tiles = int(os.environ.get('INASAFE_POPULATION_CACHE_TILES', 256))
+    if not os.path.exists(raster_path) or max_tiles < 1:
+        return
+    try:
+        preload_exposure_cache(raster_path, max_tiles=max_tiles)
+    except Exception as e:
+        # Not fatal, ShakeEvent falls back to clipping with gdalwarp.
+        LOGGER.exception(e)
+
+
 @app.task(
     name='realtime.tasks.earthquake.process_shake', queue='inasafe-realtime')
 def process_shake(event_id=None):
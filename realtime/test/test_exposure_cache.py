@@ -0,0 +1,150 @@
+# coding=utf-8
+"""
+InaSAFE Disaster risk assessment tool developed by AusAid and World Bank
+- **Exposure Cache Test Cases.**
+
+Contact : ole.moller.nielsen@gmail.com
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+import unittest
+
+import numpy
+from osgeo import gdal
+
+from realtime.earthquake.exposure_cache import (
+    ExposureRasterCache,
+    preload_exposure_cache,
+    exposure_cache,
+    clear_exposure_caches)
+from safe.common.utilities import temp_dir, unique_filename
+from safe.test.utilities import test_data_path
+
+
+class TestExposureCache(unittest.TestCase):
+    """Tests for the in-memory population raster cache."""
+
+    def setUp(self):
+        """Fixture run before all tests."""
+        self.raster_path = test_data_path(
+            'exposure', 'pop_binary_raster_20_20.asc')
+        dataset = gdal.Open(self.raster_path)
+        self.expected = dataset.GetRasterBand(1).ReadAsArray()
+        self.geotransform = dataset.GetGeoTransform()
+
+    def tearDown(self):
+        """Fixture run after each test."""
+        clear_exposure_caches()
+
+    def test_read_window(self):
+        """Window reads spanning several tiles match GDAL."""
+        cache = ExposureRasterCache(self.raster_path, tile_size=6)
+        window = cache.read_window(3, 4, 10, 9)
+        numpy.testing.assert_array_equal(
+            window, self.expected[4:13, 3:13])
+        # Outside of the raster we get NaN
+        window = cache.read_window(-2, 18, 4, 4)
+        self.assertTrue(numpy.isnan(window[:, :2]).all())
+        self.assertTrue(numpy.isnan(window[2:, :]).all())
+        numpy.testing.assert_array_equal(
+            window[:2, 2:], self.expected[18:20, 0:2])
+
+    def test_source_data_type(self):
+        """Tiles keep the data type of the raster and no data is NaN."""
+        raster_path = unique_filename(suffix='.tif', dir=temp_dir('test'))
+        data = numpy.arange(16, dtype=numpy.float32).reshape(4, 4)
+        data[1, 2] = -9999
+        dataset = gdal.GetDriverByName('GTiff').Create(
+            raster_path, 4, 4, 1, gdal.GDT_Float32)
+        dataset.SetGeoTransform(self.geotransform)
+        dataset.GetRasterBand(1).SetNoDataValue(-9999)
+        dataset.GetRasterBand(1).WriteArray(data)
+        del dataset
+
+        cache = ExposureRasterCache(raster_path, tile_size=2)
+        window = cache.read_window(0, 0, 4, 4)
+        self.assertEqual(window.dtype, numpy.float32)
+        self.assertTrue(numpy.isnan(window[1, 2]))
+        self.assertEqual(window[3, 3], 15)
+        for tile in cache._tiles.values():
+            self.assertEqual(tile.dtype, numpy.float32)
+
+        # Clipped rasters keep the data type too
+        output_path = unique_filename(suffix='.tif', dir=temp_dir('test'))
+        origin_x, cell_x, _, origin_y, _, cell_y = self.geotransform
+        cache.clip_to_file(
+            [origin_x, origin_y + 4 * cell_y, origin_x + 4 * cell_x,
+             origin_y],
+            output_path)
+        band = gdal.Open(output_path).GetRasterBand(1)
+        self.assertEqual(band.DataType, gdal.GDT_Float32)
+        numpy.testing.assert_array_equal(band.ReadAsArray(), data)
+
+    def test_lru_eviction(self):
+        """Least recently used tiles are evicted first."""
+        cache = ExposureRasterCache(
+            self.raster_path, tile_size=10, max_tiles=2)
+        cache.read_window(0, 0, 1, 1)
+        cache.read_window(10, 0, 1, 1)
+        cache.read_window(0, 0, 1, 1)
+        cache.read_window(0, 10, 1, 1)
+        self.assertEqual(cache.misses, 3)
+        self.assertEqual(cache.hits, 1)
+        # Tile (0, 1) was the least recently used so it was evicted.
+        self.assertEqual(cache._tiles.keys(), [(0, 0), (1, 0)])
+
+    def test_clip(self):
+        """Clipping at native resolution returns the matching cells."""
+        cache = ExposureRasterCache(self.raster_path, tile_size=8)
+        self.assertTrue(cache.is_geographic())
+        origin_x, cell_x, _, origin_y, _, cell_y = self.geotransform
+        extent = [
+            origin_x + 2 * cell_x,
+            origin_y + 15 * cell_y,
+            origin_x + 12 * cell_x,
+            origin_y + 5 * cell_y]
+        data, geotransform = cache.clip(extent)
+        numpy.testing.assert_array_equal(data, self.expected[5:15, 2:12])
+        self.assertAlmostEqual(geotransform[0], extent[0])
+        self.assertAlmostEqual(geotransform[3], extent[3])
+
+        # Half the cell size doubles every cell in both directions.
+        data, _ = cache.clip(extent, abs(cell_x) / 2)
+        self.assertEqual(data.shape, (20, 20))
+        numpy.testing.assert_array_equal(
+            data[::2, ::2], self.expected[5:15, 2:12])
+
+    def test_clip_to_file(self):
+        """The clipped raster is written with nodata for missing cells."""
+        cache = ExposureRasterCache(self.raster_path)
+        origin_x, cell_x, _, origin_y, _, cell_y = self.geotransform
+        extent = [
+            origin_x - 2 * cell_x,
+            origin_y + 4 * cell_y,
+            origin_x + 4 * cell_x,
+            origin_y]
+        output_path = unique_filename(
+            suffix='.tif', dir=temp_dir('test'))
+        cache.clip_to_file(extent, output_path)
+        dataset = gdal.Open(output_path)
+        band = dataset.GetRasterBand(1)
+        data = band.ReadAsArray()
+        self.assertEqual(band.GetNoDataValue(), -9999)
+        self.assertTrue((data[:, :2] == -9999).all())
+        numpy.testing.assert_array_equal(data[:, 2:], self.expected[0:4, 0:4])
+
+    def test_registry(self):
+        """Preloaded caches can be looked up by path."""
+        self.assertIsNone(exposure_cache(self.raster_path))
+        cache = preload_exposure_cache(self.raster_path)
+        self.assertIs(exposure_cache(self.raster_path), cache)
+        self.assertIs(preload_exposure_cache(self.raster_path), cache)
+        self.assertEqual(cache.misses, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
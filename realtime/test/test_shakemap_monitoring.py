@@ -11,7 +11,7 @@ import pyinotify
 import time
 
 from realtime.earthquake.notify_new_shake import watch_shakemaps_push, \
-    ShakemapPushHandler
+    ShakemapPushHandler, ShakemapProcessingQueue
 from realtime.utilities import realtime_logger_name
 from safe.common.utilities import temp_dir
 from safe.test.utilities import test_data_path
@@ -27,6 +27,13 @@ SHAKE_ID = '20131105060809'
 LOGGER = logging.getLogger(realtime_logger_name())
 
 
+def record_processing(event_id=None, log_path=None, succeed=True):
+    """Dummy shakemap processing writing the event id to a log file."""
+    with open(log_path, 'a') as log_file:
+        log_file.write('%s\n' % event_id)
+    return succeed
+
+
 class EventHandler(pyinotify.ProcessEvent):
 
     def __init__(self, test_object):
@@ -81,6 +88,38 @@ class TestShakemapMonitoring(unittest.TestCase):
         self.assertTrue(handler.file_handled)
         notifier.stop()
 
+    def run_queue(self, succeed):
+        """Push updates of two shakemaps and return the processing log."""
+        os.makedirs(self.local_path)
+        log_path = os.path.join(self.local_path, 'processing.log')
+        queue = ShakemapProcessingQueue(
+            'realtime.test.test_shakemap_monitoring.record_processing',
+            kwargs={'log_path': log_path, 'succeed': succeed},
+            workers=2,
+            debounce=0.2,
+            max_attempts=3,
+            retry_delay=0.1)
+        for _ in range(5):
+            queue.push(SHAKE_ID)
+        queue.push('20150918201057')
+        timeout = time.time() + 60
+        while queue.pending and time.time() < timeout:
+            time.sleep(0.1)
+        queue.close()
+        with open(log_path) as log_file:
+            return sorted(log_file.read().split())
+
+    def test_processing_queue(self):
+        """Test updates of a shakemap are processed once."""
+        self.assertEqual(
+            self.run_queue(True), ['20131105060809', '20150918201057'])
+
+    def test_processing_queue_retries(self):
+        """Test a failing shakemap is retried a limited number of times."""
+        self.assertEqual(
+            self.run_queue(False),
+            ['20131105060809'] * 3 + ['20150918201057'] * 3)
+
     def test_execute_shake_processor(self):
         """Trigger shake processing job"""
 
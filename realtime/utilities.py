@@ -46,6 +46,17 @@ def data_dir():
     return dir_path
 
 
+def population_path():
+    """Return the path to the population raster used for shake events.
+
+    The INASAFE_POPULATION_PATH environment variable is used if it is set,
+    otherwise the population raster of the data dir.
+    """
+    if 'INASAFE_POPULATION_PATH' in os.environ:
+        return os.environ['INASAFE_POPULATION_PATH']
+    return os.path.join(data_dir(), 'exposure', 'population.tif')
+
+
 def settings_dir():
     """Return the path to the settings dir of realtime"""
     dir_path = os.path.abspath(
@@ -191,6 +191,11 @@ def polygonize(raster_file_name, band=1, name_field='DN'):
     dst_field = 0
 
     input_band = input_dataset.GetRasterBand(band)
-    gdal.Polygonize(input_band, None, layer, dst_field, [], callback=None)
+    # Cells without data are not polygonized
+    mask_band = None
+    if input_band.GetNoDataValue() is not None:
+        mask_band = input_band.GetMaskBand()
+    gdal.Polygonize(
+        input_band, mask_band, layer, dst_field, [], callback=None)
     destination.Destroy()
     return out_shapefile
@@ -8,7 +8,12 @@ __license__ = "GPL"
 __copyright__ = 'Copyright 2012, Australia Indonesia Facility for '
 __copyright__ += 'Disaster Reduction'
 
+import os
+import math
+from xml.sax.saxutils import escape
 
+import numpy
+from osgeo import gdal, gdal_array
 from qgis.core import (
     QgsRasterLayer,
     QgsRectangle,
@@ -152,13 +157,253 @@ def polygonize(raster, threshold_min=0.0, threshold_max=float('inf')):
     return polygons
 
 
-def align_clip_raster(hazard_layer, extent):
+def _grid_index(offset, pixel_size, count):
+    """Index of the raster cell containing an offset from the raster origin.
+
+    An offset within a millionth of a pixel of a cell edge is taken to be on
+    the edge, so that floating point errors do not shift aligned extents.
+
+    :param offset: Distance from the origin of the raster, positive.
+    :type offset: float
+
+    :param pixel_size: Size of a pixel along the same axis.
+    :type pixel_size: float
+
+    :param count: Number of pixels along the axis.
+    :type count: int
+
+    :returns: The index, between 0 and count.
+    :rtype: int
+    """
+    position = offset / pixel_size
+    index = int(round(position))
+    if abs(position - index) > 1e-6:
+        index = int(math.floor(position))
+    return max(0, min(index, count))
+
+
+def aligned_window(raster, extent):
+    """Find the window of a raster aligned with its pixels covering an extent.
+
+    The window starts on the pixel edge at or before the minimum of the
+    extent and has as many pixels as fit in the extent. It is computed from
+    the raster geotransform, without stepping through the pixels.
+
+    .. versionadded:: 3.5
+
+    :param raster: The raster layer.
+    :type raster: QgsRasterLayer
+
+    :param extent: The extent in the form [xmin, ymin, xmax, ymax], in the
+        projection of the raster.
+    :type extent: list
+
+    :returns: The column and row of the top left pixel of the window in the
+        raster, counted from its top left, the width and height of the window
+        in pixels and the extent of the window. The window may extend beyond
+        the raster.
+    :rtype: (int, int, int, int, QgsRectangle)
+    """
+    raster_extent = raster.dataProvider().extent()
+    xmin = raster_extent.xMinimum()
+    ymin = raster_extent.yMinimum()
+    x_delta = raster_extent.width() / raster.width()
+    y_delta = raster_extent.height() / raster.height()
+
+    width = int((extent[2] - extent[0]) / raster.rasterUnitsPerPixelX())
+    height = int((extent[3] - extent[1]) / raster.rasterUnitsPerPixelY())
+
+    column = _grid_index(max(extent[0] - xmin, 0), x_delta, raster.width())
+    # Rows from the bottom of the raster
+    bottom_row = _grid_index(
+        max(extent[1] - ymin, 0), y_delta, raster.height())
+
+    clip_xmin = xmin + column * x_delta
+    clip_ymin = ymin + bottom_row * y_delta
+    window_extent = QgsRectangle(
+        clip_xmin,
+        clip_ymin,
+        clip_xmin + width * x_delta,
+        clip_ymin + height * y_delta)
+    row = raster.height() - bottom_row - height
+    return column, row, width, height, window_extent
+
+
+def _source_window(raster, column, row, width, height):
+    """Intersect a window with a raster.
+
+    :param raster: The raster layer.
+    :type raster: QgsRasterLayer
+
+    :param column: Column of the top left pixel of the window.
+    :type column: int
+
+    :param row: Row of the top left pixel of the window.
+    :type row: int
+
+    :param width: Width of the window in pixels.
+    :type width: int
+
+    :param height: Height of the window in pixels.
+    :type height: int
+
+    :returns: The column, row, width and height of the part of the window
+        inside the raster and its column and row in the window, or None if
+        they do not overlap.
+    :rtype: tuple, None
+    """
+    source_column = max(column, 0)
+    source_row = max(row, 0)
+    source_width = min(column + width, raster.width()) - source_column
+    source_height = min(row + height, raster.height()) - source_row
+    if source_width <= 0 or source_height <= 0:
+        return None
+    return (
+        source_column, source_row, source_width, source_height,
+        source_column - column, source_row - row)
+
+
+def read_raster_window(raster, extent, band_number=1):
+    """Read the pixels of a raster in the aligned window covering an extent.
+
+    Only the pixels of the window are read, nothing is written to disk.
+
+    .. versionadded:: 3.5
+
+    :param raster: The raster layer, backed by a file GDAL can read.
+    :type raster: QgsRasterLayer
+
+    :param extent: The extent in the form [xmin, ymin, xmax, ymax], in the
+        projection of the raster.
+    :type extent: list
+
+    :param band_number: The band to read, from 1.
+    :type band_number: int
+
+    :returns: The pixels, top row first, and the extent of the window.
+        Pixels of the window beyond the raster are set to the nodata value
+        of the band, or NaN for floating point bands without one.
+    :rtype: (numpy.ndarray, QgsRectangle)
+
+    :raises: GetDataError if the raster can not be opened with GDAL.
+    """
+    column, row, width, height, window_extent = aligned_window(
+        raster, extent)
+    dataset = gdal.Open(raster.source(), gdal.GA_ReadOnly)
+    if dataset is None:
+        raise GetDataError('Could not open %s with GDAL' % raster.source())
+    band = dataset.GetRasterBand(band_number)
+
+    source = _source_window(raster, column, row, width, height)
+    if source == (0, 0, width, height, 0, 0):
+        return band.ReadAsArray(column, row, width, height), window_extent
+
+    dtype = gdal_array.GDALTypeCodeToNumericTypeCode(band.DataType)
+    nodata = band.GetNoDataValue()
+    if nodata is None:
+        if numpy.issubdtype(dtype, numpy.floating):
+            nodata = numpy.nan
+        else:
+            nodata = 0
+    data = numpy.empty((height, width), dtype=dtype)
+    data.fill(nodata)
+    if source is not None:
+        (source_column, source_row, source_width, source_height,
+         window_column, window_row) = source
+        data[window_row:window_row + source_height,
+             window_column:window_column + source_width] = band.ReadAsArray(
+            source_column, source_row, source_width, source_height)
+    return data, window_extent
+
+
+def clip_raster_vrt(raster, column, row, width, height, output_extent):
+    """Clip a raster to a pixel window as a GDAL virtual raster.
+
+    The virtual raster references the pixels of the source file so nothing
+    is copied. The source must stay on disk while the result is used.
+
+    .. versionadded:: 3.5
+
+    :param raster: The raster layer, backed by a file GDAL can read.
+    :type raster: QgsRasterLayer
+
+    :param column: Column of the top left pixel of the window.
+    :type column: int
+
+    :param row: Row of the top left pixel of the window.
+    :type row: int
+
+    :param width: Width of the window in pixels.
+    :type width: int
+
+    :param height: Height of the window in pixels.
+    :type height: int
+
+    :param output_extent: Extent of the window.
+    :type output_extent: QgsRectangle
+
+    :returns: Clipped region of the raster, or None if the raster can not be
+        opened with GDAL.
+    :rtype: QgsRasterLayer, None
+    """
+    if width <= 0 or height <= 0:
+        return None
+    source_path = raster.source()
+    dataset = gdal.Open(source_path, gdal.GA_ReadOnly)
+    if dataset is None:
+        return None
+
+    geotransform = [
+        output_extent.xMinimum(),
+        output_extent.width() / width,
+        0.0,
+        output_extent.yMaximum(),
+        0.0,
+        -output_extent.height() / height]
+    lines = [
+        '<VRTDataset rasterXSize="%d" rasterYSize="%d">' % (width, height),
+        '  <SRS>%s</SRS>' % escape(dataset.GetProjection()),
+        '  <GeoTransform>%s</GeoTransform>' % ', '.join(
+            repr(value) for value in geotransform)]
+    source = _source_window(raster, column, row, width, height)
+    for band_number in range(1, dataset.RasterCount + 1):
+        band = dataset.GetRasterBand(band_number)
+        lines.append(
+            '  <VRTRasterBand dataType="%s" band="%d">' % (
+                gdal.GetDataTypeName(band.DataType), band_number))
+        nodata = band.GetNoDataValue()
+        if nodata is not None:
+            lines.append('    <NoDataValue>%r</NoDataValue>' % nodata)
+        if source is not None:
+            (source_column, source_row, source_width, source_height,
+             window_column, window_row) = source
+            lines.extend([
+                '    <SimpleSource>',
+                '      <SourceFilename relativeToVRT="0">%s</SourceFilename>'
+                % escape(os.path.abspath(source_path)),
+                '      <SourceBand>%d</SourceBand>' % band_number,
+                '      <SrcRect xOff="%d" yOff="%d" xSize="%d" ySize="%d"/>'
+                % (source_column, source_row, source_width, source_height),
+                '      <DstRect xOff="%d" yOff="%d" xSize="%d" ySize="%d"/>'
+                % (window_column, window_row, source_width, source_height),
+                '    </SimpleSource>'])
+        lines.append('  </VRTRasterBand>')
+    lines.append('</VRTDataset>')
+
+    file_name = unique_filename(suffix='.vrt')
+    with open(file_name, 'w') as vrt_file:
+        vrt_file.write('\n'.join(lines))
+    return QgsRasterLayer(file_name, 'clipped_raster')
+
+
+def align_clip_raster(hazard_layer, extent, use_vrt=False):
     """Align raster extent and the given extent.
 
     Both layers should be in the same projection.
 
     .. versionadded:: 3.4
-    .. note:: Delegates to clip_raster()
+    .. note:: Delegates to clip_raster(), or to clip_raster_vrt() if
+        use_vrt is True.
 
     :param hazard_layer: The raster layer.
     :type hazard_layer: QgsRasterLayer
@@ -166,47 +411,23 @@ def align_clip_raster(hazard_layer, extent):
     :param extent: The extent in the form [xmin, ymin, xmax, ymax]
     :type extent: list
 
+    :param use_vrt: Whether to return a virtual raster referencing the
+        pixels of the hazard layer instead of writing them to a new GeoTIFF.
+        A GeoTIFF is still written if GDAL can not read the layer.
+    :type use_vrt: bool
+
     :returns: Clipped region of the raster
     :rtype: QgsRasterLayer
     """
-    raster_extent = hazard_layer.dataProvider().extent()
-    clip_xmin = raster_extent.xMinimum()
-    clip_ymin = raster_extent.yMinimum()
-
-    if extent[0] > clip_xmin:
-        clip_xmin = extent[0]
-    if extent[1] > clip_ymin:
-        clip_ymin = extent[1]
-    height = ((extent[3] - extent[1]) /
-              hazard_layer.rasterUnitsPerPixelY())
-    height = int(height)
-    width = ((extent[2] - extent[0]) /
-             hazard_layer.rasterUnitsPerPixelX())
-    width = int(width)
-    raster_extent = hazard_layer.dataProvider().extent()
-    xmin = raster_extent.xMinimum()
-    xmax = raster_extent.xMaximum()
-    ymin = raster_extent.yMinimum()
-    ymax = raster_extent.yMaximum()
-    x_delta = (xmax - xmin) / hazard_layer.width()
-    x = xmin
-    for i in range(hazard_layer.width()):
-        if abs(x - clip_xmin) < x_delta:
-            # We have found the aligned raster boundary
-            break
-        x += x_delta
-        _ = i
-    y_delta = (ymax - ymin) / hazard_layer.height()
-    y = ymin
-    for i in range(hazard_layer.width()):
-        if abs(y - clip_ymin) < y_delta:
-            # We have found the aligned raster boundary
-            break
-        y += y_delta
-    clip_extent = [x, y, x + width * x_delta, y + height * y_delta]
+    column, row, width, height, clip_extent = aligned_window(
+        hazard_layer, extent)
+    if use_vrt:
+        small_raster = clip_raster_vrt(
+            hazard_layer, column, row, width, height, clip_extent)
+        if small_raster is not None:
+            return small_raster
     # Clip hazard raster
-    small_raster = clip_raster(
-        hazard_layer, width, height, QgsRectangle(*clip_extent))
+    small_raster = clip_raster(hazard_layer, width, height, clip_extent)
     return small_raster
 
 
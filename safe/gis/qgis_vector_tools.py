@@ -11,6 +11,7 @@ __copyright__ += 'Disaster Reduction'
 
 
 from qgis.core import (
+    QGis,
     QgsField,
     QgsVectorLayer,
     QgsFeature,
@@ -186,6 +187,24 @@ def clip_by_polygon(
     return result_layer
 
 
+def prepare_geometry(geometry):
+    """Prepare a geometry for repeated predicates such as contains.
+
+    .. versionadded:: 3.5
+
+    :param geometry: The geometry.
+    :type geometry: QgsGeometry
+
+    :returns: A prepared geometry engine, or None if QGIS is older than 2.10.
+    :rtype: QgsGeometryEngine
+    """
+    if QGis.QGIS_VERSION_INT < 21000:
+        return None
+    engine = QgsGeometry.createGeometryEngine(geometry.geometry())
+    engine.prepareGeometry()
+    return engine
+
+
 def split_by_polygon(
         vector,
         polygon,
@@ -196,7 +215,8 @@ def split_by_polygon(
     If request is specified, filter the objects before splitting.
 
     If part of vector object lies in the polygon, mark it by mark_value (
-    optional).
+    optional). Objects entirely inside or outside of the polygon are not
+    split.
 
     :param vector:  Vector layer
     :type vector:   QgsVectorLayer
@@ -259,32 +279,61 @@ def split_by_polygon(
             raise WrongDataTypeException(
                 'Field not found for %s' % target_field)
 
+    def _mark(attributes, value):
+        """
+        Helper to get the attributes of a part marked by value.
+        """
+        if mark_value is None:
+            return attributes
+        return _update_attr_list(
+            attributes,
+            target_field_index,
+            value,
+            add_attribute=new_field_added
+        )
+
+    # Predicates against the prepared polygon are much faster than against
+    # the polygon itself. Only the objects crossing its boundary are split.
+    engine = prepare_geometry(polygon)
+
+    def _intersects(geometry):
+        """
+        Helper to test if geometry intersects the polygon.
+        """
+        if engine is None:
+            return polygon.intersects(geometry)
+        return engine.intersects(geometry.geometry())
+
+    def _contains(geometry):
+        """
+        Helper to test if geometry lies entirely in the polygon.
+        """
+        if engine is None:
+            return polygon.contains(geometry)
+        return engine.contains(geometry.geometry())
+
     # Start split procedure
-    result_layer.startEditing()
+    features = []
     for initial_feature in vector.getFeatures(request):
         initial_geom = initial_feature.geometry()
         attributes = initial_feature.attributes()
         geometry_type = initial_geom.type()
-        if polygon.intersects(initial_geom):
+        inside_attributes = _mark(attributes, target_value)
+        outside_attributes = _mark(attributes, 0)
+        if not _intersects(initial_geom):
+            features.append(_set_feature(initial_geom, outside_attributes))
+        elif _contains(initial_geom):
+            for g in initial_geom.asGeometryCollection():
+                features.append(_set_feature(g, inside_attributes))
+        else:
             # Find parts of initial_geom, intersecting
             # with the polygon, then mark them if needed
             intersection = QgsGeometry(
                 initial_geom.intersection(polygon)
             ).asGeometryCollection()
-
             for g in intersection:
                 if g.type() == geometry_type:
-                    if mark_value is not None:
-                        new_attributes = _update_attr_list(
-                            attributes,
-                            target_field_index,
-                            target_value,
-                            add_attribute=new_field_added
-                        )
-                    else:
-                        new_attributes = attributes
-                    feature = _set_feature(g, new_attributes)
-                    _ = result_layer.dataProvider().addFeatures([feature])
+                    features.append(_set_feature(g, inside_attributes))
 
             # Find parts of the initial_geom that do not lie in the polygon
             diff_geom = QgsGeometry(
@@ -292,29 +341,10 @@ def split_by_polygon(
             ).asGeometryCollection()
             for g in diff_geom:
                 if g.type() == geometry_type:
-                    if mark_value is not None:
-                        new_attributes = _update_attr_list(
-                            attributes,
-                            target_field_index,
-                            0,
-                            add_attribute=new_field_added
-                        )
-                    else:
-                        new_attributes = attributes
-                    feature = _set_feature(g, new_attributes)
-                    _ = result_layer.dataProvider().addFeatures([feature])
-        else:
-            if mark_value is not None:
-                new_attributes = _update_attr_list(
-                    attributes,
-                    target_field_index,
-                    0,
-                    add_attribute=new_field_added
-                )
-            else:
-                new_attributes = attributes
-            feature = _set_feature(initial_geom, new_attributes)
-            _ = result_layer.dataProvider().addFeatures([feature])
+                    features.append(_set_feature(g, outside_attributes))
+
+    result_layer.startEditing()
+    result_provider.addFeatures(features)
     result_layer.commitChanges()
     result_layer.updateExtents()
 
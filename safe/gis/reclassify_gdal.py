@@ -26,14 +26,82 @@ Note from Etienne : 12/05/16
      options (no gap, no no_data):
     http://gis.stackexchange.com/questions/163007/raster-reclassify-using \
     -python-gdal-and-numpy
+    * Since 3.5 gaps between the ranges and no data cells are written as no
+    data in the output.
 """
 
 
-def reclassify(input_raster, ranges):
-    """Reclassify a raster according to some ranges.
+# Integer types for the reclassified raster, smallest first, as the GDAL
+# type, the numpy type and the no data value, which is not a valid class.
+CLASS_DATA_TYPES = [
+    (gdal.GDT_Byte, np.uint8, 255),
+    (gdal.GDT_Int16, np.int16, -32768),
+    (gdal.GDT_UInt16, np.uint16, 65535),
+    (gdal.GDT_Int32, np.int32, -2147483648),
+]
 
-    This function is a wrapper for the code from
-    https://github.com/chiatt/gdal_reclassify
+
+def class_data_type(classes):
+    """Get the most compact raster data type able to store some classes.
+
+    .. versionadded:: 3.5
+
+    :param classes: The class values.
+    :type classes: list
+
+    :returns: The GDAL type, the numpy type and the no data value. Float32
+        with nan as no data is used if a class is not an integer.
+    :rtype: tuple
+    """
+    classes = list(classes)
+    if all(float(value).is_integer() for value in classes):
+        for gdal_type, numpy_type, no_data in CLASS_DATA_TYPES:
+            limits = np.iinfo(numpy_type)
+            if no_data in classes:
+                continue
+            if limits.min <= min(classes) and max(classes) <= limits.max:
+                return gdal_type, numpy_type, no_data
+    return gdal.GDT_Float32, np.float32, float('nan')
+
+
+def class_lookup(ranges):
+    """Get the bin edges of some ranges and the class of each bin.
+
+    Bin i holds the values from edges[i - 1] excluded to edges[i]
+    included, as given by numpy.searchsorted on the left side. A later range
+    overrides an earlier one where they overlap.
+
+    .. versionadded:: 3.5
+
+    :param ranges: The ranges as a OrderedDict, see reclassify.
+    :type ranges: OrderedDict
+
+    :returns: The sorted bin edges and the class of each bin, None if the
+        bin is in no range.
+    :rtype: (list, list)
+    """
+    edges = sorted(set(
+        bound for interval in ranges.itervalues()
+        for bound in interval if bound is not None))
+    # Bounds of each bin, None standing for an infinite bound
+    lower_bounds = [None] + edges
+    upper_bounds = edges + [None]
+
+    classes = []
+    for lower, upper in zip(lower_bounds, upper_bounds):
+        bin_class = None
+        for value, (v_min, v_max) in ranges.iteritems():
+            if v_min is not None and (lower is None or lower < v_min):
+                continue
+            if v_max is not None and (upper is None or upper > v_max):
+                continue
+            bin_class = value
+        classes.append(bin_class)
+    return edges, classes
+
+
+def reclassify(input_raster, ranges, block_size=1048576):
+    """Reclassify a raster according to some ranges.
 
     For instance if you want to classify like this table :
             Original Value     |   Class
@@ -49,6 +117,11 @@ def reclassify(input_raster, ranges):
         ranges[3] = [0.5, 5]
         ranges[6] = [5, None]
 
+    The raster is read and written by strips of rows, and each strip is
+    classified at once against the sorted edges of the ranges. The output
+    uses the smallest integer type able to store the classes. Cells which
+    have no data or are in no range get the no data value of the output.
+
     .. versionadded:: 3.4
 
     :param input_raster: The file path to the raster to reclassify.
@@ -57,6 +130,9 @@ def reclassify(input_raster, ranges):
     :param ranges: The ranges as a OrderedDict.
     :type ranges: OrderedDict
 
+    :param block_size: The approximate number of cells read at once.
+    :type block_size: int
+
     :return: The file path to the reclassified raster.
     :rtype: str
     """
@@ -64,30 +140,46 @@ def reclassify(input_raster, ranges):
     output_raster = unique_filename(
         suffix='-reclassified.tiff', dir=temporary_dir)
 
+    edges, bin_classes = class_lookup(ranges)
+    gdal_type, numpy_type, no_data = class_data_type(ranges.keys())
+    edges = np.array(edges, dtype=np.float64)
+    lookup = np.array(
+        [no_data if value is None else value for value in bin_classes],
+        dtype=numpy_type)
+
     driver = gdal.GetDriverByName('GTiff')
 
     raster_file = gdal.Open(input_raster)
     band = raster_file.GetRasterBand(1)
-    source = band.ReadAsArray()
-    destination = source.copy()
-
-    for value, interval in ranges.iteritems():
-        v_min = interval[0]
-        v_max = interval[1]
-
-        if v_min is None:
-            destination[np.where(source <= v_max)] = value
-
-        if v_max is None:
-            destination[np.where(source > v_min)] = value
-
-        if v_min < v_max:
-            destination[np.where((v_min < source) & (source <= v_max))] = value
+    source_no_data = band.GetNoDataValue()
+    width = raster_file.RasterXSize
+    height = raster_file.RasterYSize
 
     # Create the new file.
-    output_file = driver.Create(
-        output_raster, raster_file.RasterXSize, raster_file.RasterYSize, 1)
-    output_file.GetRasterBand(1).WriteArray(destination)
+    output_file = driver.Create(output_raster, width, height, 1, gdal_type)
+    output_band = output_file.GetRasterBand(1)
+    output_band.SetNoDataValue(no_data)
+
+    # Read whole blocks of the source at once
+    block_height = band.GetBlockSize()[1]
+    rows = max(1, block_size // width)
+    rows = max(block_height, rows - rows % block_height)
+
+    for row in xrange(0, height, rows):
+        source = band.ReadAsArray(0, row, width, min(rows, height - row))
+        # Compare at the precision of the source, as a value of 0.2 in a
+        # float32 raster is above the float64 edge 0.2.
+        source_edges = edges
+        if np.issubdtype(source.dtype, np.floating):
+            source_edges = edges.astype(source.dtype)
+        destination = lookup[
+            np.searchsorted(source_edges, source, side='left')]
+
+        source_missing = np.isnan(source)
+        if source_no_data is not None:
+            source_missing |= source == source_no_data
+        destination[source_missing] = no_data
+        output_band.WriteArray(destination, 0, row)
 
     # CRS
     output_file.SetProjection(raster_file.GetProjection())
@@ -30,7 +30,10 @@ from safe.test.utilities import test_data_path, get_qgis_app
 from safe.gis.qgis_raster_tools import (
     pixels_to_points,
     polygonize,
-    clip_raster)
+    clip_raster,
+    aligned_window,
+    align_clip_raster,
+    read_raster_window)
 
 QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
 
@@ -151,6 +154,40 @@ class TestQGISRasterTools(unittest.TestCase):
         self.assertEqual(self.raster.height(), new_raster.height())
     test_clip_raster.slow = True
 
+    def test_align_clip_raster(self):
+        """Test the clipped window is aligned with the raster pixels."""
+        # Start a third of a pixel into the 3rd column and 5th row from the
+        # bottom, cover 10 x 6 pixels.
+        xmin = self.extent.xMinimum() + 2.3 * self.x_res
+        ymin = self.extent.yMinimum() + 4.3 * self.y_res
+        extent = [xmin, ymin, xmin + 10 * self.x_res, ymin + 6 * self.y_res]
+
+        column, row, width, height, window_extent = aligned_window(
+            self.raster, extent)
+        self.assertEqual((column, width, height), (2, 10, 6))
+        self.assertEqual(row, self.raster.height() - 4 - 6)
+        self.assertAlmostEqual(
+            window_extent.xMinimum(),
+            self.extent.xMinimum() + 2 * self.x_res)
+        self.assertAlmostEqual(
+            window_extent.yMinimum(),
+            self.extent.yMinimum() + 4 * self.y_res)
+
+        data, data_extent = read_raster_window(self.raster, extent)
+        self.assertEqual(data.shape, (6, 10))
+        self.assertEqual(data_extent, window_extent)
+
+        for use_vrt in [False, True]:
+            small_raster = align_clip_raster(
+                self.raster, extent, use_vrt=use_vrt)
+            self.assertEqual(small_raster.width(), 10)
+            self.assertEqual(small_raster.height(), 6)
+            self.assertAlmostEqual(
+                small_raster.extent().xMinimum(), window_extent.xMinimum())
+            self.assertAlmostEqual(
+                small_raster.extent().yMaximum(), window_extent.yMaximum())
+        self.assertTrue(small_raster.source().endswith('.vrt'))
+
 if __name__ == '__main__':
     suite = unittest.makeSuite(TestQGISRasterTools, 'test')
     runner = unittest.TextTestRunner()
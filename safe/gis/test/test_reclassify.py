@@ -3,9 +3,12 @@
 import unittest
 from collections import OrderedDict
 
+import numpy
+from osgeo import gdal
 from qgis.core import QgsVectorLayer, QgsFeatureRequest
 
-from safe.gis.reclassify_gdal import reclassify_polygonize
+from safe.common.utilities import unique_filename
+from safe.gis.reclassify_gdal import reclassify, reclassify_polygonize
 from safe.test.utilities import test_data_path, get_qgis_app
 QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
 
@@ -55,3 +58,29 @@ class ReclassifyTest(unittest.TestCase):
         expression = '"DN" = \'%s\'' % 11
         request = QgsFeatureRequest().setFilterExpression(expression)
         self.assertEqual(sum(1 for _ in layer.getFeatures(request)), 20)
+
+    def test_reclassify(self):
+        """Test the reclassified raster is compact and keeps no data."""
+        source = numpy.array([
+            [-1.0, 0.2, 0.5, 1.0],
+            [1.2, -9999.0, 2.0, 5.0]], dtype=numpy.float32)
+        raster_path = unique_filename(suffix='.tif')
+        raster = gdal.GetDriverByName('GTiff').Create(
+            raster_path, 4, 2, 1, gdal.GDT_Float32)
+        raster.GetRasterBand(1).SetNoDataValue(-9999)
+        raster.GetRasterBand(1).WriteArray(source)
+        del raster
+
+        ranges = OrderedDict()
+        ranges[1] = [None, 0.2]
+        ranges[2] = [0.2, 1]
+        # Gap between 1 and 1.5
+        ranges[3] = [1.5, None]
+
+        output = gdal.Open(reclassify(raster_path, ranges, block_size=4))
+        band = output.GetRasterBand(1)
+        self.assertEqual(band.DataType, gdal.GDT_Byte)
+        self.assertEqual(band.GetNoDataValue(), 255)
+        self.assertEqual(
+            band.ReadAsArray().tolist(),
+            [[1, 1, 2, 2], [255, 255, 3, 3]])
@@ -15,6 +15,7 @@ __date__ = '27/05/2013'
 __copyright__ = ('Copyright 2012, Australia Indonesia Facility for '
                  'Disaster Reduction')
 
+import json
 import logging
 import time
 
@@ -39,6 +40,9 @@ LOGGER = logging.getLogger('InaSAFE')
 class MessageViewer(QtWebKit.QWebView):
     """A simple message queue"""
     static_message_count = 0
+    # Minimum time in seconds between two updates of the page by dynamic
+    # messages. Messages arriving in between are appended together.
+    update_interval = 0.1
 
     # noinspection PyOldStyleClasses
     def __init__(self, the_parent):
@@ -83,6 +87,17 @@ class MessageViewer(QtWebKit.QWebView):
         # noinspection PyUnresolvedReferences
         self.loadFinished.connect(self.html_loaded_slot)
 
+        # Whether the page shows the messages, so that dynamic messages can
+        # be appended to it rather than reloading it.
+        self._messages_page_flag = False
+        # Dynamic messages not appended to the page yet
+        self._pending_messages = []
+        self._last_update_time = 0
+        self._update_timer = QtCore.QTimer(self)
+        self._update_timer.setSingleShot(True)
+        # noinspection PyUnresolvedReferences
+        self._update_timer.timeout.connect(self.append_pending_messages)
+
     @property
     def impact_path(self):
         """Getter to impact path."""
@@ -183,6 +198,7 @@ class MessageViewer(QtWebKit.QWebView):
         # LOGGER.debug('Static message event %i' % self.static_message_count)
         _ = sender  # we arent using it
         self.dynamic_messages = []
+        self.last_id = 0
         self.static_message = message
         self.show_messages()
 
@@ -216,23 +232,47 @@ class MessageViewer(QtWebKit.QWebView):
         _ = sender  # we arent using it
         self.dynamic_messages.append(message)
         self.dynamic_messages_log.append(message)
-        # Old way (works but causes full page refresh)
-        self.show_messages()
-        return
-
-        # New way add html snippet to end of page, not currently working
-        # self.last_id += 1
-        # message.element_id = str(self.last_id)
-        # # TODO probably we should do some escaping of quotes etc in message
-        # html = message.to_html(in_div_flag=True)
-        # html = html.replace('\'', '\\\'')
-        # # We could run into side effect still if messages contain single
-        # # quotes
-        # LOGGER.debug('HTML: %s' % html)
-        # js = 'document.body.innerHTML += \'%s\'' % html
-        # LOGGER.debug('JAVASCRIPT: %s' % js)
-        # self.page().mainFrame().evaluateJavaScript(js)
-        # self.scrollToDiv()
+        if not self._messages_page_flag:
+            self.show_messages()
+            return
+
+        # Add the html snippet to the end of the page instead of reloading
+        # it, at most once per update interval.
+        self._pending_messages.append(message)
+        remaining = self.update_interval - (
+            time.time() - self._last_update_time)
+        if remaining <= 0:
+            self.append_pending_messages()
+        elif not self._update_timer.isActive():
+            self._update_timer.start(int(remaining * 1000))
+
+    def append_pending_messages(self):
+        """Append the dynamic messages not shown yet to the page."""
+        self._update_timer.stop()
+        if not self._pending_messages:
+            return
+        if not self._messages_page_flag:
+            self.show_messages()
+            return
+
+        html = ''
+        for message in self._pending_messages:
+            if message.element_id is None:
+                self.last_id += 1
+                message.element_id = str(self.last_id)
+            message_html = message.to_html(in_div_flag=True)
+            if message_html is not None:
+                html += message_html
+        self._pending_messages = []
+        self._last_update_time = time.time()
+
+        # json gives a javascript string literal with quotes, backslashes
+        # and line breaks escaped.
+        js = (
+            'document.body.insertAdjacentHTML(\'beforeend\', %s);'
+            'window.scrollTo(0, document.body.scrollHeight);' % json.dumps(
+                html))
+        self.page().mainFrame().evaluateJavaScript(js)
 
     def clear_dynamic_messages_log(self):
         """Clear dynamic message log."""
@@ -240,12 +280,13 @@ class MessageViewer(QtWebKit.QWebView):
 
     def show_messages(self):
         """Show all messages."""
+        self._update_timer.stop()
+        self._pending_messages = []
         string = html_header()
         if self.static_message is not None:
             string += self.static_message.to_html()
 
         # Keep track of the last ID we had so we can scroll to it
-        self.last_id = 0
         for message in self.dynamic_messages:
             if message.element_id is None:
                 self.last_id += 1
@@ -259,6 +300,8 @@ class MessageViewer(QtWebKit.QWebView):
 
         # Set HTML
         self.load_html(HTML_STR_MODE, string)
+        self._messages_page_flag = True
+        self._last_update_time = time.time()
 
     def to_message(self):
         """Collate all message elements to a single message."""
@@ -285,6 +328,7 @@ class MessageViewer(QtWebKit.QWebView):
 
     def save_report_to_html(self):
         """Save report in the dock to html."""
+        self.append_pending_messages()
         html = self.page().mainFrame().toHtml()
         if self.report_path is not None:
             html_to_file(html, self.report_path)
@@ -358,6 +402,10 @@ class MessageViewer(QtWebKit.QWebView):
         """
         # noinspection PyCallByClass,PyTypeChecker,PyArgumentList
         self._html_loaded_flag = False
+        # The new page replaces the messages, pending ones included.
+        self._messages_page_flag = False
+        self._update_timer.stop()
+        self._pending_messages = []
 
         if mode == HTML_FILE_MODE:
             self.setUrl(QtCore.QUrl.fromLocalFile(html))
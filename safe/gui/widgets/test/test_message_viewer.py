@@ -20,6 +20,8 @@ __author__ = 'timlinux'
 import os
 import unittest
 
+from PyQt4 import QtCore
+
 from safe_extras.pydispatch import dispatcher
 from safe.gui.widgets.message_viewer import MessageViewer
 from safe import messaging as m
@@ -72,6 +74,23 @@ class MessageViewerTest(unittest.TestCase):
         text = self.message_viewer.page_to_text()
         self.assertEqual(text, 'Hi\n')
 
+    def test_dynamic_message_burst(self):
+        """Test a burst of dynamic messages is appended to the page."""
+        self.message_viewer.static_message_event(None, m.Message('Start'))
+        for i in range(100):
+            self.message_viewer.dynamic_message_event(
+                None, m.Message('Step \'%s\' "done" \\' % i))
+        # Let the pending messages be appended
+        while self.message_viewer._update_timer.isActive():
+            QtCore.QCoreApplication.processEvents()
+        self.message_viewer.append_pending_messages()
+
+        text = self.message_viewer.page().mainFrame().toPlainText()
+        self.assertIn('Start', text)
+        self.assertIn('Step \'0\' "done" \\', text)
+        self.assertIn('Step \'99\' "done" \\', text)
+        self.assertEqual(text.count('Step'), 100)
+
     def test_static_message(self):
         """Test we can send static messages to the message viewer."""
         self.message_viewer.static_message_event(None, m.Message('Hi'))
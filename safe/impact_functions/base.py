@@ -21,6 +21,7 @@ import numpy
 import logging
 import json
 import os
+from collections import OrderedDict
 
 from socket import gethostname
 import getpass
@@ -63,13 +64,17 @@ from safe.postprocessors.postprocessor_factory import (
 from safe.common.utilities import (
     get_non_conflicting_attribute_name,
     unique_filename,
+    temp_dir,
     verify
 )
 from safe.utilities.utilities import (
     get_error_message,
     replace_accentuated_characters
 )
-from safe.utilities.memory_checker import check_memory_usage
+from safe.utilities.memory_checker import (
+    check_memory_usage,
+    max_cells_in_memory,
+    tile_windows)
 from safe.utilities.i18n import tr
 from safe.utilities.keyword_io import KeywordIO
 from safe.utilities.gis import (
@@ -82,6 +87,8 @@ from safe.utilities.gis import (
     get_optimal_extent)
 from safe.utilities.clipper import adjust_clip_extent, clip_layer
 from safe.storage.safe_layer import SafeLayer
+from safe.storage.raster import Raster
+from safe.storage.projection import DEFAULT_PROJECTION
 from safe.storage.utilities import (
     buffered_bounding_box as get_buffered_extent,
     safe_to_qgis_layer,
@@ -99,6 +106,8 @@ from safe.common.signals import (
     send_analysis_done_signal
 )
 from safe.engine.core import check_data_integrity
+from safe.utilities.metadata import write_iso19115_metadata
+from safe.utilities.profiling import AnalysisProfile
 
 INFO_STYLE = styles.INFO_STYLE
 PROGRESS_UPDATE_STYLE = styles.PROGRESS_UPDATE_STYLE
@@ -113,6 +122,9 @@ class ImpactFunction(object):
 
     # Class properties
     _metadata = ImpactFunctionMetadata
+    # Raster impact functions which implement run_tile and finalise_impact
+    # can be run tile by tile when the analysis does not fit in memory.
+    supports_tiling = False
 
     def __init__(self):
         """Base class constructor.
@@ -161,6 +173,8 @@ class ImpactFunction(object):
         self._show_intermediate_layers = False
         # Force memory.
         self._force_memory = False
+        # Run tile by tile because the analysis does not fit in memory.
+        self._tiled = False
         # Layer produced by the impact function
         self._impact = None
         # The question of the impact function
@@ -179,6 +193,8 @@ class ImpactFunction(object):
         self._provenances = Provenance()
         # Start time
         self._start_time = None
+        # Time and memory used by each step of the analysis
+        self._profile = AnalysisProfile()
 
         self.provenance.append_step(
             'Initialize Impact Function',
@@ -528,6 +544,33 @@ class ImpactFunction(object):
         else:
             raise Exception('force_memory is not a boolean.')
 
+    @property
+    def tiled(self):
+        """Property if the analysis is run tile by tile.
+
+        This is set when validating the analysis, if the memory check fails
+        and the impact function supports tiling.
+
+        :return: The value.
+        :rtype: bool
+        """
+        return self._tiled
+
+    @property
+    def performance(self):
+        """Property for the time and memory used by the analysis steps.
+
+        The figures of the last run are given for each step as wall time
+        and CPU time in seconds and the growth of the peak resident memory
+        of the process in MB.
+
+        .. versionadded:: 3.5
+
+        :returns: Figures for each step in the order they ran.
+        :rtype: OrderedDict
+        """
+        return self._profile.as_dict()
+
     @property
     def impact(self):
         """Property for the impact layer generated by the analysis.
@@ -672,12 +715,18 @@ class ImpactFunction(object):
         This method mustn't be overridden in a child class.
         """
 
+        self._profile = AnalysisProfile()
         try:
-            self._validate()
+            with self._profile.phase('validate'):
+                self._validate()
             self._emit_pre_run_message()
-            self._prepare()
-            self._impact = self._calculate_impact()
-            self._run_aggregator()
+            with self._profile.phase('prepare'):
+                self._prepare()
+            with self._profile.phase('calculate_impact'):
+                self._impact = self._calculate_impact()
+            with self._profile.phase('aggregate'):
+                self._run_aggregator()
+            self._record_performance()
         except ZeroImpactException, e:
             report = m.Message()
             report.add(LOGO_ELEMENT)
@@ -755,11 +804,26 @@ class ImpactFunction(object):
             analysis_error(self, e, context)
             raise e
 
+        self._tiled = False
         if not self.force_memory:
             # Ensure there is enough memory
             result = check_memory_usage(adjusted_geo_extent, cell_size)
             if not result:
-                raise InsufficientMemoryWarning
+                if self.supports_tiling and self.requires_clipping:
+                    # Rather than failing, run the analysis in tiles which
+                    # fit in memory.
+                    self._tiled = True
+                    message = m.Message(
+                        m.Heading(
+                            tr('Running the analysis in tiles'),
+                            **PROGRESS_UPDATE_STYLE),
+                        m.Paragraph(tr(
+                            'The analysis area is too large to be processed '
+                            'at once, so it will be processed in tiles that '
+                            'fit in the available memory.')))
+                    send_dynamic_message(self, message)
+                else:
+                    raise InsufficientMemoryWarning
 
     def _prepare(self):
         """Prepare this impact function for running the analysis.
@@ -946,6 +1010,32 @@ class ImpactFunction(object):
             data=data
         )
 
+    def _record_performance(self):
+        """Add the performance of the analysis steps to the provenance.
+
+        The provenance is written again to the metadata of the impact
+        layer, since the layer is saved before aggregation runs.
+        """
+        performance = self.performance
+        description = ', '.join([
+            '%s: %.3fs wall, %.3fs CPU, %+.1fMB peak memory' % (
+                name,
+                figures['wall_time'],
+                figures['cpu_time'],
+                figures['peak_memory_delta'])
+            for name, figures in performance.iteritems()])
+        self.provenance.append_step(
+            'Performance',
+            description,
+            data=performance)
+        LOGGER.info('Analysis performance: %s' % description)
+
+        impact = self.impact
+        if impact is None or not impact.filename:
+            return
+        impact.keywords['if_provenance'] = self.provenance
+        write_iso19115_metadata(impact.filename, impact.keywords)
+
     def _emit_pre_run_message(self):
         """Inform the user about parameters before starting the processing."""
         title = tr('Processing started')
@@ -1344,10 +1434,17 @@ class ImpactFunction(object):
             return
         try:
             # TODO (ET) check if the aggregator can take a SafeLayer.
-            qgis_impact_layer = safe_to_qgis_layer(self.impact)
-            self.aggregator.extent = extent_to_array(
-                qgis_impact_layer.extent(),
-                qgis_impact_layer.crs())
+            if self.impact.projection == DEFAULT_PROJECTION:
+                # Impact layers are normally geographic already, so we can
+                # take the extent from the data rather than loading it again
+                # as a QGIS layer.
+                west, south, east, north = self.impact.get_bounding_box()
+                self.aggregator.extent = [west, south, east, north]
+            else:
+                qgis_impact_layer = safe_to_qgis_layer(self.impact)
+                self.aggregator.extent = extent_to_array(
+                    qgis_impact_layer.extent(),
+                    qgis_impact_layer.crs())
             self.aggregator.aggregate(self.impact)
         except InvalidGeometryError, e:
             message = get_error_message(e)
@@ -1372,7 +1469,8 @@ class ImpactFunction(object):
         """Carry out any postprocessing required for this impact layer."""
         self._postprocessor_manager = PostprocessorManager(self.aggregator)
         self.postprocessor_manager.function_parameters = self.parameters
-        self.postprocessor_manager.run()
+        with self._profile.phase('postprocess'):
+            self.postprocessor_manager.run()
         send_not_busy_signal(self)
         send_analysis_done_signal(self)
 
@@ -1408,7 +1506,10 @@ class ImpactFunction(object):
         start_time = datetime.now()
 
         # Run the IF. self.run() is defined in each IF.
-        result_layer = self.run()
+        if self.tiled:
+            result_layer = self._run_tiled()
+        else:
+            result_layer = self.run()
 
         self._set_if_provenance()
 
@@ -1518,3 +1619,158 @@ class ImpactFunction(object):
 
         # Return layer object
         return result_layer
+
+    def run_tile(self):
+        """Calculate the impact for the current hazard and exposure rasters.
+
+        Impact functions supporting tiling implement this together with
+        finalise_impact. In a tiled run, the hazard and exposure layers are
+        set to one tile of the analysis at a time.
+
+        .. versionadded:: 3.5
+
+        :returns: A tuple of the impact data for the tile and a dictionary
+            of statistics. Numbers in the statistics are summed over all
+            tiles, booleans are or-ed and dictionaries are merged the same
+            way.
+        :rtype: (numpy.ndarray, dict)
+        """
+        raise NotImplementedError(
+            'You must implement this method in your concrete class to run '
+            'it in tiles.')
+
+    def finalise_impact(self, impact_layer, class_basis, statistics):
+        """Create the impact layer once the impact of all tiles is known.
+
+        .. versionadded:: 3.5
+
+        :param impact_layer: Raster with the impact data of all the tiles.
+            It has the projection and geotransform of the hazard layer.
+        :type impact_layer: Raster
+
+        :param class_basis: Values from the impact data to create the style
+            classes from. They have the same minimum, maximum and smallest
+            positive value as the whole impact data.
+        :type class_basis: numpy.ndarray
+
+        :param statistics: The statistics of all tiles added up.
+        :type statistics: dict
+
+        :returns: The impact layer with its keywords and style set.
+        :rtype: Raster
+        """
+        raise NotImplementedError(
+            'You must implement this method in your concrete class to run '
+            'it in tiles.')
+
+    def _missing_tiling_methods(self):
+        """Find the tiling methods this impact function does not implement.
+
+        .. versionadded:: 3.5
+
+        :returns: Names of the methods of run_tile and finalise_impact
+            which are not overridden.
+        :rtype: list
+        """
+        missing = []
+        for name in ['run_tile', 'finalise_impact']:
+            method = getattr(self.__class__, name).__func__
+            if method is getattr(ImpactFunction, name).__func__:
+                missing.append(name)
+        return missing
+
+    def _run_tiled(self):
+        """Run the impact function tile by tile.
+
+        The hazard and exposure rasters are split into strips of rows which
+        fit in memory. run_tile is called for each strip and its impact is
+        written to a raster on disk. finalise_impact then makes the impact
+        layer from that raster.
+
+        An impact function which sets supports_tiling without implementing
+        both methods is run on the whole rasters instead.
+
+        .. versionadded:: 3.5
+
+        :returns: The impact layer.
+        :rtype: Raster
+        """
+        missing = self._missing_tiling_methods()
+        if missing:
+            LOGGER.warning(
+                '%s supports tiling but does not implement %s, running it '
+                'on the whole rasters.' % (
+                    self.__class__.__name__, ' and '.join(missing)))
+            return self.run()
+
+        hazard = self.hazard
+        exposure = self.exposure
+        hazard_raster = hazard.layer
+        exposure_raster = exposure.layer
+        columns = hazard_raster.columns
+        rows = hazard_raster.rows
+        windows = tile_windows(columns, rows, max_cells_in_memory())
+        LOGGER.debug(
+            'Running %s in %s tiles of %s columns' % (
+                self.__class__.__name__, len(windows), columns))
+
+        impact_path = unique_filename(suffix='.tif', dir=temp_dir('impacts'))
+        driver = gdal.GetDriverByName('GTiff')
+        dataset = driver.Create(
+            impact_path, columns, rows, 1, gdal.GDT_Float64,
+            ['BIGTIFF=IF_SAFER'])
+        dataset.SetProjection(str(hazard_raster.projection))
+        dataset.SetGeoTransform(hazard_raster.get_geotransform())
+        band = dataset.GetRasterBand(1)
+        band.SetNoDataValue(numpy.nan)
+
+        class_basis = []
+        statistics = OrderedDict()
+        try:
+            for index, window in enumerate(windows):
+                x_offset, y_offset, _, _ = window
+                self._callback(index, len(windows), tr('Calculating tiles'))
+                self.hazard = SafeLayer(
+                    hazard_raster.read_window(*window), hazard.name)
+                self.exposure = SafeLayer(
+                    exposure_raster.read_window(*window), exposure.name)
+
+                impact, tile_statistics = self.run_tile()
+                band.WriteArray(impact, x_offset, y_offset)
+                _add_statistics(statistics, tile_statistics)
+
+                # create_classes only depends on these values.
+                finite = impact[~numpy.isnan(impact)]
+                if finite.size:
+                    class_basis.extend([finite.min(), finite.max()])
+                    positive = finite[finite > 0]
+                    if positive.size:
+                        class_basis.append(positive.min())
+        finally:
+            self.hazard = hazard
+            self.exposure = exposure
+            band = None
+            dataset = None
+
+        write_iso19115_metadata(impact_path, {'title': self.hazard.name})
+        impact_layer = Raster(impact_path)
+        return self.finalise_impact(
+            impact_layer, numpy.array(class_basis), statistics)
+
+
+def _add_statistics(totals, statistics):
+    """Add the statistics of a tile to the totals of the previous tiles.
+
+    :param totals: Totals of the previous tiles, updated in place.
+    :type totals: dict
+
+    :param statistics: Statistics of a tile.
+    :type statistics: dict
+    """
+    for key, value in statistics.iteritems():
+        if isinstance(value, dict):
+            _add_statistics(totals.setdefault(key, OrderedDict()), value)
+        elif isinstance(value, bool):
+            totals[key] = totals.get(key, False) or value
+        else:
+            totals[key] = totals.get(key, 0) + value
@@ -157,6 +157,89 @@ def has_no_data(layer_data):
     return numpy.isnan(numpy.sum(layer_data))
 
 
+def population_by_hazard_class(
+        hazard_data,
+        population,
+        thresholds,
+        impact_classes,
+        carry_no_data=False,
+        block_size=1048576):
+    """Count the population in each class of a continuous hazard.
+
+    Cells are put in classes delimited by the increasing thresholds: class
+    0 holds the hazard values below the first threshold, class i the values
+    from thresholds[i - 1] up to thresholds[i] excluded and the last class
+    the values from the last threshold up. An extra class after it holds
+    the cells where the hazard has no data.
+
+    The classes and counts are computed in a single pass over blocks of
+    cells, so the temporary arrays stay small whatever the raster size.
+
+    .. versionadded:: 3.5
+
+    :param hazard_data: The hazard values, with nan for no data.
+    :type hazard_data: numpy.ndarray
+
+    :param population: The population of each cell, with nan for no data.
+        It must have the same shape as hazard_data.
+    :type population: numpy.ndarray
+
+    :param thresholds: Increasing thresholds between the classes.
+    :type thresholds: list
+
+    :param impact_classes: Classes of the cells whose population is kept
+        in the impact array.
+    :type impact_classes: list
+
+    :param carry_no_data: Whether the impact is nan in all cells where the
+        hazard or the population has no data. Otherwise it is only nan for
+        cells of the impact classes without population data.
+    :type carry_no_data: bool
+
+    :param block_size: The number of cells classified at once.
+    :type block_size: int
+
+    :returns: The total population of each class, no data population
+        excluded, with the no data hazard class last, and the population
+        of the impact classes for each cell, 0 elsewhere.
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    thresholds = numpy.asarray(thresholds, dtype=numpy.float64)
+    no_data_class = len(thresholds) + 1
+    in_impact = numpy.zeros(no_data_class + 1, dtype=bool)
+    in_impact[list(impact_classes)] = True
+
+    dtype = population.dtype
+    if not numpy.issubdtype(dtype, numpy.floating):
+        dtype = numpy.float64
+    impact = numpy.empty(population.shape, dtype=dtype)
+
+    hazard_cells = hazard_data.reshape(-1)
+    population_cells = population.reshape(-1)
+    impact_cells = impact.reshape(-1)
+    counts = numpy.zeros(no_data_class + 1)
+    for start in xrange(0, hazard_cells.size, block_size):
+        block = slice(start, start + block_size)
+        hazard_block = hazard_cells[block]
+        population_block = population_cells[block]
+
+        classes = numpy.digitize(hazard_block, thresholds)
+        hazard_no_data = numpy.isnan(hazard_block)
+        classes[hazard_no_data] = no_data_class
+        population_no_data = numpy.isnan(population_block)
+        counts += numpy.bincount(
+            classes,
+            weights=numpy.where(population_no_data, 0, population_block),
+            minlength=no_data_class + 1)
+
+        impact_block = numpy.where(
+            in_impact[classes], population_block, 0)
+        if carry_no_data:
+            impact_block[hazard_no_data | population_no_data] = numpy.nan
+        impact_cells[block] = impact_block
+    return counts, impact
+
+
 def get_key_for_value(value, value_map):
     """Obtain the key of a value from a value map.
 
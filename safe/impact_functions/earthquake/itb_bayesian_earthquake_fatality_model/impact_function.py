@@ -28,6 +28,29 @@ from safe.impact_functions.earthquake\
     .itb_bayesian_earthquake_fatality_model.metadata_definitions import \
     ITBBayesianFatalityMetadata
 
+# Fatality rate tables keyed on the path of the csv file. They are loaded
+# once per process and shared by every instance of the impact function.
+_FATALITY_RATE_TABLES = {}
+
+
+def load_fatality_rate_table(path):
+    """Load a table of simulated fatality rates, reusing a loaded copy.
+
+    :param path: Path to the csv file with one simulation per row and one
+        column per MMI level from 4 upwards.
+    :type path: str
+
+    :returns: The fatality rates. The array is read only as it is shared.
+    :rtype: numpy.ndarray
+    """
+    try:
+        return _FATALITY_RATE_TABLES[path]
+    except KeyError:
+        table = numpy.loadtxt(path, dtype=float, delimiter=',')
+        table.setflags(write=False)
+        _FATALITY_RATE_TABLES[path] = table
+        return table
+
 
 class ITBBayesianFatalityFunction(ITBFatalityFunction):
     # noinspection PyUnresolvedReferences
@@ -74,7 +97,7 @@ class ITBBayesianFatalityFunction(ITBFatalityFunction):
         parent_directory, _ = os.path.split(metadata_file_path)
         file_ = os.path.join(
             parent_directory, self.hardcoded_parameters['fatality_rate_file'])
-        fatality_ = numpy.loadtxt(file_, dtype=float, delimiter=',')
+        fatality_ = load_fatality_rate_table(file_)
         nsims = len(fatality_)
         fatality_rate = {}
         for mmi in mmi_range[:2]:  # mmi < 4
@@ -97,10 +120,10 @@ class ITBBayesianFatalityFunction(ITBFatalityFunction):
         :rtype: list(float) """
 
         magnitude_bin = self.hardcoded_parameters['magnitude_bin']
-        nsamples = float(len(total_fatalities))
+        # Fraction of the simulations below each bin, for all bins at once
+        samples = numpy.ravel(total_fatalities)[:, numpy.newaxis]
         cprob = numpy.ones(len(magnitude_bin) + 1)
-        for j, val in enumerate(magnitude_bin):
-            cprob[j] = numpy.sum(total_fatalities < val) / nsamples
+        cprob[:-1] = numpy.mean(samples < magnitude_bin, axis=0)
 
         prob = numpy.hstack((cprob[0], numpy.diff(cprob))) * 100.0
         return self.round_to_sum(prob)
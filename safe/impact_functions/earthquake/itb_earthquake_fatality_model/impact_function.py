@@ -172,6 +172,47 @@ class ITBFatalityFunction(
         assert(array_sum == int(numpy.sum(floor_array)))
         return list(floor_array)
 
+    def compute_exposed_population(self, hazard, exposure):
+        """Sum the exposed population for each MMI class in one pass.
+
+        A cell belongs to the class of a given MMI level when its hazard
+        value lies in (mmi - step, mmi + step]. The levels of mmi_range are
+        expected to be consecutive so that the classes do not overlap.
+
+        :param hazard: Ground shaking grid in MMI.
+        :type hazard: numpy.ndarray
+
+        :param exposure: Population grid with the same shape as the hazard.
+        :type exposure: numpy.ndarray
+
+        :returns: A tuple of the exposed population for each level of
+            mmi_range and the population grid of cells in any MMI class
+            (0 elsewhere and where there is no data).
+        :rtype: (numpy.ndarray, numpy.ndarray)
+        """
+        mmi_range = self.hardcoded_parameters['mmi_range']
+        step = self.hardcoded_parameters['step']
+        edges = numpy.array(
+            [mmi - step for mmi in mmi_range] + [mmi_range[-1] + step])
+
+        # Class index i means edges[i - 1] < hazard <= edges[i]. NaN hazard
+        # values compare false with the edges so we mask them explicitly.
+        # numpy.digitize only takes right=True since numpy 1.10.
+        classes = numpy.searchsorted(edges, hazard.ravel(), side='left')
+        in_range = (classes > 0) & (classes < len(edges))
+        in_range &= ~numpy.isnan(hazard.ravel())
+
+        population = numpy.nan_to_num(exposure.ravel())
+        exposed = numpy.bincount(
+            classes[in_range],
+            weights=population[in_range],
+            minlength=len(edges))[1:len(edges)]
+
+        # Sum up numbers for map
+        # We need to use matrices here and not just numbers #2235
+        mask = numpy.where(in_range, population, 0).reshape(hazard.shape)
+        return exposed, mask
+
     def action_checklist(self):
         """Action checklist for the itb earthquake fatality report.
 
@@ -259,23 +300,18 @@ class ITBFatalityFunction(
         # Population Density
         exposure = self.exposure.layer.get_data(scaling=True)
 
-        # Calculate people affected by each MMI level
+        # Calculate people affected by each MMI level in a single pass
         mmi_range = self.hardcoded_parameters['mmi_range']
+        exposed_per_class, mask = self.compute_exposed_population(
+            hazard, exposure)
+
         number_of_exposed = {}
         number_of_displaced = {}
         number_of_fatalities = {}
         # Calculate fatality rates for observed Intensity values (hazard
         # based on ITB power model
-        mask = numpy.zeros(hazard.shape)
-        for mmi in mmi_range:
-            # Identify cells where MMI is in class i and
-            # count people affected by this shake level
-            step = self.hardcoded_parameters['step']
-            mmi_matches = numpy.where(
-                (hazard > mmi - step) * (hazard <= mmi + step), exposure, 0)
-
+        for mmi, exposed in zip(mmi_range, exposed_per_class):
             # Calculate expected number of fatalities per level
-            exposed = numpy.nansum(mmi_matches)
             fatalities = fatality_rate[mmi] * exposed
 
             # Calculate expected number of displaced people per level
@@ -287,12 +323,6 @@ class ITBFatalityFunction(
             # displacements = numpy.where(
             #    displacements > fatalities, displacements - fatalities, 0)
 
-            # Sum up numbers for map
-            # We need to use matrices here and not just numbers #2235
-            # filter out NaN to avoid overflow additions
-            mmi_matches = numpy.nan_to_num(mmi_matches)
-            mask += mmi_matches   # Displaced
-
             # Generate text with result for this study
             # This is what is used in the real time system exposure table
             number_of_exposed[mmi] = exposed
@@ -53,6 +53,21 @@ class TestITBEarthquakeFatalityFunction(unittest.TestCase):
             self.assertAlmostEqual(
                 expected_result[item], result[item], places=4)
 
+    def test_compute_exposed_population(self):
+        impact_function = ITBFatalityFunction.instance()
+        hazard = numpy.array([
+            [1.5, 2.0, 2.5, 3.4],
+            [7.6, 10.5, 10.6, numpy.nan]])
+        exposure = numpy.array([
+            [1.0, 2.0, 4.0, numpy.nan],
+            [8.0, 16.0, 32.0, 64.0]])
+        exposed, mask = impact_function.compute_exposed_population(
+            hazard, exposure)
+        numpy.testing.assert_array_equal(
+            exposed, [6.0, 0, 0, 0, 0, 0, 8.0, 0, 16.0])
+        numpy.testing.assert_array_equal(
+            mask, [[0, 2.0, 4.0, 0], [8.0, 16.0, 0, 0]])
+
     def test_run(self):
         """TestITEarthquakeFatalityFunction: Test running the IF."""
         # FIXME(Hyeuk): test requires more realistic hazard and population data
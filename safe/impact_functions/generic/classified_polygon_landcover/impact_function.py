@@ -41,13 +41,83 @@ from safe.impact_functions.generic.classified_polygon_landcover\
     .metadata_definitions \
     import ClassifiedPolygonHazardLandCoverFunctionMetadata
 from safe.impact_reports.land_cover_report_mixin import LandCoverReportMixin
+from safe.gis.qgis_vector_tools import prepare_geometry
+from safe.utilities.gis import union_geometries
+
+
+def _hazard_class_index(
+        hazard, extent_hazard, hazard_to_exposure, hazard_class_attribute,
+        hazard_value_to_class):
+    """Dissolve the hazard polygons of each class and index their parts.
+
+    This function is used by GenericOnLandcover and TsunamiOnLandcover.
+
+    :param hazard: The hazard polygon layer.
+    :type hazard: QgsVectorLayer
+
+    :param extent_hazard: The analysis extent in the hazard CRS.
+    :type extent_hazard: QgsRectangle
+
+    :param hazard_to_exposure: Transform from the hazard to the exposure CRS.
+    :type hazard_to_exposure: QgsCoordinateTransform
+
+    :param hazard_class_attribute: The attribute with the hazard values.
+    :type hazard_class_attribute: str
+
+    :param hazard_value_to_class: The hazard class of each hazard value.
+    :type hazard_value_to_class: dict
+
+    :returns: A spatial index of the parts of the dissolved classes and, by
+        part id, the hazard class, the geometry in the exposure CRS and the
+        prepared geometry of the part. Parts of a class do not overlap.
+    :rtype: (QgsSpatialIndex, dict)
+    """
+    request = QgsFeatureRequest(extent_hazard)
+    request.setSubsetOfAttributes(
+        [hazard_class_attribute], hazard.pendingFields())
+    class_geometries = OrderedDict()
+    for f in hazard.getFeatures(request):
+        geometry = QgsGeometry(f.geometry())
+        geometry.transform(hazard_to_exposure)
+        hazard_type = hazard_value_to_class.get(f[hazard_class_attribute])
+        class_geometries.setdefault(hazard_type, []).append(geometry)
+
+    hazard_index = QgsSpatialIndex()
+    hazard_parts = {}
+    for hazard_type, geometries in class_geometries.iteritems():
+        dissolved = union_geometries(geometries)
+        if dissolved is None or dissolved.isGeosEmpty():
+            # GEOS could not dissolve them, e.g. invalid geometries
+            LOGGER.warning(
+                'Could not dissolve the hazard zones of class %s' %
+                hazard_type)
+            parts = geometries
+        else:
+            parts = dissolved.asGeometryCollection()
+        for part in parts:
+            part_feature = QgsFeature(len(hazard_parts))
+            part_feature.setGeometry(part)
+            hazard_index.insertFeature(part_feature)
+            hazard_parts[part_feature.id()] = (
+                hazard_type, part, prepare_geometry(part))
+    return hazard_index, hazard_parts
 
 
 def _calculate_landcover_impact(
-        exposure, extent_exposure, extent_exposure_geom,
-        hazard_class_attribute, hazard_features, hazard_index,
-        hazard_value_to_class, impact_fields, writer):
-    """This function is used by GenericOnLandcover and TsunamiOnLandcover."""
+        exposure, extent_exposure, extent_exposure_geom, hazard_index,
+        hazard_parts, impact_fields, writer):
+    """This function is used by GenericOnLandcover and TsunamiOnLandcover.
+
+    Each exposure polygon is written once for each hazard class it is in,
+    with the part of it in the class.
+
+    :param hazard_index: The spatial index of the hazard class parts.
+    :type hazard_index: QgsSpatialIndex
+
+    :param hazard_parts: The hazard class parts as given by
+        _hazard_class_index.
+    :type hazard_parts: dict
+    """
 
     for f in exposure.getFeatures(QgsFeatureRequest(extent_exposure)):
         geometry = f.geometry()
@@ -56,49 +126,44 @@ def _calculate_landcover_impact(
         if not extent_exposure.contains(bbox):
             geometry = geometry.intersection(extent_exposure_geom)
 
-        # find possible intersections with hazard layer
-        impacted_geometries = []
-        for hazard_id in hazard_index.intersects(bbox):
-            hazard_id = hazard_features[hazard_id]
-            hazard_geometry = hazard_id.geometry()
-            impact_geometry = geometry.intersection(hazard_geometry)
+        # find the pieces of the exposure polygon in each hazard class
+        class_pieces = OrderedDict()
+        contained_classes = set()
+        for part_id in sorted(hazard_index.intersects(bbox)):
+            hazard_type, part, engine = hazard_parts[part_id]
+            if hazard_type in contained_classes:
+                continue
+            if engine is not None:
+                if not engine.intersects(geometry.geometry()):
+                    continue
+                if engine.contains(geometry.geometry()):
+                    # the other parts of the class are outside the polygon
+                    contained_classes.add(hazard_type)
+                    class_pieces[hazard_type] = [QgsGeometry(geometry)]
+                    continue
+
+            impact_geometry = geometry.intersection(part)
             if not impact_geometry:
                 LOGGER.warning(
-                    'Impact geometry is None for hazard_id %s' % hazard_id)
+                    'Impact geometry is None for hazard class %s' %
+                    hazard_type)
                 continue
             if not impact_geometry.wkbType() == QGis.WKBPolygon and \
                     not impact_geometry.wkbType() == QGis.WKBMultiPolygon:
                 continue  # no intersection found
-
-            hazard_value = hazard_id[hazard_class_attribute]
-            hazard_type = hazard_value_to_class.get(hazard_value)
-
-            # write the impacted geometry
+            class_pieces.setdefault(hazard_type, []).append(impact_geometry)
+
+        # write the impacted geometry, one for each hazard class
+        for hazard_type, pieces in class_pieces.iteritems():
+            if len(pieces) == 1:
+                impact_geometry = pieces[0]
+            else:
+                impact_geometry = union_geometries(pieces)
             f_impact = QgsFeature(impact_fields)
             f_impact.setGeometry(impact_geometry)
             f_impact.setAttributes(f.attributes() + [hazard_type])
             writer.addFeature(f_impact)
 
-            impacted_geometries.append(impact_geometry)
-
-            # TODO: uncomment if not affected polygons should be written
-            # # Make sure the geometry we work with is valid, otherwise geom.
-            # # processing operations (especially difference) may fail.
-            # # Validity checking is a slow operation, it would be better if we
-            # # could assume that all geometries are valid...
-            # if not geometry.isGeosValid():
-            #     geometry = geometry.buffer(0, 0)
-            #
-            # # write also not affected part of the exposure's feature
-            # geometry_out = geometry.difference(
-            #     QgsGeometry.unaryUnion(impacted_geometries))
-            # if geometry_out and (geometry_out.wkbType() == QGis.WKBPolygon or
-            #         geometry_out.wkbType() == QGis.WKBMultiPolygon):
-            #     f_out = QgsFeature(impact_fields)
-            #     f_out.setGeometry(geometry_out)
-            #     f_out.setAttributes(f.attributes()+[self._not_affected_value])
-            #     writer.addFeature(f_out)
-
 
 class ClassifiedPolygonHazardLandCoverFunction(ClassifiedVHClassifiedVE):
 
@@ -198,13 +263,10 @@ class ClassifiedPolygonHazardLandCoverFunction(ClassifiedVHClassifiedVE):
         extent_exposure = wgs84_to_exposure.transformBoundingBox(extent)
         extent_exposure_geom = QgsGeometry.fromRect(extent_exposure)
 
-        # make spatial index of hazard
-        hazard_index = QgsSpatialIndex()
-        hazard_features = {}
-        for f in hazard.getFeatures(QgsFeatureRequest(extent_hazard)):
-            f.geometry().transform(hazard_to_exposure)
-            hazard_index.insertFeature(f)
-            hazard_features[f.id()] = QgsFeature(f)
+        # dissolve the hazard zones of each class and index them
+        hazard_index, hazard_parts = _hazard_class_index(
+            hazard, extent_hazard, hazard_to_exposure,
+            self.hazard_class_attribute, hazard_value_to_class)
 
         # create impact layer
         filename = unique_filename(suffix='.shp')
@@ -217,8 +279,7 @@ class ClassifiedPolygonHazardLandCoverFunction(ClassifiedVHClassifiedVE):
         # Iterate over all exposure polygons and calculate the impact.
         _calculate_landcover_impact(
             exposure, extent_exposure, extent_exposure_geom,
-            self.hazard_class_attribute, hazard_features, hazard_index,
-            hazard_value_to_class, impact_fields, writer)
+            hazard_index, hazard_parts, impact_fields, writer)
 
         del writer
         impact_layer = QgsVectorLayer(filename, 'Impacted Land Cover', 'ogr')
@@ -13,15 +13,53 @@ Contact : ole.moller.nielsen@gmail.com
 """
 
 import unittest
-from qgis.core import QgsVectorLayer
+from qgis.core import (
+    QGis,
+    QgsCoordinateTransform,
+    QgsFeature,
+    QgsField,
+    QgsGeometry,
+    QgsRectangle,
+    QgsVectorFileWriter,
+    QgsVectorLayer)
+from PyQt4.QtCore import QVariant
 
 from safe.test.utilities import get_qgis_app, test_data_path
 QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
 
 from safe.impact_functions.generic.classified_polygon_landcover. \
-    impact_function import ClassifiedPolygonHazardLandCoverFunction
+    impact_function import (
+        ClassifiedPolygonHazardLandCoverFunction,
+        _calculate_landcover_impact,
+        _hazard_class_index)
 from safe.impact_functions.impact_function_manager import ImpactFunctionManager
 from safe.storage.utilities import safe_to_qgis_layer
+from safe.common.utilities import unique_filename
+
+
+def polygon_layer(field, polygons):
+    """Create a memory polygon layer with one string attribute.
+
+    :param field: The name of the attribute.
+    :type field: str
+
+    :param polygons: The attribute value and the extent of each polygon.
+    :type polygons: list
+
+    :returns: The memory layer.
+    :rtype: QgsVectorLayer
+    """
+    layer = QgsVectorLayer(
+        'Polygon?crs=EPSG:3857&field=%s:string' % field, field, 'memory')
+    features = []
+    for value, extent in polygons:
+        feature = QgsFeature(layer.pendingFields())
+        feature.setGeometry(QgsGeometry.fromRect(QgsRectangle(*extent)))
+        feature.setAttributes([value])
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+    layer.updateExtents()
+    return layer
 
 
 class TestClassifiedPolygonLandCoverFunction(unittest.TestCase):
@@ -74,6 +112,43 @@ class TestClassifiedPolygonLandCoverFunction(unittest.TestCase):
             msg = '%s is different than %s, I got %s' % (key, value, result)
             self.assertEqual(value, result, msg)
 
+    def test_overlapping_hazard_zones(self):
+        """Test the area in overlapping zones of a class is counted once."""
+        exposure = polygon_layer('FCODE', [('Forest', [0, 0, 10, 10])])
+        hazard = polygon_layer('level', [
+            ('high', [0, 0, 6, 10]),
+            ('high', [3, 0, 8, 10]),
+            ('low', [8, 0, 12, 10])])
+        hazard_value_to_class = {
+            'high': 'High Hazard Zone', 'low': 'Low Hazard Zone'}
+
+        extent = QgsRectangle(-1, -1, 20, 20)
+        hazard_index, hazard_parts = _hazard_class_index(
+            hazard, extent, QgsCoordinateTransform(hazard.crs(), hazard.crs()),
+            'level', hazard_value_to_class)
+
+        filename = unique_filename(suffix='.shp')
+        impact_fields = exposure.dataProvider().fields()
+        impact_fields.append(QgsField('INUNDATED', QVariant.String))
+        writer = QgsVectorFileWriter(
+            filename, 'utf-8', impact_fields, QGis.WKBPolygon, exposure.crs())
+        _calculate_landcover_impact(
+            exposure, extent, QgsGeometry.fromRect(extent), hazard_index,
+            hazard_parts, impact_fields, writer)
+        del writer
+
+        impact = QgsVectorLayer(filename, 'Impact', 'ogr')
+        features = {}
+        for f in impact.getFeatures():
+            type_tuple = f['FCODE'], f['INUNDATED']
+            self.assertNotIn(type_tuple, features)
+            features[type_tuple] = round(f.geometry().area(), 1)
+        expected_features = {
+            (u'Forest', u'High Hazard Zone'): 80.0,
+            (u'Forest', u'Low Hazard Zone'): 20.0,
+        }
+        self.assertEqual(expected_features, features)
+
     def test_keywords(self):
 
         exposure_keywords = {
@@ -20,6 +20,8 @@ __revision__ = '$Format:%H$'
 __copyright__ = ('Copyright 2014, Australia Indonesia Facility for '
                  'Disaster Reduction')
 
+from collections import OrderedDict
+
 import numpy
 
 from safe.impact_functions.generic\
@@ -31,7 +33,8 @@ from safe.impact_functions.impact_function_manager import ImpactFunctionManager
 from safe.impact_functions.core import (
     population_rounding,
     has_no_data,
-    no_population_impact_message
+    no_population_impact_message,
+    population_by_hazard_class
 )
 from safe.storage.raster import Raster
 from safe.utilities.i18n import tr
@@ -53,6 +56,7 @@ class ContinuousHazardPopulationFunction(
     # noinspection PyUnresolvedReferences
     """Plugin for impact of population as derived by continuous hazard."""
     _metadata = ContinuousHazardPopulationMetadata()
+    supports_tiling = True
 
     def __init__(self):
         super(ContinuousHazardPopulationFunction, self).__init__()
@@ -110,7 +114,23 @@ class ContinuousHazardPopulationFunction(
           Map of population exposed to high category
           Table with number of people in each category
         """
+        impacted_exposure, statistics = self.run_tile()
+
+        impact_layer = Raster(
+            data=impacted_exposure,
+            projection=self.hazard.layer.get_projection(),
+            geotransform=self.hazard.layer.get_geotransform())
+
+        return self.finalise_impact(
+            impact_layer, impacted_exposure.flat[:], statistics)
 
+    def run_tile(self):
+        """Count the people exposed to each category of the hazard.
+
+        :returns: A tuple of the population in a hazard zone for each cell
+            and of the population counts.
+        :rtype: (numpy.ndarray, dict)
+        """
         thresholds = [
             p.value for p in self.parameters['Categorical thresholds'].value]
 
@@ -126,43 +146,59 @@ class ContinuousHazardPopulationFunction(
             raise FunctionParametersError(
                 'Each threshold should be larger than the previous.')
 
-        # The 3 categories
-        low_t = thresholds[0]
-        medium_t = thresholds[1]
-        high_t = thresholds[2]
+        # The hazard classes are low below the first threshold, medium up
+        # to the second one and high up to and including the third one
+        high_t = numpy.nextafter(thresholds[2], numpy.inf)
+        class_thresholds = [thresholds[0], thresholds[1], high_t]
 
         # Extract data as numeric arrays
         hazard_data = self.hazard.layer.get_data(nan=True)  # Category
-        if has_no_data(hazard_data):
-            self.no_data_warning = True
+        no_data = has_no_data(hazard_data)
 
         # Calculate impact as population exposed to each category
         exposure_data = self.exposure.layer.get_data(nan=True, scaling=True)
-        if has_no_data(exposure_data):
-            self.no_data_warning = True
+        no_data = no_data or has_no_data(exposure_data)
 
-        # Make 3 data for each zone. Get the value of the exposure if the
-        # exposure is in the hazard zone, else just assign 0
-        low_exposure = numpy.where(hazard_data < low_t, exposure_data, 0)
-        medium_exposure = numpy.where(
-            (hazard_data >= low_t) & (hazard_data < medium_t),
-            exposure_data, 0)
-        high_exposure = numpy.where(
-            (hazard_data >= medium_t) & (hazard_data <= high_t),
-            exposure_data, 0)
-        impacted_exposure = low_exposure + medium_exposure + high_exposure
+        # Get the value of the exposure if the exposure is in a hazard
+        # zone, else just assign 0
+        counts, impacted_exposure = population_by_hazard_class(
+            hazard_data, exposure_data, class_thresholds, [0, 1, 2])
 
         # Count totals
-        self.total_population = int(numpy.nansum(exposure_data))
-        self.affected_population[
-            tr('Population in high hazard areas')] = int(
-                numpy.nansum(high_exposure))
-        self.affected_population[
-            tr('Population in medium hazard areas')] = int(
-                numpy.nansum(medium_exposure))
-        self.affected_population[
-            tr('Population in low hazard areas')] = int(
-                numpy.nansum(low_exposure))
+        affected_population = OrderedDict([
+            (tr('Population in high hazard areas'), counts[2]),
+            (tr('Population in medium hazard areas'), counts[1]),
+            (tr('Population in low hazard areas'), counts[0])
+        ])
+        statistics = {
+            'no_data': bool(no_data),
+            'total_population': counts.sum(),
+            'affected_population': affected_population
+        }
+        return impacted_exposure, statistics
+
+    def finalise_impact(self, impact_layer, class_basis, statistics):
+        """Set the keywords and the style of the impact layer.
+
+        :param impact_layer: Raster with the population in a hazard zone.
+        :type impact_layer: Raster
+
+        :param class_basis: Values to create the style classes from.
+        :type class_basis: numpy.ndarray
+
+        :param statistics: The population counts from run_tile.
+        :type statistics: dict
+
+        :returns: The impact layer.
+        :rtype: Raster
+        """
+        if statistics['no_data']:
+            self.no_data_warning = True
+
+        self.total_population = int(statistics['total_population'])
+        for category, population in \
+                statistics['affected_population'].iteritems():
+            self.affected_population[category] = int(population)
         self.unaffected_population = (
             self.total_population - self.total_affected_population)
 
@@ -182,7 +218,7 @@ class ContinuousHazardPopulationFunction(
         colours = [
             '#FFFFFF', '#38A800', '#79C900', '#CEED00',
             '#FFCC00', '#FF6600', '#FF0000', '#7A0000']
-        classes = create_classes(impacted_exposure.flat[:], len(colours))
+        classes = create_classes(class_basis, len(colours))
         interval_classes = humanize_class(classes)
         style_classes = []
 
@@ -225,14 +261,9 @@ class ContinuousHazardPopulationFunction(
 
         impact_layer_keywords = self.generate_impact_keywords(extra_keywords)
 
-        # Create raster object and return
-        impact_layer = Raster(
-            data=impacted_exposure,
-            projection=self.hazard.layer.get_projection(),
-            geotransform=self.hazard.layer.get_geotransform(),
-            name=self.metadata().key('layer_name'),
-            keywords=impact_layer_keywords,
-            style_info=style_info)
+        impact_layer.keywords = impact_layer_keywords
+        impact_layer.style_info = style_info
+        impact_layer.set_name(self.metadata().key('layer_name'))
 
         impact_layer.impact_data = impact_data
         self._impact = impact_layer
@@ -17,9 +17,12 @@ __filename__ = 'test_classified_hazard_building'
 __date__ = '24/03/15'
 
 import unittest
+import numpy
 from safe.test.utilities import test_data_path, get_qgis_app
 QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
 
+from safe.impact_functions import base
+
 from safe.common.utilities import OrderedDict
 from safe.impact_functions.impact_function_manager\
     import ImpactFunctionManager
@@ -70,6 +73,71 @@ class TestContinuousHazardPopulationFunction(unittest.TestCase):
         self.assertEqual(total_needs_weekly['Family Kits'], 24)
         self.assertEqual(total_needs_single['Toilets'], 6)
 
+    def test_run_tiled(self):
+        """Running tile by tile gives the same impact as a single run."""
+        hazard_path = test_data_path(
+            'hazard', 'continuous_flood_20_20.asc')
+        exposure_path = test_data_path(
+            'exposure', 'pop_binary_raster_20_20.asc')
+
+        function = ContinuousHazardPopulationFunction.instance()
+        function.hazard = SafeLayer(read_layer(hazard_path))
+        function.exposure = SafeLayer(read_layer(exposure_path))
+        expected = function.run()
+
+        tiled_function = ContinuousHazardPopulationFunction.instance()
+        tiled_function.hazard = SafeLayer(read_layer(hazard_path))
+        tiled_function.exposure = SafeLayer(read_layer(exposure_path))
+        # Make strips of 3 rows from the 20 x 20 rasters.
+        max_cells_in_memory = base.max_cells_in_memory
+        base.max_cells_in_memory = lambda: 60
+        try:
+            impact = tiled_function._run_tiled()
+        finally:
+            base.max_cells_in_memory = max_cells_in_memory
+
+        numpy.testing.assert_array_almost_equal(
+            impact.get_data(), expected.get_data())
+        self.assertEqual(
+            impact.get_geotransform(), expected.get_geotransform())
+        self.assertEqual(
+            tiled_function.affected_population, function.affected_population)
+        self.assertEqual(
+            tiled_function.total_population, function.total_population)
+        self.assertEqual(
+            impact.get_style_info(), expected.get_style_info())
+        self.assertEqual(
+            impact.keywords['total_needs'], expected.keywords['total_needs'])
+
+    def test_run_tiled_without_tiling_methods(self):
+        """A function without run_tile is run on the whole rasters."""
+        class UntiledFunction(ContinuousHazardPopulationFunction):
+            """Impact function not implementing run_tile."""
+            run_tile = base.ImpactFunction.__dict__['run_tile']
+
+        hazard_path = test_data_path(
+            'hazard', 'continuous_flood_20_20.asc')
+        exposure_path = test_data_path(
+            'exposure', 'pop_binary_raster_20_20.asc')
+
+        function = UntiledFunction.instance()
+        self.assertEqual(function._missing_tiling_methods(), ['run_tile'])
+        function.hazard = SafeLayer(read_layer(hazard_path))
+        function.exposure = SafeLayer(read_layer(exposure_path))
+        max_cells_in_memory = base.max_cells_in_memory
+        base.max_cells_in_memory = lambda: 60
+        try:
+            impact = function._run_tiled()
+        finally:
+            base.max_cells_in_memory = max_cells_in_memory
+
+        expected_function = ContinuousHazardPopulationFunction.instance()
+        expected_function.hazard = SafeLayer(read_layer(hazard_path))
+        expected_function.exposure = SafeLayer(read_layer(exposure_path))
+        expected = expected_function.run()
+        numpy.testing.assert_array_almost_equal(
+            impact.get_data(), expected.get_data())
+
     def test_filter(self):
         """Test filtering IF from layer keywords"""
         hazard_keywords = {
@@ -194,7 +194,7 @@ class ImpactFunctionManager(object):
         :returns: The ID of the impact function specified in its metadata.
         :rtype: str
         """
-        return impact_function.metadata().as_dict().get('id', None)
+        return impact_function.metadata().cached_dict().get('id', None)
 
     @staticmethod
     def get_function_title(impact_function):
@@ -206,7 +206,7 @@ class ImpactFunctionManager(object):
         :returns: The title of the impact function specified in its metadata.
         :rtype: str
         """
-        return impact_function.metadata().as_dict().get('title', None)
+        return impact_function.metadata().cached_dict().get('title', None)
 
     @staticmethod
     def get_function_name(impact_function):
@@ -215,7 +215,7 @@ class ImpactFunctionManager(object):
         :param impact_function: Class of an impact function.
         :type impact_function: safe.impact_functions.base.ImpactFunction
         """
-        return impact_function.metadata().as_dict().get('name', None)
+        return impact_function.metadata().cached_dict().get('name', None)
 
     @staticmethod
     def get_function_type(impact_function):
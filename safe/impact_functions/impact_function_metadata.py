@@ -24,6 +24,9 @@ from safe.definitions import (
     layer_purpose_exposure,
     layer_purpose_hazard)
 
+# Metadata dictionaries by metadata class, see cached_dict.
+_METADATA_DICTS = {}
+
 
 class ImpactFunctionMetadata(object):
     """Abstract metadata class for an impact function.
@@ -130,6 +133,28 @@ class ImpactFunctionMetadata(object):
         raise NotImplementedError(
             'You must implement this method in your concrete class.')
 
+    @classmethod
+    def cached_dict(cls):
+        """Return the metadata dictionary, built once per metadata class.
+
+        .. versionadded:: 3.5
+
+        as_dict builds a new dictionary on each call while the metadata of an
+        impact function never changes, so lookups which only read the
+        metadata use this shared dictionary. It must not be modified, use
+        as_dict to get a copy which can be.
+
+        :returns: A dictionary representing all the metadata for the
+            concrete impact function.
+        :rtype: dict
+        """
+        try:
+            return _METADATA_DICTS[cls]
+        except KeyError:
+            metadata_dict = cls.as_dict()
+            _METADATA_DICTS[cls] = metadata_dict
+            return metadata_dict
+
     @classmethod
     def allowed_subcategories(cls, category=None):
         """Get the list of allowed subcategories for a given category.
@@ -334,7 +359,7 @@ class ImpactFunctionMetadata(object):
         :rtype: dict
 
         """
-        return cls.as_dict().get('layer_requirements', {})
+        return cls.cached_dict().get('layer_requirements', {})
 
     @classmethod
     def get_name(cls):
@@ -344,7 +369,7 @@ class ImpactFunctionMetadata(object):
         :rtype: str
 
         """
-        return cls.as_dict().get('name', '')
+        return cls.cached_dict().get('name', '')
 
     @classmethod
     def key(cls, key):
@@ -32,6 +32,7 @@ from safe.storage.vector import Vector
 from safe.common.utilities import get_utm_epsg
 from safe.common.exceptions import GetDataError
 from safe.gis.qgis_vector_tools import split_by_polygon, clip_by_polygon
+from safe.utilities.gis import union_geometries
 from safe.impact_reports.road_exposure_report_mixin import\
     RoadExposureReportMixin
 
@@ -131,24 +132,25 @@ class FloodPolygonRoadsFunction(
         ################################
 
         hazard_features = self.hazard.layer.getFeatures(request)
-        hazard_poly = None
+        wet_geometries = []
         for feature in hazard_features:
             attributes = feature.attributes()
             if affected_field_index != -1:
                 value = attributes[affected_field_index]
                 if value not in self.hazard_class_mapping[self.wet]:
                     continue
-            if hazard_poly is None:
-                hazard_poly = QgsGeometry(feature.geometry())
-            else:
-                # Make geometry union of inundated polygons
-                # But some feature.geometry() could be invalid, skip them
-                tmp_geometry = hazard_poly.combine(feature.geometry())
-                try:
-                    if tmp_geometry.isGeosValid():
-                        hazard_poly = tmp_geometry
-                except AttributeError:
-                    pass
+            # Some feature.geometry() could be invalid, skip them
+            geometry = QgsGeometry(feature.geometry())
+            if not geometry.isGeosValid():
+                LOGGER.warning(
+                    'Skipping invalid hazard polygon %s' % feature.id())
+                continue
+            wet_geometries.append(geometry)
+
+        # Dissolve the inundated polygons at once
+        hazard_poly = None
+        if wet_geometries:
+            hazard_poly = union_geometries(wet_geometries)
 
         ###############################################
         # END REMARK 1
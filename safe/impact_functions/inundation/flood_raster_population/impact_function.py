@@ -17,7 +17,8 @@ import numpy
 
 from safe.impact_functions.core import (
     population_rounding,
-    has_no_data)
+    has_no_data,
+    population_by_hazard_class)
 from safe.impact_functions.impact_function_manager \
     import ImpactFunctionManager
 from safe.impact_functions.inundation.flood_raster_population\
@@ -148,12 +149,19 @@ class FloodEvacuationRasterHazardFunction(
 
         # Calculate impact as population exposed to depths > max threshold
         population = self.exposure.layer.get_data(nan=True, scaling=True)
-        total = int(numpy.nansum(population))
         if has_no_data(population):
             self.no_data_warning = True
 
-        # merely initialize
-        impact = None
+        # Count the people in each depth class in one pass. The impact is
+        # the population in the deepest class, with the no data values
+        # carried forward to the impact layer.
+        counts, impact = population_by_hazard_class(
+            data,
+            population,
+            thresholds,
+            [len(thresholds)],
+            carry_no_data=True)
+        total = int(counts.sum())
 
         for i, lo in enumerate(thresholds):
             if i == len(thresholds) - 1:
@@ -162,18 +170,15 @@ class FloodEvacuationRasterHazardFunction(
                     'People in >= %.1f m of water') % lo
                 self.impact_category_ordering.append(thresholds_name)
                 self._evacuation_category = thresholds_name
-                impact = medium = numpy.where(data >= lo, population, 0)
             else:
                 # Intermediate thresholds
                 hi = thresholds[i + 1]
                 thresholds_name = tr(
                     'People in %.1f m to %.1f m of water' % (lo, hi))
                 self.impact_category_ordering.append(thresholds_name)
-                medium = numpy.where((data >= lo) * (data < hi), population, 0)
 
             # Count
-            val = int(numpy.nansum(medium))
-            self.affected_population[thresholds_name] = val
+            self.affected_population[thresholds_name] = int(counts[i + 1])
 
         # Put the deepest area in top #2385
         self.impact_category_ordering.reverse()
@@ -181,10 +186,6 @@ class FloodEvacuationRasterHazardFunction(
         self.total_population = total
         self.unaffected_population = total - self.total_affected_population
 
-        # Carry the no data values forward to the impact layer.
-        impact = numpy.where(numpy.isnan(population), numpy.nan, impact)
-        impact = numpy.where(numpy.isnan(data), numpy.nan, impact)
-
         # Count totals
         evacuated = self.total_evacuated
 
@@ -282,7 +282,8 @@ class FloodRasterRoadsFunction(
                 QgsRectangle(*self.requested_extent), geo_crs, hazard_crs)
 
         # Clip hazard raster
-        small_raster = align_clip_raster(self.hazard.layer, viewport_extent)
+        small_raster = align_clip_raster(
+            self.hazard.layer, viewport_extent, use_vrt=True)
 
         # Filter geometry and data using the extent
         ct = QgsCoordinateTransform(
@@ -16,7 +16,8 @@ from safe.impact_functions.bases.continuous_rh_continuous_re import \
     ContinuousRHContinuousRE
 from safe.impact_functions.core import (
     population_rounding,
-    has_no_data
+    has_no_data,
+    population_by_hazard_class
 )
 from safe.impact_functions.impact_function_manager import ImpactFunctionManager
 from safe.impact_functions.inundation\
@@ -126,14 +127,21 @@ class TsunamiEvacuationFunction(
         if has_no_data(population):
             self.no_data_warning = True
 
-        # merely initialize
-        impact = None
+        # Count the people in each depth class in one pass. The impact is
+        # the population in the deepest class, with the no data values
+        # carried forward to the impact layer.
+        counts, impact = population_by_hazard_class(
+            data,
+            population,
+            thresholds,
+            [len(thresholds)],
+            carry_no_data=True)
+
         for i, lo in enumerate(thresholds):
             if i == len(thresholds) - 1:
                 # The last threshold
                 thresholds_name = tr(
                     'People in >= %.1f m of water') % lo
-                impact = medium = numpy.where(data >= lo, population, 0)
                 self.impact_category_ordering.append(thresholds_name)
                 self._evacuation_category = thresholds_name
             else:
@@ -141,21 +149,15 @@ class TsunamiEvacuationFunction(
                 hi = thresholds[i + 1]
                 thresholds_name = tr(
                     'People in %.1f m to %.1f m of water' % (lo, hi))
-                medium = numpy.where((data >= lo) * (data < hi), population, 0)
 
             # Count
-            val = int(numpy.nansum(medium))
-            self.affected_population[thresholds_name] = val
+            self.affected_population[thresholds_name] = int(counts[i + 1])
 
         # Put the deepest area in top #2385
         self.impact_category_ordering.reverse()
 
-        # Carry the no data values forward to the impact layer.
-        impact = numpy.where(numpy.isnan(population), numpy.nan, impact)
-        impact = numpy.where(numpy.isnan(data), numpy.nan, impact)
-
         # Count totals
-        self.total_population = int(numpy.nansum(population))
+        self.total_population = int(counts.sum())
         self.unaffected_population = (
             self.total_population - self.total_affected_population)
 
@@ -15,13 +15,10 @@ from qgis.core import (
     QGis,
     QgsCoordinateReferenceSystem,
     QgsCoordinateTransform,
-    QgsFeature,
-    QgsFeatureRequest,
     QgsField,
     QgsGeometry,
     QgsPoint,
     QgsRectangle,
-    QgsSpatialIndex,
     QgsVectorFileWriter,
     QgsVectorLayer
 )
@@ -33,7 +30,7 @@ from safe.impact_functions.bases.continuous_rh_classified_ve import \
 from safe.impact_functions.inundation.tsunami_raster_landcover.\
     metadata_definitions import (TsunamiRasterHazardLandCoverFunctionMetadata)
 from safe.impact_functions.generic.classified_polygon_landcover.\
-    impact_function import _calculate_landcover_impact
+    impact_function import _calculate_landcover_impact, _hazard_class_index
 from safe.utilities.i18n import tr
 from safe.gis.reclassify_gdal import reclassify_polygonize
 from safe.utilities.utilities import ranges_according_thresholds
@@ -146,7 +143,8 @@ class TsunamiRasterLandcoverFunction(ContinuousRHClassifiedVE):
             viewport_extent = extent_to_geo_array(
                 QgsRectangle(*self.requested_extent), geo_crs, hazard_crs)
 
-        small_raster = align_clip_raster(hazard_layer, viewport_extent)
+        small_raster = align_clip_raster(
+            hazard_layer, viewport_extent, use_vrt=True)
 
         # Create vector features from the flood raster
         hazard_class_attribute = 'hazard'
@@ -171,13 +169,10 @@ class TsunamiRasterLandcoverFunction(ContinuousRHClassifiedVE):
         extent_exposure = wgs84_to_exposure.transformBoundingBox(extent)
         extent_exposure_geom = QgsGeometry.fromRect(extent_exposure)
 
-        # make spatial index of hazard
-        hazard_index = QgsSpatialIndex()
-        hazard_features = {}
-        for f in hazard.getFeatures(QgsFeatureRequest(extent_hazard)):
-            f.geometry().transform(hazard_to_exposure)
-            hazard_index.insertFeature(f)
-            hazard_features[f.id()] = QgsFeature(f)
+        # dissolve the hazard zones of each class and index them
+        hazard_index, hazard_parts = _hazard_class_index(
+            hazard, extent_hazard, hazard_to_exposure,
+            hazard_class_attribute, hazard_value_to_class)
 
         # create impact layer
         filename = unique_filename(suffix='.shp')
@@ -189,8 +184,7 @@ class TsunamiRasterLandcoverFunction(ContinuousRHClassifiedVE):
         # iterate over all exposure polygons and calculate the impact
         _calculate_landcover_impact(
             exposure, extent_exposure, extent_exposure_geom,
-            hazard_class_attribute, hazard_features, hazard_index,
-            hazard_value_to_class, impact_fields, writer)
+            hazard_index, hazard_parts, impact_fields, writer)
 
         del writer
         impact_layer = QgsVectorLayer(filename, 'Impacted Land Cover', 'ogr')
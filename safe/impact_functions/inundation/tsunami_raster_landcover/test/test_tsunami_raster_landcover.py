@@ -53,7 +53,9 @@ class TestClassifiedPolygonLandCoverFunction(unittest.TestCase):
 
         impact = safe_to_qgis_layer(impact)
 
-        self.assertEqual(impact.dataProvider().featureCount(), 72)
+        # One feature for each land cover polygon in each hazard zone. The
+        # cells with no data are in no hazard zone.
+        self.assertEqual(impact.dataProvider().featureCount(), 12)
         features = {}
         exposure_field = function.exposure.keyword('field')
         for f in impact.getFeatures():
@@ -61,18 +63,18 @@ class TestClassifiedPolygonLandCoverFunction(unittest.TestCase):
             features[type_tuple] = round(f.geometry().area(), 1)
 
         expected_features = {
-            (u'Population', u'Dry Zone'): 7977390.3,
-            (u'Population', u'Low Hazard Zone'): 403.8,
-            (u'Population', u'Medium Hazard Zone'): 156692.3,
+            (u'Population', u'Dry Zone'): 3928611.8,
+            (u'Population', u'Low Hazard Zone'): 290138.2,
+            (u'Population', u'Medium Hazard Zone'): 308481.4,
             (u'Population', u'High Hazard Zone'): 298791.1,
-            (u'Population', u'Very High Hazard Zone'): 8884.6,
-            (u'Water', u'Dry Zone'): 403.8,
-            (u'Water', u'Low Hazard Zone'): 65836.7,
-            (u'Water', u'Medium Hazard Zone'): 34746.7,
-            (u'Water', u'High Hazard Zone'): 9310.4,
+            (u'Population', u'Very High Hazard Zone'): 125199.0,
+            (u'Water', u'Dry Zone'): 1557998.7,
+            (u'Water', u'Low Hazard Zone'): 163812.6,
+            (u'Water', u'Medium Hazard Zone'): 121645.7,
+            (u'Water', u'High Hazard Zone'): 58647.1,
             (u'Water', u'Very High Hazard Zone'): 807.7,
-            (u'Meadow', u'Dry Zone'): 2512444.0,
-            (u'Forest', u'Dry Zone'): 1000000.0
+            (u'Meadow', u'Dry Zone'): 2255720.5,
+            (u'Forest', u'Dry Zone'): 997555.0
         }
         self.assertEqual(len(expected_features.keys()), len(features.keys()))
         for key, value in expected_features.iteritems():
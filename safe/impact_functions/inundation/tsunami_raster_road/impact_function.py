@@ -347,7 +347,8 @@ class TsunamiRasterRoadsFunction(
                 QgsRectangle(*self.requested_extent), geo_crs, hazard_crs)
 
         # Clip hazard raster
-        small_raster = align_clip_raster(self.hazard.layer, viewport_extent)
+        small_raster = align_clip_raster(
+            self.hazard.layer, viewport_extent, use_vrt=True)
 
         # Create vector features from the flood raster
         # For each raster cell there is one rectangular polygon
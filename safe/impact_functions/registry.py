@@ -20,6 +20,26 @@ __copyright__ = ('Copyright 2012, Australia Indonesia Facility for '
 
 from safe.common.utilities import is_subset, convert_to_list, project_list
 
+# The layer requirements of an impact function checked against the keywords
+# of a layer by filter_by_keyword_string, as (requirement, keyword) pairs.
+KEYWORD_REQUIREMENTS = {
+    'hazard': [
+        ('layer_mode', 'layer_mode'),
+        ('layer_geometries', 'layer_geometry'),
+        ('hazard_types', 'hazard'),
+        ('hazard_categories', 'hazard_category'),
+        ('continuous_hazard_units', 'continuous_hazard_unit'),
+        ('vector_hazard_classifications', 'vector_hazard_classification'),
+        ('raster_hazard_classifications', 'raster_hazard_classification')
+    ],
+    'exposure': [
+        ('layer_mode', 'layer_mode'),
+        ('layer_geometries', 'layer_geometry'),
+        ('exposure_types', 'exposure'),
+        ('exposure_units', 'exposure_unit')
+    ]
+}
+
 
 class Registry(object):
     """A simple registry for keeping track of all impact functions.
@@ -34,11 +54,17 @@ class Registry(object):
 
     _instance = None
     _impact_functions = None
+    # The keys accepted by each registered impact function for each keyword
+    # in KEYWORD_REQUIREMENTS, built when it is registered.
+    _capabilities = {}
+    # The impact functions found for each combination of keyword values by
+    # filter_by_keyword_string. Emptied when the registry changes.
+    _keyword_index = {}
 
     def __new__(cls, *args, **kwargs):
         if not cls._instance:
             cls._instance = super(Registry, cls).__new__(cls, *args, **kwargs)
-            cls._impact_functions = []
+            cls.clear()
         return cls._instance
 
     @property
@@ -60,12 +86,16 @@ class Registry(object):
         # pylint: disable=unused-variable
         is_valid, reason = impact_function.metadata().is_valid()
         # pylint: enable=unused-variable
-        impact_function_id = impact_function.metadata().as_dict()['id']
+        if_metadata = impact_function.metadata().cached_dict()
+        impact_function_id = if_metadata['id']
         if not is_disabled and is_valid and impact_function not in \
                 cls._impact_functions:
             id_unique = cls.filter_by_metadata('id', impact_function_id) == []
             if id_unique:
                 cls._impact_functions.append(impact_function)
+                cls._capabilities[impact_function] = cls.keyword_capabilities(
+                    if_metadata['layer_requirements'])
+                cls._keyword_index = {}
             else:
                 raise Exception('Impact Function with ID %s is already '
                                 'registered' % impact_function_id)
@@ -74,13 +104,15 @@ class Registry(object):
     def clear(cls):
         """Remove all registered impact functions in the registry."""
         cls._impact_functions = []
+        cls._capabilities = {}
+        cls._keyword_index = {}
 
     @classmethod
     def list(cls):
         """List of all registered impact functions by their name."""
         return [
-            impact_function.metadata().as_dict()['name'] for impact_function in
-            cls._impact_functions]
+            impact_function.metadata().cached_dict()['name']
+            for impact_function in cls._impact_functions]
 
     @classmethod
     def get_instance(cls, name):
@@ -126,7 +158,7 @@ class Registry(object):
         """
         impact_functions = []
         for impact_function in cls._impact_functions:
-            if_metadata = impact_function.metadata().as_dict()
+            if_metadata = impact_function.metadata().cached_dict()
             if metadata_key in if_metadata:
                 if if_metadata[metadata_key] == metadata_value:
                     impact_functions.append(impact_function)
@@ -173,8 +205,8 @@ class Registry(object):
         """
         filtered_impact_functions = []
         for impact_function in impact_functions:
-            if_hazard_requirements = impact_function.metadata().as_dict()[
-                'layer_requirements']['hazard']
+            if_hazard_requirements = impact_function.metadata()\
+                .get_hazard_requirements()
 
             layer_mode = if_hazard_requirements['layer_mode']
             layer_geometries = if_hazard_requirements['layer_geometries']
@@ -232,8 +264,8 @@ class Registry(object):
         """
         filtered_impact_functions = []
         for impact_function in impact_functions:
-            if_exposure_keywords = impact_function.metadata().as_dict()[
-                'layer_requirements']['exposure']
+            if_exposure_keywords = impact_function.metadata()\
+                .get_exposure_requirements()
 
             layer_mode = if_exposure_keywords['layer_mode']
             layer_geometries = if_exposure_keywords['layer_geometries']
@@ -259,12 +291,38 @@ class Registry(object):
 
         return filtered_impact_functions
 
+    @staticmethod
+    def keyword_capabilities(layer_requirements):
+        """Get the keys an impact function accepts for the layer keywords.
+
+        .. versionadded:: 3.5
+
+        :param layer_requirements: The layer requirements from the metadata
+            of the impact function.
+        :type layer_requirements: dict
+
+        :returns: For each layer purpose, a list of (keyword, keys) pairs
+            following KEYWORD_REQUIREMENTS where keys is the set of accepted
+            values for the keyword, empty if any value is accepted.
+        :rtype: dict
+        """
+        capabilities = {}
+        for layer_purpose, requirements in KEYWORD_REQUIREMENTS.iteritems():
+            layer_requirement = layer_requirements[layer_purpose]
+            capabilities[layer_purpose] = [
+                (keyword, frozenset(project_list(
+                    convert_to_list(layer_requirement.get(requirement)),
+                    'key')))
+                for requirement, keyword in requirements]
+        return capabilities
+
     @classmethod
     def filter_by_keyword_string(
             cls, hazard_keywords=None, exposure_keywords=None):
         """Get available impact functions from hazard and exposure keywords.
 
-        Disabled impact function will not be loaded.
+        Disabled impact function will not be loaded. The result for each
+        combination of keyword values is kept until the registry changes.
 
         :param hazard_keywords: The keywords of the hazard.
         :type hazard_keywords: dict
@@ -275,118 +333,32 @@ class Registry(object):
         if hazard_keywords is None and exposure_keywords is None:
             return cls._impact_functions
 
-        impact_functions = []
-        layer_purposes = []
         keywords = {}
         if hazard_keywords is not None:
-            layer_purposes.append('hazard')
-            keywords['hazard'] = hazard_keywords
+            keywords['hazard'] = tuple(
+                hazard_keywords.get(keyword)
+                for _, keyword in KEYWORD_REQUIREMENTS['hazard'])
         if exposure_keywords is not None:
-            layer_purposes.append('exposure')
-            keywords['exposure'] = exposure_keywords
-
-        for impact_function in cls._impact_functions:
-            requirement_met = True
-            for layer_purpose in layer_purposes:
-                layer_requirement = impact_function.metadata().as_dict()[
-                    'layer_requirements'][layer_purpose]
-
-                # general requirements
-                layer_mode = layer_requirement['layer_mode']
-                layer_mode = project_list(convert_to_list(layer_mode), 'key')
-
-                layer_geometries = layer_requirement['layer_geometries']
-                layer_geometries = project_list(
-                    convert_to_list(layer_geometries), 'key')
-
-                # hazard layer specific requirements
-                if layer_purpose == 'hazard':
-                    hazard_categories = layer_requirement['hazard_categories']
-                    hazard_categories = project_list(
-                        convert_to_list(hazard_categories), 'key')
-
-                    hazard_types = layer_requirement['hazard_types']
-                    hazard_types = project_list(
-                        convert_to_list(hazard_types), 'key')
-
-                    continuous_hazard_units = layer_requirement.get(
-                        'continuous_hazard_units')
-                    continuous_hazard_units = project_list(
-                        convert_to_list(continuous_hazard_units), 'key')
-
-                    vector_hazard_classifications = layer_requirement.get(
-                        'vector_hazard_classifications')
-                    vector_hazard_classifications = project_list(
-                        convert_to_list(vector_hazard_classifications), 'key')
-
-                    raster_hazard_classifications = layer_requirement.get(
-                        'raster_hazard_classifications')
-                    raster_hazard_classifications = project_list(
-                        convert_to_list(raster_hazard_classifications), 'key')
-
-                # exposure layer specific requirements
-                if layer_purpose == 'exposure':
-                    exposure_types = layer_requirement['exposure_types']
-                    exposure_types = project_list(
-                        convert_to_list(exposure_types), 'key')
-
-                    exposure_units = layer_requirement['exposure_units']
-                    exposure_units = project_list(
-                        convert_to_list(exposure_units), 'key')
-
-                keyword = keywords[layer_purpose]
-                if layer_mode and keyword.get('layer_mode') not in layer_mode:
-                    requirement_met = False
-                    continue
-
-                if (layer_geometries and keyword.get('layer_geometry') not in
-                        layer_geometries):
-                    requirement_met = False
-                    continue
-
-                # hazard layer specific requirements
-                if layer_purpose == 'hazard':
-                    if (hazard_types and keyword.get('hazard') not in
-                            hazard_types):
-                        requirement_met = False
-                        continue
-
-                    if (hazard_categories and keyword.get('hazard_category')
-                            not in hazard_categories):
-                        requirement_met = False
-                        continue
-
-                    if (continuous_hazard_units and keyword.get(
-                            'continuous_hazard_unit')
-                            not in continuous_hazard_units):
-                        requirement_met = False
-                        continue
-
-                    if (vector_hazard_classifications and keyword.get(
-                            'vector_hazard_classification')
-                            not in vector_hazard_classifications):
-                        requirement_met = False
-                        continue
-
-                    if (raster_hazard_classifications and keyword.get(
-                            'raster_hazard_classification')
-                            not in raster_hazard_classifications):
-                        requirement_met = False
-                        continue
-
-                # exposure layer specific requirements
-                if layer_purpose == 'exposure':
-                    if (exposure_types and keyword.get('exposure') not in
-                            exposure_types):
-                        requirement_met = False
-                        continue
-
-                    if (exposure_units and keyword.get('exposure_unit') not in
-                            exposure_units):
-                        requirement_met = False
-                        continue
-
-            if requirement_met and impact_function not in impact_functions:
-                impact_functions.append(impact_function)
+            keywords['exposure'] = tuple(
+                exposure_keywords.get(keyword)
+                for _, keyword in KEYWORD_REQUIREMENTS['exposure'])
+        index_key = (keywords.get('hazard'), keywords.get('exposure'))
+
+        if index_key not in cls._keyword_index:
+            impact_functions = []
+            for impact_function in cls._impact_functions:
+                capabilities = cls._capabilities[impact_function]
+                requirement_met = True
+                for layer_purpose, values in keywords.iteritems():
+                    for (_, keys), value in zip(
+                            capabilities[layer_purpose], values):
+                        if keys and value not in keys:
+                            requirement_met = False
+                            break
+                    if not requirement_met:
+                        break
+                if requirement_met:
+                    impact_functions.append(impact_function)
+            cls._keyword_index[index_key] = impact_functions
 
-        return impact_functions
+        return list(cls._keyword_index[index_key])
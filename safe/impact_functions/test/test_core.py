@@ -23,13 +23,17 @@ import random
 import os
 import logging
 from collections import OrderedDict
+
+import numpy
+
 from safe.test.utilities import get_qgis_app, TESTDATA, HAZDATA
 QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
 
 from safe.impact_functions.core import (
     population_rounding_full,
     population_rounding,
-    evacuated_population_needs)
+    evacuated_population_needs,
+    population_by_hazard_class)
 from safe.common.resource_parameter import ResourceParameter
 from safe.defaults import default_minimum_needs
 
@@ -144,5 +148,29 @@ class TestCore(unittest.TestCase):
             [[r['table name'], r['amount']] for r in result])
         assert result['Toilets'] == 2
 
+    def test_population_by_hazard_class(self):
+        """Test the population is counted by hazard class in blocks."""
+        hazard = numpy.array([
+            [0.1, 0.5, 1.0, numpy.nan],
+            [1.5, 2.0, 3.0, 0.2]])
+        population = numpy.array([
+            [1.0, 2.0, 3.0, 4.0],
+            [5.0, numpy.nan, 7.0, 8.0]])
+
+        counts, impact = population_by_hazard_class(
+            hazard, population, [0.5, 2.0], [2], block_size=3)
+        self.assertEqual(counts.tolist(), [9.0, 10.0, 7.0, 4.0])
+        self.assertEqual(impact.shape, population.shape)
+        self.assertEqual(
+            impact.tolist()[0], [0.0, 0.0, 0.0, 0.0])
+        self.assertEqual(impact[1, 2], 7.0)
+        self.assertTrue(numpy.isnan(impact[1, 1]))
+
+        counts, impact = population_by_hazard_class(
+            hazard, population, [0.5, 2.0], [2], carry_no_data=True)
+        self.assertEqual(counts.tolist(), [9.0, 10.0, 7.0, 4.0])
+        self.assertTrue(numpy.isnan(impact[0, 3]))
+        self.assertEqual(numpy.nansum(impact), 7.0)
+
 if __name__ == '__main__':
     unittest.main()
@@ -324,6 +324,42 @@ class TestRegistry(unittest.TestCase):
                       'Got %s instead' % result_list[0]
             self.assertTrue(expected in result_list, message)
 
+    def test_filter_by_keywords_index(self):
+        """TestRegistry: Test filtering results are kept until a change."""
+        registry = Registry()
+        hazard_keywords = {
+            'layer_mode': 'classified',
+            'layer_geometry': 'polygon',
+            'hazard': 'flood',
+            'hazard_category': 'single_event',
+            'vector_hazard_classification': 'flood_vector_hazard_classes'
+        }
+        exposure_keywords = {
+            'layer_mode': 'classified',
+            'layer_geometry': 'polygon',
+            'exposure': 'structure',
+        }
+        impact_functions = registry.filter_by_keyword_string(
+            hazard_keywords, exposure_keywords)
+        self.assertIn(FloodPolygonBuildingFunction, impact_functions)
+
+        # Changing the returned list does not change the next result.
+        impact_functions.append(ITBFatalityFunction)
+        self.assertNotIn(
+            ITBFatalityFunction,
+            registry.filter_by_keyword_string(
+                hazard_keywords, exposure_keywords))
+
+        registry.clear()
+        self.assertEqual(
+            registry.filter_by_keyword_string(
+                hazard_keywords, exposure_keywords), [])
+        registry.register(FloodPolygonBuildingFunction)
+        self.assertEqual(
+            registry.filter_by_keyword_string(
+                hazard_keywords, exposure_keywords),
+            [FloodPolygonBuildingFunction])
+
     def test_filter_by_keywords_dev(self):
         """TestRegistry: Test filtering IF using hazard n exposure keywords.
 
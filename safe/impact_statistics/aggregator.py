@@ -15,7 +15,6 @@ __date__ = '19/05/2013'
 __copyright__ = ('Copyright 2012, Australia Indonesia Facility for '
                  'Disaster Reduction')
 
-import sys
 import logging
 import time
 import numpy
@@ -52,7 +51,6 @@ from safe.defaults import get_defaults
 from safe.utilities.keyword_io import KeywordIO
 from safe.utilities.gis import (
     layer_attribute_names,
-    create_memory_layer,
     is_polygon_layer)
 from safe.utilities.styling import set_vector_graduated_style
 from safe.common.utilities import (
@@ -1164,34 +1162,33 @@ class Aggregator(QtCore.QObject):
             ) % (layer.name())))
         send_dynamic_message(self, message)
 
-        layer_filename = layer.source()
         postprocessing_polygons = self.safe_layer.get_geometry()
-        polygons_layer = safe_read_layer(layer_filename)
-        remaining_polygons = numpy.array(
-            polygons_layer.get_geometry(), dtype=list)
-        # myRemainingAttributes = numpy.array(polygons_layer.get_data())
-        remaining_indexes = numpy.array(range(len(remaining_polygons)))
 
         # used for unit tests only
         self.preprocessed_feature_count = 0
 
-        # TODO (MB) the intersecting array is used only for debugging and
-        # could be safely removed
-        intersecting_polygons = []
-        inside_polygons = []
-
         # TODO (MB) maybe do raw geos without qgis
-        # select all post processing polygons with no attributes
+        # select all post processing polygons with no attributes, once
         aggregation_provider = self.layer.dataProvider()
         aggregation_request = QgsFeatureRequest()
         aggregation_request.setSubsetOfAttributes([])
+        aggregation_geometries = {}
+        for aggregation_feature in aggregation_provider.getFeatures(
+                aggregation_request):
+            aggregation_geometries[aggregation_feature.id()] = QgsGeometry(
+                aggregation_feature.geometry())
+
+        # Fetch the polygons in a single request and index their bounding
+        # boxes once. The part of each polygon not assigned to a post
+        # processing polygon yet is kept in polygon_features.
+        polygons_provider = layer.dataProvider()
+        polygon_features = {}
+        polygons_index = QgsSpatialIndex()
+        for polygon_feature in polygons_provider.getFeatures():
+            polygon_feature = QgsFeature(polygon_feature)
+            polygon_features[polygon_feature.id()] = polygon_feature
+            polygons_index.insertFeature(polygon_feature)
 
-        # copy polygons to a memory layer
-        qgis_memory_layer = create_memory_layer(layer)
-
-        polygons_provider = qgis_memory_layer.dataProvider()
-        polygons_request = QgsFeatureRequest()
-        qgis_feature = QgsFeature()
         inside_feature = QgsFeature()
         fields = polygons_provider.fields()
         temporary_dir = temp_dir(sub_dir='pre-process')
@@ -1212,220 +1209,112 @@ class Aggregator(QtCore.QObject):
         self.copy_keywords(layer, out_filename)
         # end TODO
 
+        polygon_types = [QGis.WKBPolygon, QGis.WKBMultiPolygon]
+        inside_count = 0
+        intersecting_count = 0
         for (polygon_index, postprocessing_polygon) in enumerate(
                 postprocessing_polygons):
             LOGGER.debug('Post Processing Polygon %s' % polygon_index)
-            polygon_count = len(remaining_polygons)
-            aggregation_request.setFilterFid(polygon_index)
-            aggregation_polygon = aggregation_provider.getFeatures(
-                aggregation_request).next()
-            geometry = QgsGeometry(aggregation_polygon.geometry())
-
-            # polygon bounding box values
-            array = numpy.array(postprocessing_polygon)
-            minx = miny = sys.maxint
-            maxx = maxy = -minx
-            postprocessing_minimum_x = min(minx, min(array[:, 0]))
-            postprocessing_maximum_x = max(maxx, max(array[:, 0]))
-            postprocessing_minimum_y = min(miny, min(array[:, 1]))
-            postprocessing_maximum_y = max(maxy, max(array[:, 1]))
-
-            # create an array full of False to store if a BB vertex is inside
-            # or outside the polygon
-            inside_vertices = numpy.zeros(polygon_count * 4, dtype=numpy.bool)
-
-            # Create Nx2 vector of vertices of bounding boxes
+            geometry = aggregation_geometries[polygon_index]
+
+            # Only the polygons whose bounding box overlaps the post
+            # processing polygon's may be inside or intersecting it. The
+            # index keeps the original bounding boxes, which contain those
+            # of the remaining parts.
+            candidates = sorted(
+                feature_id for feature_id in
+                polygons_index.intersects(geometry.boundingBox())
+                if feature_id in polygon_features)
+            if not candidates:
+                continue
+
+            # Create 4Nx2 vector of vertices of the candidate bounding boxes
             bounding_vertices = []
-            # Compute bounding box for each geometry type
-            for remaining_polygon in remaining_polygons:
-                minx = miny = sys.maxint
-                maxx = maxy = -minx
-                # Do outer ring only as the BB is outside anyway
-                array = numpy.array(remaining_polygon)
-                minx = min(minx, numpy.min(array[:, 0]))
-                maxx = max(maxx, numpy.max(array[:, 0]))
-                miny = min(miny, numpy.min(array[:, 1]))
-                maxy = max(maxy, numpy.max(array[:, 1]))
+            for feature_id in candidates:
+                box = polygon_features[feature_id].geometry().boundingBox()
                 bounding_vertices.extend([
-                    (minx, miny),
-                    (minx, maxy),
-                    (maxx, maxy),
-                    (maxx, miny)])
+                    (box.xMinimum(), box.yMinimum()),
+                    (box.xMinimum(), box.yMaximum()),
+                    (box.xMaximum(), box.yMaximum()),
+                    (box.xMaximum(), box.yMinimum())])
 
             # see if BB vertices are in polygon
-            bounding_vertices = numpy.array(bounding_vertices)
             inside, _ = points_in_and_outside_polygon(
-                bounding_vertices, postprocessing_polygon)
-            # make True if the vertex was in polygon
+                numpy.array(bounding_vertices), postprocessing_polygon)
+            # count, for each candidate, its BB vertices in the polygon
+            inside_vertices = numpy.zeros(len(bounding_vertices), dtype=bool)
             inside_vertices[inside] = True
+            polygon_locations = inside_vertices.reshape(-1, 4).sum(axis=1)
 
-            # next_iteration_polygons has the 0:count indexes
-            # outside_polygons has the mapped to original indexes
-            # and is overwritten at every iteration because we care only of
-            # the outside polygons remaining after the last iteration
-            next_iteration_polygons = []
-            outside_polygons = []
-
-            for i in range(polygon_count):
-                k = i * 4
-                mapped_index = remaining_indexes[i]
-                # memory layers counting starts at 1 instead of 0 as in our
-                # indexes
-                feature_id = mapped_index + 1
-                do_intersection = False
-                # sum the isInside bool for each of the bounding box vertices
-                # of each polygon. for example True + True + False + True is 3
-                polygon_location = numpy.sum(inside_vertices[k:k + 4])
+            for feature_id, polygon_location in zip(
+                    candidates, polygon_locations):
+                qgis_feature = polygon_features.pop(feature_id)
 
                 if polygon_location == 4:
                     # all vertices are inside -> polygon is inside
                     # ignore this polygon from further analysis
-                    inside_polygons.append(mapped_index)
-                    polygons_request.setFilterFid(feature_id)
-                    qgis_feature = polygons_provider.getFeatures(
-                        polygons_request).next()
+                    inside_count += 1
                     shape_writer.addFeature(qgis_feature)
                     self.preprocessed_feature_count += 1
-                    # LOGGER.debug('Polygon %s is fully inside' %mapped_index)
-                    # tmpWriter.addFeature(qgis_feature)
-
-                elif polygon_location == 0:
-                    # all vertices are outside
-                    # check if the polygon BB is completely outside of the
-                    # polygon BB.
-                    polygon_min_x = numpy.min(bounding_vertices[k:k + 4, 0])
-                    polygon_max_x = numpy.max(bounding_vertices[k:k + 4, 0])
-                    polygon_min_y = numpy.min(bounding_vertices[k:k + 4, 1])
-                    polygon_max_y = numpy.max(bounding_vertices[k:k + 4, 1])
-
-                    # check if remaining_polygon is all E,W,N,S of polygon
-                    if ((polygon_min_x > postprocessing_maximum_x) or
-                            (polygon_max_x < postprocessing_minimum_x) or
-                            (polygon_min_y > postprocessing_maximum_y) or
-                            (polygon_max_y < postprocessing_minimum_y)):
-                        # polygon is surely outside
-                        outside_polygons.append(mapped_index)
-                        # we need this polygon in the next iteration
-                        next_iteration_polygons.append(i)
-                    else:
-                        # polygon might be outside or intersecting. consider
-                        # it intersecting so it goes into further analysis
-                        do_intersection = True
-                else:
-                    # some vertices are outside some inside -> polygon is
-                    # intersecting
-                    do_intersection = True
-
-                # intersect using qgis
-                if do_intersection:
-                    # LOGGER.debug('Intersecting polygon %s' % mapped_index)
-                    intersecting_polygons.append(mapped_index)
-
-                    polygons_request.setFilterFid(feature_id)
-                    try:
-                        qgis_feature = polygons_provider.getFeatures(
-                            polygons_request).next()
-                    except StopIteration:
-                        LOGGER.debug(
-                            'Could not fetch feature: %s' % feature_id)
-                        LOGGER.debug([str(error) for error in
-                                      polygons_provider.errors()])
-
-                    qgis_polygon_geometry = QgsGeometry(
-                        qgis_feature.geometry())
-                    attribute_map = qgis_feature.attributes()
-                    # for (k, attr) in attribute_map.iteritems():
-                    # LOGGER.debug( "%d: %s" % (k, attr.toString()))
-
-                    # make intersection of the qgis_feature and the
-                    # post processing polygon
-                    # write the inside part to a shp file and the outside part
-                    # back to the original QGIS layer
-                    try:
-                        intersection = geometry.intersection(
+                    continue
+
+                # some or no vertices are inside but the bounding boxes
+                # overlap -> polygon might be intersecting, intersect using
+                # qgis
+                intersecting_count += 1
+                qgis_polygon_geometry = QgsGeometry(qgis_feature.geometry())
+
+                # make intersection of the qgis_feature and the
+                # post processing polygon
+                # write the inside part to a shp file and keep the outside
+                # part for the next post processing polygons
+                try:
+                    intersection = geometry.intersection(
+                        qgis_polygon_geometry)
+                    intersection_geometry = QgsGeometry(intersection)
+
+                    # from ftools
+                    unknown_geometry_type = 0
+                    geometry_type = intersection_geometry.wkbType()
+                    if geometry_type == unknown_geometry_type:
+                        int_com = geometry.combine(qgis_polygon_geometry)
+                        int_sym = geometry.symDifference(
                             qgis_polygon_geometry)
-                        # if intersection is not None:
-                        intersection_geometry = QgsGeometry(intersection)
-
-                        # from ftools
-                        unknown_geometry_type = 0
-                        geometry_type = intersection_geometry.wkbType()
-                        if geometry_type == unknown_geometry_type:
-                            int_com = geometry.combine(
-                                qgis_polygon_geometry)
-                            int_sym = geometry.symDifference(
-                                qgis_polygon_geometry)
-                            intersection_geometry = QgsGeometry(
-                                int_com.difference(int_sym))
-                        # LOGGER.debug('wkbType type of intersection: %s' %
-                        # intersection_geometry.wkbType())
-                        polygon_types = [QGis.WKBPolygon, QGis.WKBMultiPolygon]
-                        if intersection_geometry.wkbType() in polygon_types:
-                            inside_feature.setGeometry(intersection_geometry)
-                            inside_feature.setAttributes(attribute_map)
-                            shape_writer.addFeature(inside_feature)
-                            self.preprocessed_feature_count += 1
-                        else:
-                            # LOGGER.debug(
-                            #    'Intersection not a polygon so the two '
-                            #    'polygons either touch only or do not '
-                            #    'intersect. Not adding this to the inside '
-                            #    'list')
-                            pass
-                        # Part of the polygon that is outside the post
-                        # processing polygon
-                        outside = qgis_polygon_geometry.difference(
-                            intersection_geometry)
-                        #                        if outside is not None:
-                        outside_geometry = QgsGeometry(outside)
-
-                        if outside_geometry.wkbType() in polygon_types:
-                            # modify the original geometry to the part
-                            # outside of the post processing polygon
-                            polygons_provider.changeGeometryValues(
-                                {feature_id: outside_geometry})
-                            # we need this polygon in the next iteration
-                            outside_polygons.append(mapped_index)
-                            next_iteration_polygons.append(i)
-
-                    except TypeError:
-                        LOGGER.debug('ERROR with FID %s', mapped_index)
-
-            # LOGGER.debug('Inside %s' % inside_polygons)
-            # LOGGER.debug('Outside %s' % outside_polygons)
-            # LOGGER.debug('Intersection %s' % intersecting_polygons)
-            if len(next_iteration_polygons) > 0:
-                # some polygons are still completely outside of the
-                # post processing polygon so go on and reiterate using only
-                # these
-                next_iteration_index = numpy.array(next_iteration_polygons)
-
-                remaining_polygons = remaining_polygons[
-                    next_iteration_index]
-                # myRemainingAttributes = myRemainingAttributes[
-                # next_iteration_index]
-                remaining_indexes = remaining_indexes[next_iteration_index]
-                LOGGER.debug('Remaining: %s' % len(remaining_polygons))
-            else:
-                print 'no more polygons to be checked'
+                        intersection_geometry = QgsGeometry(
+                            int_com.difference(int_sym))
+                    if intersection_geometry.wkbType() in polygon_types:
+                        inside_feature.setGeometry(intersection_geometry)
+                        inside_feature.setAttributes(
+                            qgis_feature.attributes())
+                        shape_writer.addFeature(inside_feature)
+                        self.preprocessed_feature_count += 1
+                    # else the two polygons either touch only or do not
+                    # intersect, nothing to add to the inside list.
+
+                    # Part of the polygon that is outside the post
+                    # processing polygon
+                    outside_geometry = QgsGeometry(
+                        qgis_polygon_geometry.difference(
+                            intersection_geometry))
+                    if outside_geometry.wkbType() in polygon_types:
+                        # we need this part in the next iteration
+                        qgis_feature.setGeometry(outside_geometry)
+                        polygon_features[feature_id] = qgis_feature
+
+                except TypeError:
+                    LOGGER.debug('ERROR with FID %s', feature_id)
+
+            LOGGER.debug('Remaining: %s' % len(polygon_features))
+            if not polygon_features:
+                LOGGER.debug('No more polygons to be checked')
                 break
-                # del tmpWriter
 
-        # here the full polygon set is represented by:
-        # inside_polygons + intersecting_polygons + next_iteration_polygons
-        # the a polygon intersecting multiple post processing polygons appears
-        # multiple times in the array
-        # noinspection PyUnboundLocalVariable
         LOGGER.debug('Results:\nInside: %s\nIntersect: %s\nOutside: %s' % (
-            inside_polygons, intersecting_polygons, outside_polygons))
-
-        # add in-and outside polygons
-        for i in outside_polygons:
-            feature_id = i + 1
-            polygons_request.setFilterFid(feature_id)
-            qgis_feature = polygons_provider.getFeatures(
-                polygons_request).next()
-            shape_writer.addFeature(qgis_feature)
+            inside_count, intersecting_count, len(polygon_features)))
+
+        # add the polygons, or parts, outside of all post processing polygons
+        for feature_id in sorted(polygon_features):
+            shape_writer.addFeature(polygon_features[feature_id])
             self.preprocessed_feature_count += 1
 
         del shape_writer
@@ -12,6 +12,7 @@ __copyright__ += 'Disaster Reduction'
 import os
 from os.path import expanduser
 import logging
+import threading
 import sqlite3 as sqlite
 from sqlite3 import OperationalError
 
@@ -27,6 +28,12 @@ from safe.common.exceptions import (
 
 LOGGER = logging.getLogger('InaSAFE')
 
+# Connections are kept open for the life of the thread, one per database path.
+_THREAD_LOCAL = threading.local()
+# Database paths for which the schema has already been checked.
+_CHECKED_SCHEMAS = set()
+_SCHEMA_LOCK = threading.Lock()
+
 
 class MetadataDbIO(QObject):
     """Class for doing metadata read/write operations on the local DB
@@ -35,6 +42,9 @@ class MetadataDbIO(QObject):
      datasources.
 
      .. versionadded:: 3.2
+
+     .. versionchanged:: 3.5 connections are shared by all instances in the
+        same thread and are kept open between operations.
      """
 
     def __init__(self):
@@ -43,7 +53,6 @@ class MetadataDbIO(QObject):
         # path to sqlite db path
         self.metadata_db_path = None
         self.setup_metadata_db_path()
-        self.connection = None
 
     def set_metadata_db_path(self, path):
         """Set the path for the metadata database (sqlite).
@@ -57,6 +66,20 @@ class MetadataDbIO(QObject):
         """
         self.metadata_db_path = str(path)
 
+    @property
+    def connection(self):
+        """The connection of the current thread to the database.
+
+        It is looked up on each use, as an instance may be used from
+        several threads and the connection may be closed by another
+        instance.
+
+        :returns: The connection, or None if it is not open.
+        :rtype: sqlite.Connection
+        """
+        connections = getattr(_THREAD_LOCAL, 'connections', {})
+        return connections.get(self.metadata_db_path)
+
 # methods below here should be considered private
 
     @staticmethod
@@ -98,9 +121,21 @@ class MetadataDbIO(QObject):
         overridden in QSettings. If the db does not exist it will
         be created.
 
+        The connection is kept open and reused by every MetadataDbIO in the
+        current thread until close_connection is called.
+
+        :returns: The connection of the current thread.
+        :rtype: sqlite.Connection
+
         :raises: An sqlite.Error is raised if anything goes wrong
         """
-        self.connection = None
+        connections = getattr(_THREAD_LOCAL, 'connections', None)
+        if connections is None:
+            connections = _THREAD_LOCAL.connections = {}
+        connection = connections.get(self.metadata_db_path)
+        if connection is not None:
+            return connection
+
         base_directory = os.path.dirname(self.metadata_db_path)
         if not os.path.exists(base_directory):
             try:
@@ -111,56 +146,54 @@ class MetadataDbIO(QObject):
                 raise
 
         try:
-            self.connection = sqlite.connect(self.metadata_db_path)
+            connection = sqlite.connect(self.metadata_db_path)
+            # Readers do not block the writer (and the other way round), and
+            # a commit does not need to sync the whole database.
+            connection.execute('PRAGMA journal_mode=WAL;')
+            connection.execute('PRAGMA synchronous=NORMAL;')
         except (OperationalError, sqlite.Error):
             LOGGER.exception('Failed to open metadata cache database.')
             raise
+        connections[self.metadata_db_path] = connection
+        return connection
 
     def close_connection(self):
-        """Close the active sqlite3 connection."""
-        if self.connection is not None:
-            self.connection.close()
-            self.connection = None
+        """Close the sqlite3 connection of the current thread.
+
+        The schema will be checked again when the database is next used.
+        """
+        connections = getattr(_THREAD_LOCAL, 'connections', {})
+        connection = connections.pop(self.metadata_db_path, None)
+        if connection is not None:
+            connection.close()
+        with _SCHEMA_LOCK:
+            _CHECKED_SCHEMAS.discard(self.metadata_db_path)
 
     def get_cursor(self):
         """Get a cursor for the active connection.
 
         The cursor can be used to execute arbitrary queries against the
-        database. This method also checks that the metadata table exists in
-        the schema, and if not, it creates it.
+        database. The first time a database is used, this method also checks
+        that the metadata table exists in the schema, and if not, it creates
+        it.
 
         :returns: A valid cursor opened against the connection.
         :rtype: sqlite.
 
         :raises: An sqlite.Error will be raised if anything goes wrong.
         """
-        if self.connection is None:
-            try:
-                self.open_connection()
-            except OperationalError:
-                raise
+        connection = self.open_connection()
         try:
-            cursor = self.connection.cursor()
-            cursor.execute('SELECT SQLITE_VERSION()')
-            data = cursor.fetchone()
-            LOGGER.debug("SQLite version: %s" % data)
-            # Check if we have some tables, if not create them
-            sql = 'select sql from sqlite_master where type = \'table\';'
-            cursor.execute(sql)
-            data = cursor.fetchone()
-            LOGGER.debug("Tables: %s" % data)
-            if data is None:
-                LOGGER.debug('No tables found')
-                sql = (
-                    'create table metadata (hash varchar(32) primary key,'
-                    'json text, xml text);')
-                LOGGER.debug(sql)
-                cursor.execute(sql)
-                # data = cursor.fetchone()
-                cursor.fetchone()
-            else:
-                LOGGER.debug('metadata table already exists')
-
+            cursor = connection.cursor()
+            with _SCHEMA_LOCK:
+                if self.metadata_db_path not in _CHECKED_SCHEMAS:
+                    sql = (
+                        'create table if not exists metadata ('
+                        'hash varchar(32) primary key, json text, xml text);')
+                    LOGGER.debug(sql)
+                    cursor.execute(sql)
+                    connection.commit()
+                    _CHECKED_SCHEMAS.add(self.metadata_db_path)
             return cursor
         except sqlite.Error, e:
             LOGGER.debug("Error %s:" % e.args[0])
@@ -239,9 +272,8 @@ class MetadataDbIO(QObject):
         hash_value = self.hash_for_datasource(uri)
         try:
             cursor = self.get_cursor()
-            # now see if we have any data for our hash
-            sql = 'delete from metadata where hash = \'' + hash_value + '\';'
-            cursor.execute(sql)
+            cursor.execute(
+                'delete from metadata where hash = ?;', (hash_value,))
             self.connection.commit()
         except sqlite.Error, e:
             LOGGER.debug("SQLITE Error %s:" % e.args[0])
@@ -250,8 +282,6 @@ class MetadataDbIO(QObject):
             LOGGER.debug("Error %s:" % e.args[0])
             self.connection.rollback()
             raise
-        finally:
-            self.close_connection()
 
     def write_metadata_for_uri(self, uri, json=None, xml=None):
         """Write metadata for a URI into the metadata database. All the
@@ -276,30 +306,30 @@ class MetadataDbIO(QObject):
         :type xml: str
 
         """
-        hash_value = self.hash_for_datasource(uri)
+        self.write_metadata_for_uris([(uri, json, xml)])
+
+    def write_metadata_for_uris(self, records):
+        """Write metadata for several URIs in a single transaction.
+
+        Existing records for a URI are replaced.
+
+        .. versionadded:: 3.5
+
+        .. seealso:: write_metadata_for_uri
+
+        :param records: An iterable of (uri, json, xml) tuples.
+        :type records: list
+        """
+        rows = [
+            (self.hash_for_datasource(uri), json, xml)
+            for uri, json, xml in records]
         try:
             cursor = self.get_cursor()
-            # now see if we have any data for our hash
-            sql = (
-                'select json, xml from metadata where hash = \'%s\';' %
-                hash_value)
-            cursor.execute(sql)
-            data = cursor.fetchone()
-            if data is None:
-                # insert a new rec
-                # cursor.execute('insert into metadata(hash) values(:hash);',
-                #             {'hash': hash_value})
-                cursor.execute(
-                    'insert into metadata(hash, json, xml ) '
-                    'values(:hash, :json, :xml);',
-                    {'hash': hash_value, 'json': json, 'xml': xml})
-                self.connection.commit()
-            else:
-                # update existing rec
-                cursor.execute(
-                    'update metadata set json=?, xml=? where hash = ?;',
-                    (json, xml, hash_value))
-                self.connection.commit()
+            cursor.executemany(
+                'insert or replace into metadata(hash, json, xml) '
+                'values(?, ?, ?);',
+                rows)
+            self.connection.commit()
         except sqlite.Error:
             LOGGER.exception('Error writing metadata to SQLite db %s' %
                              self.metadata_db_path)
@@ -307,8 +337,6 @@ class MetadataDbIO(QObject):
             if self.connection is not None:
                 self.connection.rollback()
             raise
-        finally:
-            self.close_connection()
 
     def read_metadata_from_uri(self, uri, metadata_format):
         """Try to get metadata from the DB entry associated with a URI.
@@ -344,17 +372,11 @@ class MetadataDbIO(QObject):
             raise RuntimeError('%s' % message)
 
         hash_value = self.hash_for_datasource(uri)
-        try:
-            self.open_connection()
-        except OperationalError:
-            raise
         try:
             cursor = self.get_cursor()
             # now see if we have any data for our hash
-            sql = (
-                'select %s from metadata where hash = \'%s\';' % (
-                    metadata_format, hash_value))
-            cursor.execute(sql)
+            sql = 'select %s from metadata where hash = ?;' % metadata_format
+            cursor.execute(sql, (hash_value,))
             data = cursor.fetchone()
             if data is None:
                 raise HashNotFoundError('No hash found for %s' % hash_value)
@@ -369,5 +391,3 @@ class MetadataDbIO(QObject):
         except Exception, e:
             LOGGER.debug("Error %s:" % e.args[0])
             raise
-        finally:
-            self.close_connection()
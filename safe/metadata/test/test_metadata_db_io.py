@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+InaSAFE Disaster risk assessment tool developed by AusAid -
+**metadata module.**
+
+Contact : ole.moller.nielsen@gmail.com
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+from safe.common.exceptions import HashNotFoundError
+from safe.metadata.metadata_db_io import MetadataDbIO
+
+
+class TestMetadataDbIO(TestCase):
+    """Tests for the metadata database connections and records."""
+
+    def setUp(self):
+        """Create a metadata database in a temporary directory."""
+        self.directory = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.directory, 'metadata.db')
+        self.db_io = MetadataDbIO()
+        self.db_io.set_metadata_db_path(self.db_path)
+
+    def tearDown(self):
+        """Close the connection and remove the database."""
+        self.db_io.close_connection()
+        shutil.rmtree(self.directory)
+
+    def test_connection_reused(self):
+        """Test instances in a thread share one connection."""
+        self.db_io.write_metadata_for_uri('uri', json='{}', xml='<xml/>')
+        connection = self.db_io.connection
+        self.assertIsNotNone(connection)
+
+        other_io = MetadataDbIO()
+        other_io.set_metadata_db_path(self.db_path)
+        self.assertEqual(
+            other_io.read_metadata_from_uri('uri', 'xml'), '<xml/>')
+        self.assertIs(other_io.connection, connection)
+
+        journal_mode = connection.execute('PRAGMA journal_mode;').fetchone()
+        self.assertEqual(journal_mode[0], 'wal')
+
+        # Another thread gets its own connection.
+        connections = []
+
+        def read():
+            thread_io = MetadataDbIO()
+            thread_io.set_metadata_db_path(self.db_path)
+            thread_io.read_metadata_from_uri('uri', 'json')
+            connections.append(thread_io.connection)
+            thread_io.close_connection()
+
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+        self.assertIsNot(connections[0], connection)
+
+    def test_connection_per_thread(self):
+        """Test an instance uses the connection of the current thread."""
+        self.db_io.write_metadata_for_uri('uri', json='{}')
+        connection = self.db_io.connection
+
+        results = []
+
+        def read():
+            results.append(self.db_io.read_metadata_from_uri('uri', 'json'))
+            results.append(self.db_io.connection)
+            self.db_io.close_connection()
+
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+        self.assertEqual(results[0], '{}')
+        self.assertIsNot(results[1], connection)
+        self.assertIs(self.db_io.connection, connection)
+
+        # A connection closed by another instance is opened again.
+        other_io = MetadataDbIO()
+        other_io.set_metadata_db_path(self.db_path)
+        other_io.close_connection()
+        self.assertIsNone(self.db_io.connection)
+        self.assertEqual(
+            self.db_io.read_metadata_from_uri('uri', 'json'), '{}')
+
+    def test_write_metadata_for_uris(self):
+        """Test records are written, replaced and deleted."""
+        self.db_io.write_metadata_for_uris(
+            [('uri%s' % i, '{"i": %s}' % i, None) for i in range(100)])
+        self.assertEqual(
+            self.db_io.read_metadata_from_uri('uri42', 'json'), '{"i": 42}')
+
+        # Existing records are replaced.
+        self.db_io.write_metadata_for_uri('uri42', json='{}')
+        self.assertEqual(self.db_io.read_metadata_from_uri('uri42', 'json'),
+                         '{}')
+
+        self.db_io.delete_metadata_for_uri('uri42')
+        self.assertRaises(
+            HashNotFoundError,
+            self.db_io.read_metadata_from_uri, 'uri42', 'json')
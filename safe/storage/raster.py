@@ -40,6 +40,10 @@ from safe.utilities.metadata import (
     read_iso19115_metadata,
 )
 
+# Number of cells written at a time when copying a raster which has not been
+# read into memory.
+BLOCK_CELLS = 2 ** 20
+
 
 class Raster(Layer):
     """InaSAFE representation of raster data
@@ -87,6 +91,9 @@ class Raster(Layer):
         online documentation. Hence the details are specified in the
         class docstring.
         """
+        # Data of rasters read from a file is only read when first needed.
+        self._data = None
+        self.band = None
 
         # Invoke common layer constructor
         Layer.__init__(self,
@@ -245,31 +252,120 @@ class Raster(Layer):
             msg = 'Could not read raster band from %s' % filename
             raise ReadLayerError(msg)
 
-        # Force garbage collection to free up any memory we can (TS)
-        gc.collect()
+        # The data itself is read when it is first needed, see the data
+        # property.
+        self._data = None
+
+    @property
+    def data(self):
+        """Raster data as a numeric array, with no data as NaN.
+
+        For rasters read from a file, the band is read on first access.
+        Until then the raster only holds its metadata, so that windows can
+        be read with read_window without loading the whole file.
+        """
+        if self._data is None and self.band is not None:
+            # Force garbage collection to free up any memory we can (TS)
+            gc.collect()
+
+            data = self._read_band(0, 0, self.columns, self.rows)
+
+            # Self check
+            M, N = data.shape
+            msg = (
+                'Dimensions of raster array do not match those of '
+                'raster file %s' % self.filename)
+            verify(M == self.rows, msg)
+            verify(N == self.columns, msg)
+
+            self._data = data
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        """Set the raster data.
+
+        :param data: Raster data as a numeric array.
+        :type data: numpy.ndarray
+        """
+        self._data = data
+
+    def _read_band(self, x_offset, y_offset, columns, rows):
+        """Read a window of the raster file with no data as NaN.
 
-        # Read from raster file
-        data = band.ReadAsArray()
+        :param x_offset: Column of the top left cell of the window.
+        :type x_offset: int
 
-        # Convert to double precision (issue #75)
+        :param y_offset: Row of the top left cell of the window.
+        :type y_offset: int
+
+        :param columns: Number of columns in the window.
+        :type columns: int
+
+        :param rows: Number of rows in the window.
+        :type rows: int
+
+        :returns: The window in double precision (issue #75).
+        :rtype: numpy.ndarray
+        """
+        data = self.band.ReadAsArray(x_offset, y_offset, columns, rows)
         data = numpy.array(data, dtype=numpy.float64)
 
-        # Self check
-        M, N = data.shape
-        msg = (
-            'Dimensions of raster array do not match those of '
-            'raster file %s' % self.filename)
-        verify(M == self.rows, msg)
-        verify(N == self.columns, msg)
         nodata = self.band.GetNoDataValue()
         if nodata is None:
             nodata = -9999
 
         if nodata is not numpy.nan:
-            NaN = numpy.ones((M, N), numpy.float64) * numpy.nan
-            data = numpy.where(data == nodata, NaN, data)
+            data[data == nodata] = numpy.nan
+
+        return data
+
+    def read_window(self, x_offset, y_offset, columns, rows):
+        """Get a window of this raster as a new raster layer.
+
+        If the data of this raster has not been read yet, only the window is
+        read from the file.
+
+        .. versionadded:: 3.5
+
+        :param x_offset: Column of the top left cell of the window.
+        :type x_offset: int
+
+        :param y_offset: Row of the top left cell of the window.
+        :type y_offset: int
+
+        :param columns: Number of columns in the window.
+        :type columns: int
 
-        self.data = data
+        :param rows: Number of rows in the window.
+        :type rows: int
+
+        :returns: The window, with the keywords of this raster.
+        :rtype: Raster
+        """
+        if self._data is None and self.band is not None:
+            data = self._read_band(x_offset, y_offset, columns, rows)
+        else:
+            data = self.get_data()[
+                y_offset:y_offset + rows, x_offset:x_offset + columns].copy()
+
+        top_left_x, x_resolution, x_rotation, top_left_y, y_rotation, \
+            y_resolution = self.geotransform
+        geotransform = (
+            top_left_x + x_offset * x_resolution + y_offset * x_rotation,
+            x_resolution,
+            x_rotation,
+            top_left_y + x_offset * y_rotation + y_offset * y_resolution,
+            y_rotation,
+            y_resolution)
+
+        return Raster(
+            data=data,
+            projection=self.get_projection(),
+            geotransform=geotransform,
+            name=self.name,
+            keywords=self.get_keywords(),
+            style_info=self.get_style_info())
 
     def write_to_file(self, filename):
         """Save raster data to file
@@ -288,11 +384,20 @@ class Raster(Layer):
         verify(extension in ['.tif'], msg)
         file_format = DRIVER_MAP[extension]
 
-        # Get raster data
-        A = self.get_data()
+        # Get raster data. If it has not been read from our own file yet, it
+        # is copied block by block instead of being loaded all at once.
+        streamed = (
+            self._data is None and
+            self.band is not None and
+            os.path.abspath(filename) != os.path.abspath(self.filename))
+        if streamed:
+            A = None
+            N, M = self.rows, self.columns
+        else:
+            A = self.get_data()
 
-        # Get Dimensions. Note numpy and Gdal swap order
-        N, M = A.shape
+            # Get Dimensions. Note numpy and Gdal swap order
+            N, M = A.shape
 
         # Create empty file.
         # FIXME (Ole): It appears that this is created as single
@@ -312,8 +417,19 @@ class Raster(Layer):
         fid.SetGeoTransform(self.geotransform)
 
         # Write data
-        fid.GetRasterBand(1).WriteArray(A)
-        fid.GetRasterBand(1).SetNoDataValue(self.get_nodata_value())
+        band = fid.GetRasterBand(1)
+        if A is None:
+            # Same scaling as get_data() would apply
+            sigma = self._scaling_factor(None)
+            block_rows = max(1, BLOCK_CELLS // M)
+            for y_offset in range(0, N, block_rows):
+                rows = min(block_rows, N - y_offset)
+                block = self._read_band(0, y_offset, M, rows)
+                band.WriteArray(sigma * block, 0, y_offset)
+        else:
+            band.WriteArray(A)
+        band.SetNoDataValue(self.get_nodata_value())
+        band = None
         fid = None  # Close
 
         # Write keywords if any
@@ -322,9 +438,9 @@ class Raster(Layer):
     def read_from_qgis_native(self, qgis_layer):
         """Read raster data from qgis layer QgsRasterLayer.
 
-            A stub is used now:
-                save all data in a file,
-                then call safe.read_from_file
+            Layers provided by GDAL are read directly from their data source.
+            Other layers are rendered to a temporary file first, which is
+            then read with safe.read_from_file
 
             Raises:
                 * TypeError         if qgis is not avialable
@@ -332,12 +448,21 @@ class Raster(Layer):
                 * GetDataError      if can't create copy of qgis_layer's
                                         dataProvider
         """
+        provider = qgis_layer.dataProvider()
+        if provider.name() == 'gdal' and provider.bandCount() == 1:
+            # Keywords given to the constructor take precedence over the
+            # ones stored alongside the data source.
+            keywords = self.keywords
+            self.read_from_file(str(qgis_layer.source()))
+            if keywords:
+                self.keywords = keywords
+            return
+
         base_name = unique_filename()
         file_name = base_name + '.tif'
 
         file_writer = QgsRasterFileWriter(file_name)
         pipe = QgsRasterPipe()
-        provider = qgis_layer.dataProvider()
         if not pipe.set(provider.clone()):
             msg = "Cannot set pipe provider"
             raise GetDataError(msg)
@@ -433,6 +558,22 @@ class Raster(Layer):
             A = numpy.where(numpy.isnan(A), NoData, A)
 
         # Take care of possible scaling
+        sigma = self._scaling_factor(scaling)
+
+        # Return possibly scaled data
+        return sigma * A
+
+    def _scaling_factor(self, scaling):
+        """Get the factor get_data uses to scale the data.
+
+        :param scaling: The scaling argument of get_data.
+        :type scaling: bool, float, None
+
+        :returns: The factor to multiply the data with.
+        :rtype: float
+
+        :raises: GetDataError
+        """
         if scaling is None:
             # Redefine scaling from density keyword if possible
             keywords = self.get_keywords()
@@ -462,8 +603,7 @@ class Raster(Layer):
                        'number: %s' % (scaling, str(e)))
                 raise GetDataError(msg)
 
-        # Return possibly scaled data
-        return sigma * A
+        return sigma
 
     def get_geotransform(self, copy=False):
         """Return geotransform for this raster layer
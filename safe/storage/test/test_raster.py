@@ -15,9 +15,13 @@ import os
 import logging
 import unittest
 
+import numpy
+from osgeo import gdal
+
 from qgis.core import QgsRasterLayer
 
 from safe.storage.raster import Raster
+from safe.common.utilities import unique_filename
 from safe.test.utilities import test_data_path, get_qgis_app
 
 QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
@@ -62,6 +66,56 @@ class RasterTest(unittest.TestCase):
         layer_exent = layer.get_bounding_box()
         self.assertListEqual(layer_exent, qgis_extent)
 
+    def test_convert_in_memory_raster(self):
+        """Test that rasters without a file are converted in memory."""
+        source = Raster(data=RASTER_BASE + '.tif')
+        layer = Raster(
+            data=source.get_data(),
+            projection=source.get_projection(),
+            geotransform=source.get_geotransform())
+        self.assertIsNone(layer.get_filename())
+
+        qgis_layer = layer.as_qgis_native()
+        self.assertTrue(qgis_layer.isValid())
+        self.assertTrue(qgis_layer.source().startswith('/vsimem/'))
+        self.assertEqual(qgis_layer.width(), source.columns)
+        self.assertEqual(qgis_layer.height(), source.rows)
+
+        # The in-memory file is freed with the layer
+        path = qgis_layer.source()
+        self.assertIsNotNone(gdal.VSIStatL(path))
+        del qgis_layer
+        self.assertIsNone(gdal.VSIStatL(path))
+
+    def test_read_window(self):
+        """Test windows are read without loading the whole raster."""
+        layer = Raster(data=RASTER_BASE + '.tif')
+        self.assertIsNone(layer._data)
+
+        window = layer.read_window(2, 3, 4, 5)
+        self.assertIsNone(layer._data)
+        self.assertEqual((window.rows, window.columns), (5, 4))
+        numpy.testing.assert_array_equal(
+            window.get_data(), layer.get_data()[3:8, 2:6])
+
+        top_left_x, x_resolution, _, top_left_y, _, y_resolution = \
+            layer.get_geotransform()
+        geotransform = window.get_geotransform()
+        self.assertAlmostEqual(
+            geotransform[0], top_left_x + 2 * x_resolution)
+        self.assertAlmostEqual(
+            geotransform[3], top_left_y + 3 * y_resolution)
+        self.assertEqual(window.get_keywords(), layer.get_keywords())
+
+    def test_write_unread_raster(self):
+        """Test rasters not read yet are copied to the new file."""
+        layer = Raster(data=RASTER_BASE + '.tif')
+        filename = unique_filename(suffix='.tif')
+        layer.write_to_file(filename)
+        self.assertIsNone(layer._data)
+
+        copy = Raster(data=filename)
+        numpy.testing.assert_array_equal(copy.get_data(), layer.get_data())
 
 if __name__ == '__main__':
     suite = unittest.makeSuite(RasterTest, 'test')
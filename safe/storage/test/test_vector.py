@@ -83,6 +83,24 @@ class VectorTest(unittest.TestCase):
             self.assertEqual(
                 count, 250, 'Expected 250 features, got %s' % count)
 
+            # Data read from the QGIS layer matches data read from file
+            file_layer = Vector(data=SHP_BASE + '.shp')
+            self.assertIsNone(layer.get_filename())
+            self.assertEqual(layer.get_data(), file_layer.get_data())
+            self.assertEqual(layer.projection, file_layer.projection)
+
+    def test_convert_to_qgis_memory_layer(self):
+        """Test that layers without a file become QGIS memory layers."""
+        if QGIS_IS_AVAILABLE:
+            qgis_layer = QgsVectorLayer(SHP_BASE + '.shp', 'test', 'ogr')
+            layer = Vector(data=qgis_layer, keywords={})
+
+            memory_layer = layer.as_qgis_native()
+            self.assertEqual(memory_layer.providerType(), 'memory')
+            self.assertEqual(memory_layer.featureCount(), 250)
+            self.assertEqual(
+                memory_layer.crs().authid(), qgis_layer.crs().authid())
+
     def test_convert_to_qgis_vector_layer(self):
         """Test that converting to QgsVectorLayer works."""
         if QGIS_IS_AVAILABLE:
@@ -3,6 +3,7 @@
 """
 
 import copy
+import uuid
 import numpy
 import math
 from osgeo import ogr
@@ -10,7 +11,8 @@ from osgeo import ogr
 from geometry import Polygon
 from safe.gis.numerics import ensure_numeric
 from safe.common.utilities import verify
-from safe.common.exceptions import BoundingBoxError, InaSAFEError
+from safe.common.exceptions import (
+    BoundingBoxError, InaSAFEError, MemoryLayerCreationError)
 from safe.utilities.i18n import tr
 
 # Default attribute to assign to vector layers
@@ -866,7 +868,24 @@ def safe_to_qgis_layer(layer):
 
     qgis_layer = None
     # Read layer
-    if layer.is_vector:
+    if filename is None:
+        # The layer only lives in memory, hand it over without a file.
+        if layer.is_vector:
+            qgis_layer = vector_to_memory_layer(layer)
+        elif layer.is_raster:
+            from osgeo import gdal
+            filename = raster_to_vsimem(layer)
+            qgis_layer = QgsRasterLayer(filename, name)
+
+            def unlink_raster(*_):
+                """Free the in-memory file along with the layer."""
+                gdal.Unlink(filename)
+
+            if qgis_layer.isValid():
+                qgis_layer.destroyed.connect(unlink_raster)
+            else:
+                unlink_raster()
+    elif layer.is_vector:
         qgis_layer = QgsVectorLayer(filename, name, 'ogr')
     elif layer.is_raster:
         qgis_layer = QgsRasterLayer(filename, name)
@@ -878,3 +897,132 @@ def safe_to_qgis_layer(layer):
         # noinspection PyUnresolvedReferences
         message = tr('Loaded impact layer "%s" is not valid') % filename
         raise Exception(message)
+
+
+def vector_to_memory_layer(layer):
+    """Create a QGIS memory layer from the data of a SAFE vector layer.
+
+    :param layer: The SAFE vector layer.
+    :type layer: Vector
+
+    :returns: A memory layer holding the same features and attributes.
+    :rtype: QgsVectorLayer
+    """
+    from qgis.core import (
+        QgsVectorLayer,
+        QgsCoordinateReferenceSystem,
+        QgsFeature,
+        QgsField,
+        QgsGeometry,
+        QgsPoint)
+    from PyQt4.QtCore import QVariant
+
+    geometry_names = {
+        ogr.wkbPoint: 'Point',
+        ogr.wkbLineString: 'LineString',
+        ogr.wkbPolygon: 'Polygon'}
+    # SAFE vectors hold one part per feature, so multi part types are
+    # written as their single part type. 2.5D types lose their z values.
+    single_types = {
+        ogr.wkbMultiPoint: ogr.wkbPoint,
+        ogr.wkbMultiLineString: ogr.wkbLineString,
+        ogr.wkbMultiPolygon: ogr.wkbPolygon}
+    geometry_type = None
+    if layer.geometry_type is not None:
+        geometry_type = ogr.GT_Flatten(layer.geometry_type)
+        geometry_type = single_types.get(geometry_type, geometry_type)
+    if geometry_type not in geometry_names:
+        raise MemoryLayerCreationError(tr(
+            'Can not create a memory layer for %s with geometry type %s.'
+        ) % (layer.get_name(), layer.geometry_type))
+
+    crs = QgsCoordinateReferenceSystem()
+    crs.createFromWkt(layer.projection.spatial_reference.ExportToWkt())
+    uri = geometry_names[geometry_type]
+    if crs.authid():
+        uri = '%s?crs=%s' % (uri, crs.authid())
+    qgis_layer = QgsVectorLayer(uri, layer.get_name(), 'memory')
+    if not crs.authid():
+        qgis_layer.setCrs(crs)
+    provider = qgis_layer.dataProvider()
+
+    data = layer.get_data()
+    if data:
+        attribute_names = layer.get_attribute_names()
+    else:
+        attribute_names = []
+    fields = []
+    for attribute_name in attribute_names:
+        # Pick the field type from the first value which is not None
+        field_type = QVariant.String
+        for row in data:
+            value = row[attribute_name]
+            if value is None:
+                continue
+            if isinstance(value, (bool, int, long)):
+                field_type = QVariant.Int
+            elif isinstance(value, float):
+                field_type = QVariant.Double
+            break
+        fields.append(QgsField(attribute_name, field_type))
+    provider.addAttributes(fields)
+    qgis_layer.updateFields()
+
+    def to_points(ring):
+        """Convert an Nx2 array to a list of QgsPoint."""
+        return [QgsPoint(float(point[0]), float(point[1])) for point in ring]
+
+    if geometry_type == ogr.wkbPolygon:
+        geometries = [
+            QgsGeometry.fromPolygon(
+                [to_points(polygon.outer_ring)] +
+                [to_points(ring) for ring in polygon.inner_rings])
+            for polygon in layer.get_geometry(as_geometry_objects=True)]
+    elif geometry_type == ogr.wkbLineString:
+        geometries = [
+            QgsGeometry.fromPolyline(to_points(line))
+            for line in layer.get_geometry()]
+    else:
+        geometries = [
+            QgsGeometry.fromPoint(QgsPoint(float(point[0]), float(point[1])))
+            for point in layer.get_geometry()]
+
+    features = []
+    for geometry, row in zip(geometries, data):
+        feature = QgsFeature(qgis_layer.pendingFields())
+        feature.setGeometry(geometry)
+        feature.setAttributes([row[key] for key in attribute_names])
+        features.append(feature)
+    provider.addFeatures(features)
+    qgis_layer.updateExtents()
+    return qgis_layer
+
+
+def raster_to_vsimem(layer):
+    """Write a SAFE raster layer to a GDAL in-memory GeoTIFF.
+
+    The returned path lives in the GDAL virtual file system, so it can be
+    opened by QGIS and GDAL in this process without touching the disk. The
+    caller must free it with gdal.Unlink once it is not used any more.
+
+    :param layer: The SAFE raster layer.
+    :type layer: Raster
+
+    :returns: The /vsimem/ path of the raster.
+    :rtype: str
+    """
+    from osgeo import gdal
+
+    filename = '/vsimem/%s.tif' % uuid.uuid4().hex
+    data = layer.get_data()
+    rows, columns = data.shape
+
+    driver = gdal.GetDriverByName('GTiff')
+    fid = driver.Create(filename, columns, rows, 1, gdal.GDT_Float64)
+    fid.SetProjection(str(layer.projection))
+    fid.SetGeoTransform(layer.get_geotransform())
+    band = fid.GetRasterBand(1)
+    band.WriteArray(data)
+    band.SetNoDataValue(layer.get_nodata_value())
+    fid = None  # Close
+    return filename
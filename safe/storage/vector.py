@@ -487,40 +487,7 @@ class Vector(Layer):
                 msg = ('Geometry was None in filename %s ' % filename)
                 raise ReadLayerError(msg)
             else:
-                self.geometry_type = G.GetGeometryType()
-                if self.is_point_data:
-                    geometry.append((G.GetX(), G.GetY()))
-                elif self.is_line_data:
-                    ring = get_ring_data(G)
-                    geometry.append(ring)
-                elif self.is_polygon_data:
-                    polygon = get_polygon_data(G)
-                    geometry.append(polygon)
-                elif self.is_multi_polygon_data:
-                    try:
-                        G = ogr.ForceToPolygon(G)
-                    except:
-                        msg = ('Got geometry type Multipolygon (%s) for '
-                               'filename %s and could not convert it to '
-                               'singlepart. However, you can use QGIS '
-                               'functionality to convert multipart vector '
-                               'data to singlepart (Vector -> Geometry Tools '
-                               '-> Multipart to Singleparts and use the '
-                               'resulting dataset.'
-                               % (ogr.wkbMultiPolygon, filename))
-                        raise ReadLayerError(msg)
-                    else:
-                        # Read polygon data as single part
-                        self.geometry_type = ogr.wkbPolygon
-                        polygon = get_polygon_data(G)
-                        geometry.append(polygon)
-                else:
-                    msg = ('Only point, line and polygon geometries are '
-                           'supported. '
-                           'Geometry type in filename %s '
-                           'was %s.' % (filename,
-                                        self.geometry_type))
-                    raise ReadLayerError(msg)
+                geometry.append(self._unpack_geometry(G, filename))
 
             # Record attributes by name
             number_of_fields = feature.GetFieldCount()
@@ -551,16 +518,64 @@ class Vector(Layer):
         self.geometry = geometry
         self.data = data
 
+    def _unpack_geometry(self, G, source):
+        """Convert an OGR geometry to the representation used by SAFE.
+
+        Multipolygons are forced to single polygons. self.geometry_type is
+        updated to the type of the geometry.
+
+        :param G: The geometry to convert.
+        :type G: ogr.Geometry
+
+        :param source: Name of the data source, used in error messages.
+        :type source: str
+
+        :returns: A point tuple, a line array or a Polygon instance.
+
+        :raises: ReadLayerError
+        """
+        self.geometry_type = G.GetGeometryType()
+        if self.is_point_data:
+            return G.GetX(), G.GetY()
+        elif self.is_line_data:
+            return get_ring_data(G)
+        elif self.is_polygon_data:
+            return get_polygon_data(G)
+        elif self.is_multi_polygon_data:
+            try:
+                G = ogr.ForceToPolygon(G)
+            except:
+                msg = ('Got geometry type Multipolygon (%s) for '
+                       'filename %s and could not convert it to '
+                       'singlepart. However, you can use QGIS '
+                       'functionality to convert multipart vector '
+                       'data to singlepart (Vector -> Geometry Tools '
+                       '-> Multipart to Singleparts and use the '
+                       'resulting dataset.'
+                       % (ogr.wkbMultiPolygon, source))
+                raise ReadLayerError(msg)
+            else:
+                # Read polygon data as single part
+                self.geometry_type = ogr.wkbPolygon
+                return get_polygon_data(G)
+        else:
+            msg = ('Only point, line and polygon geometries are '
+                   'supported. '
+                   'Geometry type in filename %s '
+                   'was %s.' % (source,
+                                self.geometry_type))
+            raise ReadLayerError(msg)
+
     def read_from_qgis_native(self, qgis_layer):
         """Read and unpack vector data from qgis layer QgsVectorLayer.
 
-            A stub is used now:
-                save all data in a file,
-                then call safe.read_from_file
+        Geometries and attributes are read straight from the features of
+        the layer, so nothing is written to disk.
 
-            Raises:
-                * TypeError         if qgis is not avialable
-                * IOError           if can't store temporary file
+        :param qgis_layer: The layer to read.
+        :type qgis_layer: QgsVectorLayer
+
+        :raises: TypeError if qgis is not available, ReadLayerError
         """
         # FIXME (DK): this branch isn't covered by test
         if not QGIS_IS_AVAILABLE:
@@ -568,23 +583,46 @@ class Vector(Layer):
                    'but QGIS is not available.')
             raise TypeError(msg)
 
-        base_name = unique_filename()
-        file_name = base_name + '.shp'
-        error = QgsVectorFileWriter.writeAsVectorFormat(
-            qgis_layer,
-            file_name,
-            "UTF8",
-            qgis_layer.crs(),
-            "ESRI Shapefile"
-        )
-        if error != QgsVectorFileWriter.NoError:
-            # FIXME (DK): this branch isn't covered by test
-            msg = ('Can not save data in temporary file.')
-            raise IOError(msg)
+        source = qgis_layer.source()
+        if self.name is None:
+            if 'title' in self.keywords:
+                self.name = tr(self.keywords['title'])
+            else:
+                self.name = qgis_layer.name()
+        self.geometry_type = None  # In case there are no features
 
-        # Write keywords if any
-        write_iso19115_metadata(file_name, self.keywords)
-        self.read_from_file(file_name)
+        extent = qgis_layer.extent()
+        self.extent = [
+            extent.xMinimum(),
+            extent.xMaximum(),
+            extent.yMinimum(),
+            extent.yMaximum()]
+        self.projection = Projection(str(qgis_layer.crs().toWkt()))
+
+        field_names = [field.name() for field in qgis_layer.pendingFields()]
+        geometry = []
+        data = []
+        for feature in qgis_layer.getFeatures():
+            qgis_geometry = feature.geometry()
+            if qgis_geometry is None or qgis_geometry.isGeosEmpty():
+                msg = ('Geometry was None in layer %s ' % source)
+                raise ReadLayerError(msg)
+            G = ogr.CreateGeometryFromWkt(str(qgis_geometry.exportToWkt()))
+            geometry.append(self._unpack_geometry(G, source))
+
+            fields = {}
+            for name, value in zip(field_names, feature.attributes()):
+                # NULL attributes come back as QPyNullVariant, OGR gives us
+                # None for those when reading from file.
+                if value.__class__.__name__ == 'QPyNullVariant':
+                    value = None
+                elif value == _pseudo_inf:
+                    value = float('nan')
+                fields[name] = value
+            data.append(fields)
+
+        self.geometry = geometry
+        self.data = data
 
     def as_qgis_native(self):
         """Return vector layer data as qgis QgsVectorLayer.
@@ -0,0 +1,535 @@
+# coding=utf-8
+"""Benchmarks of impact functions on synthetic data.
+
+Hazard and exposure layers of a configurable size are generated from the
+bundled test layers: the keywords, extent and attribute values of a test
+layer are reused while the grid or the features are random. Every
+registered impact function accepting a pair of layers is then run through
+run_analysis and its throughput and peak memory are reported. Each run is
+made in a new Python process, so its peak memory is its own rather than
+that of the biggest run so far.
+
+Results can be saved as a json baseline and later runs compared against it
+to catch scaling regressions, e.g.::
+
+    python -m safe.test.benchmark --output baseline.json
+    python -m safe.test.benchmark --baseline baseline.json
+
+.. versionadded:: 3.5
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import subprocess
+from collections import OrderedDict
+
+import numpy
+
+from safe.test.utilities import get_qgis_app, test_data_path, load_layer
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from safe.common.utilities import temp_dir, unique_filename
+from safe.gis.polygon import generate_random_points_in_bbox, populate_polygon
+from safe.impact_functions import register_impact_functions
+from safe.impact_functions.impact_function_manager import ImpactFunctionManager
+from safe.storage.core import read_layer
+from safe.storage.raster import Raster
+from safe.storage.vector import Vector
+from safe.utilities.profiling import get_peak_memory
+
+LOGGER = logging.getLogger('InaSAFE')
+
+# Test layers used as templates for the synthetic layers.
+HAZARD_TEMPLATES = OrderedDict([
+    ('continuous_flood', test_data_path(
+        'hazard', 'continuous_flood_20_20.asc')),
+    ('earthquake', test_data_path('hazard', 'earthquake.tif')),
+    ('flood_polygon', test_data_path('hazard', 'floods.shp')),
+    ('generic_polygon', test_data_path(
+        'hazard', 'classified_generic_polygon.shp'))
+])
+EXPOSURE_TEMPLATES = OrderedDict([
+    ('population', test_data_path(
+        'exposure', 'pop_binary_raster_20_20.asc')),
+    ('building_points', test_data_path('exposure', 'building-points.shp')),
+    ('building_polygons', test_data_path('exposure', 'buildings.shp'))
+])
+
+# Default sizes: cells along each side of a raster and number of features
+# of a vector layer.
+DEFAULT_RASTER_SIZES = [100, 400]
+DEFAULT_FEATURE_COUNTS = [1000, 10000]
+
+# A run is a regression when its throughput drops by more than this
+# fraction of the baseline.
+DEFAULT_TOLERANCE = 0.25
+
+
+def bounding_polygon(layer):
+    """Get the bounding box of a SAFE layer as a polygon.
+
+    :param layer: Raster or vector layer.
+    :type layer: Raster, Vector
+
+    :returns: Vertices of the bounding box.
+    :rtype: numpy.ndarray
+    """
+    west, south, east, north = layer.get_bounding_box()
+    return numpy.array([
+        [west, south], [east, south], [east, north], [west, north]])
+
+
+def synthetic_raster(template_path, size, seed=None):
+    """Generate a random raster covering the extent of a template raster.
+
+    :param template_path: Path to the template raster.
+    :type template_path: str
+
+    :param size: Number of cells along each side of the raster.
+    :type size: int
+
+    :param seed: Seed for the random values.
+    :type seed: int
+
+    :returns: Path to the generated raster, with the keywords of the
+        template.
+    :rtype: str
+    """
+    template = read_layer(template_path)
+    data = template.get_data()
+    minimum = numpy.nanmin(data)
+    maximum = numpy.nanmax(data)
+
+    west, south, east, north = template.get_bounding_box()
+    geotransform = (
+        west, (east - west) / size, 0, north, 0, -(north - south) / size)
+    values = numpy.random.RandomState(seed).uniform(
+        minimum, maximum, (size, size))
+
+    raster = Raster(
+        data=values,
+        projection=template.get_projection(),
+        geotransform=geotransform,
+        keywords=template.get_keywords())
+    path = unique_filename(suffix='.tif', dir=temp_dir('benchmark'))
+    raster.write_to_file(path)
+    return path
+
+
+def synthetic_vector(template_path, count, seed=None):
+    """Generate random features in the extent of a template vector layer.
+
+    Points are drawn uniformly in the bounding box. Polygons are squares
+    centred on points which fall inside it. Attribute values are drawn from
+    the values of the template so that the keywords still apply.
+
+    :param template_path: Path to the template point or polygon layer.
+    :type template_path: str
+
+    :param count: Number of features.
+    :type count: int
+
+    :param seed: Seed for the random geometries and attributes.
+    :type seed: int
+
+    :returns: Path to the generated shapefile, with the keywords of the
+        template.
+    :rtype: str
+    """
+    template = read_layer(template_path)
+    bounding_box = bounding_polygon(template)
+
+    if template.is_point_data:
+        geometry = generate_random_points_in_bbox(
+            bounding_box, count, seed=seed)
+    else:
+        centres = populate_polygon(bounding_box, count, seed=seed)
+        west, south = bounding_box[0]
+        east, north = bounding_box[2]
+        # Squares get smaller as there are more of them, covering about a
+        # quarter of the extent.
+        half = 0.25 * ((east - west) * (north - south) / count) ** 0.5
+        geometry = [numpy.array([
+            [x - half, y - half],
+            [x + half, y - half],
+            [x + half, y + half],
+            [x - half, y + half],
+            [x - half, y - half]]) for x, y in centres]
+
+    random_generator = random.Random(seed)
+    attributes = template.get_data()
+    names = template.get_attribute_names()
+    data = []
+    for _ in range(count):
+        feature = random_generator.choice(attributes)
+        data.append(dict((name, feature[name]) for name in names))
+
+    vector = Vector(
+        data=data,
+        projection=template.get_projection(),
+        geometry=geometry,
+        keywords=template.get_keywords())
+    path = unique_filename(suffix='.shp', dir=temp_dir('benchmark'))
+    vector.write_to_file(path)
+    return path
+
+
+def synthetic_layer(template_path, size, seed=None):
+    """Generate a synthetic raster or vector layer from a template.
+
+    :param template_path: Path to the template layer.
+    :type template_path: str
+
+    :param size: Cells along each side for a raster, number of features
+        for a vector layer.
+    :type size: int
+
+    :param seed: Seed for the random data.
+    :type seed: int
+
+    :returns: Path to the generated layer.
+    :rtype: str
+    """
+    if os.path.splitext(template_path)[1] == '.shp':
+        return synthetic_vector(template_path, size, seed=seed)
+    return synthetic_raster(template_path, size, seed=seed)
+
+
+def layer_units(layer):
+    """Count the units processed for an exposure layer.
+
+    :param layer: Exposure layer.
+    :type layer: Raster, Vector
+
+    :returns: Number of cells of a raster or features of a vector layer.
+    :rtype: int
+    """
+    if layer.is_raster:
+        return layer.rows * layer.columns
+    return len(layer)
+
+
+def run_benchmark(impact_function_id, hazard_path, exposure_path):
+    """Run an impact function on a pair of layers and measure it.
+
+    The peak memory is that of the whole process, so the benchmark should
+    run in a process of its own, see run_isolated_benchmark.
+
+    :param impact_function_id: ID of the impact function.
+    :type impact_function_id: str
+
+    :param hazard_path: Path to the hazard layer.
+    :type hazard_path: str
+
+    :param exposure_path: Path to the exposure layer.
+    :type exposure_path: str
+
+    :returns: Wall time in seconds, units processed per second, peak memory
+        of the process in MB, time and memory for each analysis step and
+        the error message if the analysis failed.
+    :rtype: OrderedDict
+    """
+    impact_function = ImpactFunctionManager().get(impact_function_id)
+    impact_function.hazard = load_layer(hazard_path)[0]
+    impact_function.exposure = load_layer(exposure_path)[0]
+    impact_function.force_memory = True
+    units = layer_units(read_layer(exposure_path))
+
+    start_time = time.time()
+    error = None
+    try:
+        impact_function.run_analysis()
+    except Exception, e:  # pylint: disable=W0703
+        error = str(e)
+    wall_time = time.time() - start_time
+    peak_memory = get_peak_memory()
+    if error is None and impact_function.impact is None:
+        error = 'No impact layer was generated.'
+
+    if peak_memory is not None:
+        peak_memory = round(peak_memory, 1)
+    throughput = None
+    if error is None and wall_time > 0:
+        throughput = round(units / wall_time, 1)
+
+    return OrderedDict([
+        ('units', units),
+        ('wall_time', round(wall_time, 3)),
+        ('throughput', throughput),
+        ('peak_memory', peak_memory),
+        ('phases', impact_function.performance),
+        ('error', error)])
+
+
+def run_isolated_benchmark(impact_function_id, hazard_path, exposure_path):
+    """Run a benchmark in a new Python process.
+
+    :param impact_function_id: ID of the impact function.
+    :type impact_function_id: str
+
+    :param hazard_path: Path to the hazard layer.
+    :type hazard_path: str
+
+    :param exposure_path: Path to the exposure layer.
+    :type exposure_path: str
+
+    :returns: The figures of run_benchmark. If the process failed, e.g. it
+        was killed for using too much memory, only the error is set.
+    :rtype: OrderedDict
+    """
+    output_path = unique_filename(suffix='.json', dir=temp_dir('benchmark'))
+    environment = dict(os.environ)
+    environment['PYTHONPATH'] = os.pathsep.join(sys.path)
+    command = [
+        sys.executable, '-m', 'safe.test.benchmark',
+        '--run', impact_function_id, hazard_path, exposure_path,
+        '--output', output_path]
+    status = subprocess.call(command, env=environment)
+    if status != 0 or not os.path.exists(output_path):
+        return OrderedDict([
+            ('units', None),
+            ('wall_time', None),
+            ('throughput', None),
+            ('peak_memory', None),
+            ('phases', None),
+            ('error', 'Benchmark process exited with status %s' % status)])
+    with open(output_path) as output_file:
+        result = json.load(output_file, object_pairs_hook=OrderedDict)
+    os.remove(output_path)
+    return result
+
+
+def run_benchmarks(
+        raster_sizes=None,
+        feature_counts=None,
+        impact_function_ids=None,
+        seed=0):
+    """Run every matching impact function on synthetic layers of each size.
+
+    :param raster_sizes: Cells along each side of synthetic rasters.
+    :type raster_sizes: list
+
+    :param feature_counts: Number of features of synthetic vector layers.
+    :type feature_counts: list
+
+    :param impact_function_ids: Only run these impact functions. All of
+        them are run if None.
+    :type impact_function_ids: list
+
+    :param seed: Seed for the synthetic data, so runs are comparable.
+    :type seed: int
+
+    :returns: One result per impact function, layer pair and size. See
+        run_benchmark for the figures of a result.
+    :rtype: list
+    """
+    if raster_sizes is None:
+        raster_sizes = DEFAULT_RASTER_SIZES
+    if feature_counts is None:
+        feature_counts = DEFAULT_FEATURE_COUNTS
+    register_impact_functions()
+    manager = ImpactFunctionManager()
+
+    results = []
+    for hazard_name, hazard_template in HAZARD_TEMPLATES.iteritems():
+        hazard_keywords = read_layer(hazard_template).get_keywords()
+        for exposure_name, exposure_template in \
+                EXPOSURE_TEMPLATES.iteritems():
+            exposure_keywords = read_layer(
+                exposure_template).get_keywords()
+            impact_functions = manager.filter_by_keywords(
+                hazard_keywords, exposure_keywords)
+            function_ids = [
+                manager.get_function_id(impact_function)
+                for impact_function in impact_functions]
+            if impact_function_ids is not None:
+                function_ids = [
+                    function_id for function_id in function_ids
+                    if function_id in impact_function_ids]
+            if not function_ids:
+                continue
+
+            # Scale whichever layers are the biggest part of the work.
+            if exposure_template.endswith('.shp'):
+                sizes = feature_counts
+            else:
+                sizes = raster_sizes
+            for size in sizes:
+                hazard_size = size
+                if hazard_template.endswith('.shp'):
+                    # Keep the hazard polygons fewer than the exposure.
+                    hazard_size = max(int(size ** 0.5), 1)
+                elif exposure_template.endswith('.shp'):
+                    hazard_size = max(raster_sizes)
+                hazard_path = synthetic_layer(
+                    hazard_template, hazard_size, seed=seed)
+                exposure_path = synthetic_layer(
+                    exposure_template, size, seed=seed)
+
+                for function_id in function_ids:
+                    LOGGER.info('Benchmarking %s on %s and %s of size %s' % (
+                        function_id, hazard_name, exposure_name, size))
+                    result = OrderedDict([
+                        ('impact_function', function_id),
+                        ('hazard', hazard_name),
+                        ('exposure', exposure_name),
+                        ('size', size)])
+                    result.update(run_isolated_benchmark(
+                        function_id, hazard_path, exposure_path))
+                    results.append(result)
+    return results
+
+
+def result_key(result):
+    """Key identifying the same benchmark across runs.
+
+    :param result: A benchmark result.
+    :type result: dict
+
+    :rtype: tuple
+    """
+    return (
+        result['impact_function'],
+        result['hazard'],
+        result['exposure'],
+        result['size'])
+
+
+def compare_results(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Find benchmarks which got slower or started failing.
+
+    :param results: Results of the current run.
+    :type results: list
+
+    :param baseline: Results of a previous run.
+    :type baseline: list
+
+    :param tolerance: Fraction of the baseline throughput which may be
+        lost before a benchmark is reported.
+    :type tolerance: float
+
+    :returns: Messages describing each regression.
+    :rtype: list
+    """
+    baseline_results = dict(
+        (result_key(result), result) for result in baseline)
+    regressions = []
+    for result in results:
+        previous = baseline_results.get(result_key(result))
+        if previous is None or previous['throughput'] is None:
+            continue
+        name = '%s on %s and %s of size %s' % result_key(result)
+        if result['throughput'] is None:
+            regressions.append('%s failed: %s' % (name, result['error']))
+        elif result['throughput'] < previous['throughput'] * (
+                1 - tolerance):
+            regressions.append(
+                '%s: %.1f units/s, baseline %.1f units/s' % (
+                    name, result['throughput'], previous['throughput']))
+    return regressions
+
+
+def format_results(results):
+    """Format benchmark results as a table.
+
+    :param results: Benchmark results.
+    :type results: list
+
+    :returns: A header line and one line per result.
+    :rtype: str
+    """
+    lines = ['%-40s %-18s %-18s %8s %10s %12s %10s' % (
+        'Impact function', 'Hazard', 'Exposure', 'Size', 'Wall (s)',
+        'Units/s', 'Peak (MB)')]
+    for result in results:
+        if result['error']:
+            figures = 'FAILED: %s' % result['error']
+        else:
+            figures = '%10.3f %12.1f %10s' % (
+                result['wall_time'],
+                result['throughput'],
+                result['peak_memory'])
+        lines.append('%-40s %-18s %-18s %8s %s' % (
+            result['impact_function'],
+            result['hazard'],
+            result['exposure'],
+            result['size'],
+            figures))
+    return '\n'.join(lines)
+
+
+def main(arguments=None):
+    """Run the benchmarks from the command line.
+
+    :param arguments: Command line arguments, sys.argv is used if None.
+    :type arguments: list
+
+    :returns: Exit status, 1 if there were regressions.
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark impact functions on synthetic data.')
+    parser.add_argument(
+        '--raster-sizes', type=int, nargs='+', default=DEFAULT_RASTER_SIZES,
+        help='Cells along each side of the synthetic rasters.')
+    parser.add_argument(
+        '--feature-counts', type=int, nargs='+',
+        default=DEFAULT_FEATURE_COUNTS,
+        help='Number of features of the synthetic vector layers.')
+    parser.add_argument(
+        '--functions', nargs='+',
+        help='IDs of the impact functions to run, all of them by default.')
+    parser.add_argument(
+        '--seed', type=int, default=0, help='Seed for the synthetic data.')
+    parser.add_argument(
+        '--output', help='Write the results as json to this file.')
+    parser.add_argument(
+        '--baseline', help='Compare the results with this json file.')
+    parser.add_argument(
+        '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+        help='Fraction of the baseline throughput which may be lost.')
+    parser.add_argument(
+        '--run', nargs=3, metavar=('FUNCTION', 'HAZARD', 'EXPOSURE'),
+        help='Run a single benchmark and write its figures to --output.')
+    arguments = parser.parse_args(arguments)
+
+    if arguments.run:
+        # Started by run_isolated_benchmark
+        register_impact_functions()
+        result = run_benchmark(*arguments.run)
+        with open(arguments.output, 'w') as output_file:
+            json.dump(result, output_file, indent=2)
+        return 0
+
+    results = run_benchmarks(
+        raster_sizes=arguments.raster_sizes,
+        feature_counts=arguments.feature_counts,
+        impact_function_ids=arguments.functions,
+        seed=arguments.seed)
+    print format_results(results)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare_results(
+            results, baseline, arguments.tolerance)
+        if regressions:
+            print '\nRegressions against %s:' % arguments.baseline
+            for regression in regressions:
+                print '  ' + regression
+            return 1
+        print '\nNo regressions against %s.' % arguments.baseline
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
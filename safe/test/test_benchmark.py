@@ -0,0 +1,63 @@
+# coding=utf-8
+"""Unit tests for the impact function benchmarks."""
+
+import unittest
+
+from safe.test.benchmark import (
+    synthetic_layer,
+    compare_results,
+    HAZARD_TEMPLATES,
+    EXPOSURE_TEMPLATES)
+from safe.storage.core import read_layer
+
+
+class TestBenchmark(unittest.TestCase):
+    """Tests for the synthetic data and the baseline comparison."""
+
+    def test_synthetic_raster(self):
+        """Test synthetic rasters keep the keywords of their template."""
+        template = read_layer(HAZARD_TEMPLATES['continuous_flood'])
+        layer = read_layer(synthetic_layer(
+            HAZARD_TEMPLATES['continuous_flood'], 50, seed=1))
+        self.assertEqual((layer.rows, layer.columns), (50, 50))
+        self.assertEqual(
+            layer.get_keywords('hazard'), template.get_keywords('hazard'))
+        for expected, result in zip(
+                template.get_bounding_box(), layer.get_bounding_box()):
+            self.assertAlmostEqual(expected, result)
+
+    def test_synthetic_vector(self):
+        """Test synthetic vectors draw attributes from their template."""
+        template = read_layer(EXPOSURE_TEMPLATES['building_polygons'])
+        layer = read_layer(synthetic_layer(
+            EXPOSURE_TEMPLATES['building_polygons'], 200, seed=1))
+        self.assertEqual(len(layer), 200)
+        self.assertTrue(layer.is_polygon_data)
+        self.assertEqual(
+            layer.get_keywords('exposure'), template.get_keywords('exposure'))
+        self.assertTrue(
+            set(layer.get_data('TYPE')) <= set(template.get_data('TYPE')))
+
+    def test_compare_results(self):
+        """Test regressions are found against a baseline."""
+        def result(function_id, throughput, error=None):
+            return {
+                'impact_function': function_id,
+                'hazard': 'continuous_flood',
+                'exposure': 'population',
+                'size': 100,
+                'throughput': throughput,
+                'error': error}
+
+        baseline = [result('A', 1000.0), result('B', 1000.0),
+                    result('C', 1000.0)]
+        results = [result('A', 900.0), result('B', 500.0),
+                   result('C', None, 'Boom'), result('D', 10.0)]
+        regressions = compare_results(results, baseline, tolerance=0.25)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('B on'))
+        self.assertIn('Boom', regressions[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -34,6 +34,7 @@ from qgis.core import (
     QgsVectorLayer,
     QgsRasterLayer)
 from PyQt4.QtCore import QProcess
+from osgeo import gdal
 
 from safe.common.utilities import temp_dir, which, verify
 from safe.utilities.keyword_io import KeywordIO
@@ -474,15 +475,92 @@ def _clip_raster_layer(
                 ))
             raise InvalidProjectionError(message)
 
-    # We need to provide gdalwarp with a dataset for the clip
-    # because unlike gdal_translate, it does not take projwin.
-    clip_kml = extent_to_kml(extent)
-
     # Create a filename for the clipped, resampled and reprojected layer
     handle, filename = tempfile.mkstemp('.tif', 'clip_', temp_dir())
     os.close(handle)
     os.remove(filename)
 
+    if hasattr(gdal, 'Warp'):
+        _warp_raster(working_layer, filename, extent, cell_size)
+    else:
+        # GDAL < 2.1 has no warp API in its python bindings.
+        _call_gdalwarp(working_layer, filename, extent, cell_size)
+
+    keyword_io = KeywordIO()
+    keyword_io.copy_keywords(layer, filename, extra_keywords=extra_keywords)
+    base_name = '%s clipped' % layer.name()
+    layer = QgsRasterLayer(filename, base_name)
+
+    return layer
+
+
+def _warp_raster(source, filename, extent, cell_size=None):
+    """Clip, resample and reproject a raster in process with GDAL.
+
+    The extent is an axis aligned box in EPSG:4326 so we can pass it as the
+    output bounds directly rather than writing a cutline for it. The data
+    type of the source raster is kept.
+
+    :param source: Path to the raster to clip.
+    :type source: str
+
+    :param filename: Path of the GeoTIFF to create.
+    :type filename: str
+
+    :param extent: Extent in the form [xmin, ymin, xmax, ymax] in EPSG:4326.
+    :type extent: list(float)
+
+    :param cell_size: Cell size of the output in degrees. If None, the
+        native raster cell size will be used.
+    :type cell_size: float
+
+    :raises: CallGDALError - if GDAL could not create the output.
+    """
+    options = {
+        'format': 'GTiff',
+        'dstSRS': 'EPSG:4326',
+        'outputBounds': [float(value) for value in extent[:4]],
+        'resampleAlg': 'near'
+    }
+    if cell_size is not None:
+        options['xRes'] = cell_size
+        options['yRes'] = cell_size
+
+    LOGGER.debug('Warping %s to %s with %s' % (source, filename, options))
+    dataset = gdal.Warp(filename, source, **options)
+    if dataset is None:
+        message = tr(
+            '<p>Error while clipping %s with GDAL.</p><p>Error message: '
+            '%s' % (source, gdal.GetLastErrorMsg()))
+        raise CallGDALError(message)
+    # Closing the dataset flushes it to disk.
+    del dataset
+
+
+def _call_gdalwarp(source, filename, extent, cell_size=None):
+    """Clip, resample and reproject a raster with the gdalwarp binary.
+
+    Like _warp_raster, the data type of the source raster is kept.
+
+    :param source: Path to the raster to clip.
+    :type source: str
+
+    :param filename: Path of the GeoTIFF to create.
+    :type filename: str
+
+    :param extent: Extent in the form [xmin, ymin, xmax, ymax] in EPSG:4326.
+    :type extent: list(float)
+
+    :param cell_size: Cell size of the output in degrees. If None, the
+        native raster cell size will be used.
+    :type cell_size: float
+
+    :raises: CallGDALError - if gdalwarp could not be run.
+    """
+    # We need to provide gdalwarp with a dataset for the clip
+    # because unlike gdal_translate, it does not take projwin.
+    clip_kml = extent_to_kml(extent)
+
     # If no cell size is specified, we need to run gdalwarp without
     # specifying the output pixel size to ensure the raster dims
     # remain consistent.
@@ -496,20 +574,20 @@ def _clip_raster_layer(
     if cell_size is None:
         command = (
             '"%s" -q -t_srs EPSG:4326 -r near -cutline %s -crop_to_cutline '
-            '-ot Float64 -of GTiff "%s" "%s"' % (
+            '-of GTiff "%s" "%s"' % (
                 binary,
                 clip_kml,
-                working_layer,
+                source,
                 filename))
     else:
         command = (
             '"%s" -q -t_srs EPSG:4326 -r near -tr %s %s -cutline %s '
-            '-crop_to_cutline -ot Float64 -of GTiff "%s" "%s"' % (
+            '-crop_to_cutline -of GTiff "%s" "%s"' % (
                 binary,
                 repr(cell_size),
                 repr(cell_size),
                 clip_kml,
-                working_layer,
+                source,
                 filename))
 
     LOGGER.debug(command)
@@ -531,14 +609,6 @@ def _clip_raster_layer(
             '<pre>%s</pre><p>Error message: %s' % (command, message_detail))
         raise CallGDALError(message)
 
-    # .. todo:: Check the result of the shell call is ok
-    keyword_io = KeywordIO()
-    keyword_io.copy_keywords(layer, filename, extra_keywords=extra_keywords)
-    base_name = '%s clipped' % layer.name()
-    layer = QgsRasterLayer(filename, base_name)
-
-    return layer
-
 
 def extent_to_kml(extent):
     """A helper to get a little kml doc for an extent.
@@ -23,7 +23,7 @@ import logging
 # noinspection PyUnresolvedReferences
 import qgis  # pylint: disable=unused-import
 # noinspection PyPackageRequirements
-from PyQt4.QtCore import QCoreApplication, QFile, QUrl, QByteArray
+from PyQt4.QtCore import QEventLoop, QFile, QUrl
 # noinspection PyPackageRequirements
 from PyQt4.QtNetwork import QNetworkRequest, QNetworkReply
 
@@ -32,14 +32,30 @@ from safe.utilities.i18n import tr
 
 LOGGER = logging.getLogger('InaSAFE')
 
+# Errors after which the transfer is retried from the last written byte.
+RESUMABLE_ERRORS = [
+    QNetworkReply.RemoteHostClosedError,
+    QNetworkReply.TimeoutError,
+    QNetworkReply.TemporaryNetworkFailureError,
+    QNetworkReply.NetworkSessionFailedError
+]
+
 
 class FileDownloader(object):
-    """The blueprint for downloading file from url."""
-    def __init__(self, url, output_path, progress_dialog=None):
+    """The blueprint for downloading file from url.
+
+    The reply is written to the output file as it arrives, so memory use does
+    not grow with the size of the download. If the connection drops before
+    the download is complete, the request is sent again with a HTTP Range
+    header to resume from the last byte written.
+    """
+    def __init__(self, url, output_path, progress_dialog=None, max_retries=3):
         """Constructor of the class.
 
         .. versionchanged:: 3.3 removed manager parameter.
 
+        .. versionchanged:: 3.5 added max_retries parameter.
+
         :param url: URL of file.
         :type url: str
 
@@ -49,6 +65,9 @@ class FileDownloader(object):
         :param progress_dialog: Progress dialog widget.
         :type progress_dialog: QWidget
 
+        :param max_retries: How many times an interrupted download is resumed
+            before giving up.
+        :type max_retries: int
         """
         # noinspection PyArgumentList
         self.manager = qgis.core.QgsNetworkAccessManager.instance()
@@ -57,9 +76,13 @@ class FileDownloader(object):
         self.progress_dialog = progress_dialog
         if self.progress_dialog:
             self.prefix_text = self.progress_dialog.labelText()
+        self.max_retries = max_retries
         self.output_file = None
         self.reply = None
-        self.downloaded_file_buffer = None
+        self.event_loop = None
+        self.range_start = 0
+        self.bytes_written = 0
+        self.status_checked = False
         self.finished_flag = False
 
     def download(self):
@@ -74,16 +97,92 @@ class FileDownloader(object):
         self.output_file = QFile(self.output_path)
         if not self.output_file.open(QFile.WriteOnly):
             raise IOError(self.output_file.errorString())
+        self.bytes_written = 0
+
+        self.manager.requestTimedOut.connect(self.request_timeout)
+
+        attempt = 0
+        try:
+            while True:
+                self.request()
+                result = self.reply.error()
+                try:
+                    http_code = int(self.reply.attribute(
+                        QNetworkRequest.HttpStatusCodeAttribute))
+                except TypeError:
+                    # If the user cancels the request, the HTTP response will
+                    # be None.
+                    http_code = None
+
+                error_string = self.reply.errorString()
+                self.reply.abort()
+                self.reply.deleteLater()
+
+                if result in RESUMABLE_ERRORS and attempt < self.max_retries:
+                    attempt += 1
+                    LOGGER.debug(
+                        'Download of %s interrupted after %s bytes, '
+                        'resuming (attempt %s of %s).' % (
+                            self.url.toString(), self.bytes_written,
+                            attempt, self.max_retries))
+                    continue
+                break
+        finally:
+            self.output_file.close()
+            self.manager.requestTimedOut.disconnect(self.request_timeout)
+
+        if result == QNetworkReply.NoError:
+            return True, None
+
+        elif result == QNetworkReply.UnknownNetworkError:
+            return False, tr(
+                'The network is unreachable. Please check your internet '
+                'connection.')
+
+        elif http_code == 408:
+            msg = tr(
+                'Sorry, the server aborted your request. '
+                'Please try a smaller area.')
+            LOGGER.debug(msg)
+            return False, msg
+
+        elif http_code == 509:
+            msg = tr(
+                'Sorry, the server is currently busy with another request. '
+                'Please try again in a few minutes.')
+            LOGGER.debug(msg)
+            return False, msg
+
+        elif result == QNetworkReply.ProtocolUnknownError or \
+                result == QNetworkReply.HostNotFoundError:
+            LOGGER.exception('Host not found : %s' % self.url.encodedHost())
+            return False, tr(
+                'Sorry, the server is unreachable. Please try again later.')
+
+        elif result == QNetworkReply.ContentNotFoundError:
+            LOGGER.exception('Path not found : %s' % self.url.path())
+            return False, tr('Sorry, the layer was not found on the server.')
+
+        else:
+            return result, error_string
 
-        # Prepare downloaded buffer
-        self.downloaded_file_buffer = QByteArray()
+    def request(self):
+        """Send the request and wait until the reply is finished.
 
-        # Request the url
+        If some data has already been written, only the remaining bytes are
+        requested.
+        """
         request = QNetworkRequest(self.url)
+        self.range_start = self.bytes_written
+        if self.range_start:
+            request.setRawHeader('Range', 'bytes=%s-' % self.range_start)
+        self.status_checked = False
+        self.finished_flag = False
+
+        self.event_loop = QEventLoop()
         self.reply = self.manager.get(request)
         self.reply.readyRead.connect(self.get_buffer)
         self.reply.finished.connect(self.write_data)
-        self.manager.requestTimedOut.connect(self.request_timeout)
 
         if self.progress_dialog:
             # progress bar
@@ -96,8 +195,10 @@ class FileDownloader(object):
                 :param total: Total expected data.
                 :type total: int
                 """
-                # noinspection PyArgumentList
-                QCoreApplication.processEvents()
+                # Report progress of the whole file, not just of this range.
+                received += self.range_start
+                if total >= 0:
+                    total += self.range_start
 
                 self.progress_dialog.adjustSize()
 
@@ -120,71 +221,48 @@ class FileDownloader(object):
             self.reply.downloadProgress.connect(progress_event)
             self.progress_dialog.canceled.connect(cancel_action)
 
-        # Wait until finished
+        # Wait until finished.
         # On Windows 32bit AND QGIS 2.2, self.reply.isFinished() always
         # returns False even after finished slot is called. So, that's why we
         # are adding self.finished_flag (see #864)
-        while not self.reply.isFinished() and not self.finished_flag:
-            # noinspection PyArgumentList
-            QCoreApplication.processEvents()
-
-        result = self.reply.error()
-        try:
-            http_code = int(self.reply.attribute(
-                QNetworkRequest.HttpStatusCodeAttribute))
-        except TypeError:
-            # If the user cancels the request, the HTTP response will be None.
-            http_code = None
-
-        self.reply.abort()
-        self.reply.deleteLater()
-
-        if result == QNetworkReply.NoError:
-            return True, None
-
-        elif result == QNetworkReply.UnknownNetworkError:
-            return False, tr(
-                'The network is unreachable. Please check your internet '
-                'connection.')
-
-        elif http_code == 408:
-            msg = tr(
-                'Sorry, the server aborted your request. '
-                'Please try a smaller area.')
-            LOGGER.debug(msg)
-            return False, msg
+        if not self.reply.isFinished() and not self.finished_flag:
+            self.event_loop.exec_()
 
-        elif http_code == 509:
-            msg = tr(
-                'Sorry, the server is currently busy with another request. '
-                'Please try again in a few minutes.')
-            LOGGER.debug(msg)
-            return False, msg
-
-        elif result == QNetworkReply.ProtocolUnknownError or \
-                result == QNetworkReply.HostNotFoundError:
-            LOGGER.exception('Host not found : %s' % self.url.encodedHost())
-            return False, tr(
-                'Sorry, the server is unreachable. Please try again later.')
-
-        elif result == QNetworkReply.ContentNotFoundError:
-            LOGGER.exception('Path not found : %s' % self.url.path())
-            return False, tr('Sorry, the layer was not found on the server.')
-
-        else:
-            return result, self.reply.errorString()
+        if self.progress_dialog:
+            self.progress_dialog.canceled.disconnect(cancel_action)
 
     def get_buffer(self):
-        """Get buffer from self.reply and store it to our buffer container."""
-        buffer_size = self.reply.size()
-        data = self.reply.read(buffer_size)
-        self.downloaded_file_buffer.append(data)
+        """Write the data available in self.reply to the output file."""
+        if not self.status_checked:
+            self.status_checked = True
+            http_code = self.reply.attribute(
+                QNetworkRequest.HttpStatusCodeAttribute)
+            if self.range_start and http_code == 200:
+                # The server ignored our Range header and is sending the
+                # whole file again.
+                LOGGER.debug(
+                    'Server does not support resuming, restarting download.')
+                self.output_file.resize(0)
+                self.output_file.seek(0)
+                self.range_start = 0
+                self.bytes_written = 0
+
+        data = self.reply.readAll()
+        if self.output_file.write(data) != len(data):
+            LOGGER.debug(
+                'Could not write to %s : %s' % (
+                    self.output_path, self.output_file.errorString()))
+            self.reply.abort()
+            return
+        self.bytes_written += len(data)
 
     def write_data(self):
-        """Write data to a file."""
-        self.output_file.write(self.downloaded_file_buffer)
-        self.output_file.close()
+        """Flush the remaining data once the reply is finished."""
+        if self.reply.bytesAvailable():
+            self.get_buffer()
+        self.output_file.flush()
         self.finished_flag = True
+        self.event_loop.quit()
 
     def request_timeout(self):
         """The request timed out."""
@@ -2,10 +2,13 @@
 """Helpers for GIS related functionality."""
 import uuid
 
+import numpy
+
 from qgis.core import (
     QgsMapLayer,
     QgsField,
     QgsFeature,
+    QgsFeatureRequest,
     QgsPoint,
     QgsGeometry,
     QgsSpatialIndex,
@@ -28,9 +31,12 @@ from safe.storage.layer import Layer
 from safe.storage.utilities import bbox_intersection
 from safe.utilities.i18n import tr
 from safe.utilities.utilities import LOGGER
-from safe.common.utilities import get_utm_epsg, unique_filename
+from safe.common.utilities import unique_filename
 from safe.utilities.keyword_io import KeywordIO
 
+# Mean radius of the earth in metres, used to draw circles around points.
+EARTH_RADIUS = 6371008.8
+
 
 def is_raster_layer(layer):
     """Check if a QGIS layer is raster.
@@ -317,7 +323,8 @@ def get_wgs84_resolution(layer):
     return cell_size
 
 
-def create_memory_layer(layer, new_name=''):
+def create_memory_layer(
+        layer, new_name='', attributes=None, extent=None, chunk_size=1000):
     """Return a memory copy of a layer
 
     :param layer: QgsVectorLayer that shall be copied to memory.
@@ -326,6 +333,16 @@ def create_memory_layer(layer, new_name=''):
     :param new_name: The name of the copied layer.
     :type new_name: str
 
+    :param attributes: Names of the attributes to copy, all of them if None.
+    :type attributes: list
+
+    :param extent: Only copy the features whose bounding box intersects
+        this extent, in the CRS of the layer. All features if None.
+    :type extent: QgsRectangle
+
+    :param chunk_size: Number of features added to the memory layer at once.
+    :type chunk_size: int
+
     :returns: An in-memory copy of a layer.
     :rtype: QgsMapLayer
     """
@@ -356,14 +373,40 @@ def create_memory_layer(layer, new_name=''):
     provider = layer.dataProvider()
     vector_fields = provider.fields()
 
-    fields = []
-    for i in vector_fields:
-        fields.append(i)
+    request = QgsFeatureRequest()
+    if attributes is None:
+        indexes = None
+        fields = [field for field in vector_fields]
+    else:
+        indexes = []
+        for name in attributes:
+            index = vector_fields.indexFromName(name)
+            if index < 0:
+                raise MemoryLayerCreationError(
+                    'Layer has no attribute %s' % name)
+            indexes.append(index)
+        fields = [vector_fields[index] for index in indexes]
+        request.setSubsetOfAttributes(indexes)
+    if extent is not None:
+        request.setFilterRect(extent)
 
     memory_provider.addAttributes(fields)
-
-    for ft in provider.getFeatures():
-        memory_provider.addFeatures([ft])
+    memory_layer.updateFields()
+
+    features = []
+    for feature in provider.getFeatures(request):
+        if indexes is not None:
+            values = feature.attributes()
+            subset_feature = QgsFeature()
+            subset_feature.setGeometry(QgsGeometry(feature.geometry()))
+            subset_feature.setAttributes([values[index] for index in indexes])
+            feature = subset_feature
+        features.append(feature)
+        if len(features) >= chunk_size:
+            memory_provider.addFeatures(features)
+            features = []
+    if features:
+        memory_provider.addFeatures(features)
 
     return memory_layer
 
@@ -624,6 +667,55 @@ def union_geometries(geometries):
         return result_geometry
 
 
+def circle_rings(longitudes, latitudes, radii, segments=30):
+    """Compute the rings of circles around points.
+
+    Each circle is drawn in the azimuthal equidistant projection centred on
+    its point, on a spherical earth, so its radius is a true distance
+    wherever the point is. All points and radii are computed at once.
+
+    .. versionadded:: 3.5
+
+    :param longitudes: Longitudes of the points in degrees.
+    :type longitudes: list, numpy.ndarray
+
+    :param latitudes: Latitudes of the points in degrees.
+    :type latitudes: list, numpy.ndarray
+
+    :param radii: Radii of the circles in metres.
+    :type radii: list, numpy.ndarray
+
+    :param segments: Number of segments per quarter circle.
+    :type segments: int
+
+    :returns: Longitudes and latitudes in degrees of the vertices of the
+        rings, with shape (points, radii, 4 * segments + 1). The last vertex
+        of each ring is its first one.
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    longitudes = numpy.radians(
+        numpy.asarray(longitudes, dtype=float))[:, None, None]
+    latitudes = numpy.radians(
+        numpy.asarray(latitudes, dtype=float))[:, None, None]
+    distances = (numpy.asarray(radii, dtype=float) / EARTH_RADIUS)[
+        None, :, None]
+    azimuths = numpy.linspace(0, 2 * numpy.pi, 4 * segments + 1)[
+        None, None, :]
+
+    sin_latitudes = (
+        numpy.sin(latitudes) * numpy.cos(distances) +
+        numpy.cos(latitudes) * numpy.sin(distances) * numpy.cos(azimuths))
+    ring_latitudes = numpy.arcsin(numpy.clip(sin_latitudes, -1, 1))
+    ring_longitudes = longitudes + numpy.arctan2(
+        numpy.sin(azimuths) * numpy.sin(distances) * numpy.cos(latitudes),
+        numpy.cos(distances) - numpy.sin(latitudes) * sin_latitudes)
+
+    # Close the rings exactly
+    ring_longitudes[..., -1] = ring_longitudes[..., 0]
+    ring_latitudes[..., -1] = ring_latitudes[..., 0]
+    return numpy.degrees(ring_longitudes), numpy.degrees(ring_latitudes)
+
+
 def buffer_points(point_layer, radii, hazard_zone_attribute, output_crs):
     """Buffer points for each point with defined radii.
 
@@ -671,38 +763,42 @@ def buffer_points(point_layer, radii, hazard_zone_attribute, output_crs):
         QGis.WKBPolygon,
         output_crs,
         'ESRI Shapefile')
-    input_crs = point_layer.crs()
-
-    center = point_layer.extent().center()
-    utm = None
-    if output_crs.authid() == 'EPSG:4326':
-        utm = QgsCoordinateReferenceSystem(
-            get_utm_epsg(center.x(), center.y(), input_crs))
-        transform = QgsCoordinateTransform(point_layer.crs(), utm)
 
-    else:
-        transform = QgsCoordinateTransform(point_layer.crs(), output_crs)
+    geographic_crs = QgsCoordinateReferenceSystem('EPSG:4326')
+    to_geographic = QgsCoordinateTransform(point_layer.crs(), geographic_crs)
+    from_geographic = None
+    if output_crs.authid() != 'EPSG:4326':
+        from_geographic = QgsCoordinateTransform(geographic_crs, output_crs)
 
+    points = []
+    longitudes = []
+    latitudes = []
     for point in point_layer.getFeatures():
-        geom = point.geometry()
-        geom.transform(transform)
-
-        inner_rings = None
-        for radius in radii:
+        location = to_geographic.transform(point.geometry().asPoint())
+        points.append(point)
+        longitudes.append(location.x())
+        latitudes.append(location.y())
+
+    if points:
+        ring_longitudes, ring_latitudes = circle_rings(
+            longitudes, latitudes, numpy.array(radii) * 1000.0)
+
+    for i, point in enumerate(points):
+        inner_ring = None
+        for j, radius in enumerate(radii):
             attributes = point.attributes()
-            # Generate circle polygon
-
-            circle = geom.buffer(radius * 1000.0, 30)
-
-            if inner_rings:
-                circle.addRing(inner_rings)
-            inner_rings = circle.asPolygon()[0]
+            ring = [
+                QgsPoint(x, y) for x, y in zip(
+                    ring_longitudes[i, j], ring_latitudes[i, j])]
+            if inner_ring is None:
+                circle = QgsGeometry.fromPolygon([ring])
+            else:
+                circle = QgsGeometry.fromPolygon([ring, inner_ring])
+            inner_ring = ring
+            if from_geographic is not None:
+                circle.transform(from_geographic)
 
             new_buffer = QgsFeature()
-
-            if output_crs.authid() == 'EPSG:4326':
-                circle.transform(QgsCoordinateTransform(utm, output_crs))
-
             new_buffer.setGeometry(circle)
             attributes.append(radius)
             new_buffer.setAttributes(attributes)
@@ -711,6 +807,7 @@ def buffer_points(point_layer, radii, hazard_zone_attribute, output_crs):
 
     del writer
     vector_layer = QgsVectorLayer(hazard_file_path, 'Polygons', 'ogr')
+    vector_layer.dataProvider().createSpatialIndex()
 
     keyword_io = KeywordIO()
     try:
@@ -50,6 +50,9 @@ from safe.utilities.metadata import (
 
 LOGGER = logging.getLogger('InaSAFE')
 
+# Definition dicts of safe.definitions by their key, see definition.
+_DEFINITIONS_BY_KEY = {}
+
 
 def definition(keyword):
     """Given a keyword, try to get a definition dict for it.
@@ -72,13 +75,15 @@ def definition(keyword):
         from definitions.py, otherwise None if no match was found.
     :rtype: dict, None
     """
-    for item in dir(safe.definitions):
-        if not item.startswith("__"):
-            var = getattr(safe.definitions, item)
-            if isinstance(var, dict):
-                if var.get('key') == keyword:
-                    return var
-    return None
+    if not _DEFINITIONS_BY_KEY:
+        # Built on first use. When several definitions share a key, the
+        # first one in dir order is kept as the linear scan used to do.
+        for item in dir(safe.definitions):
+            if not item.startswith("__"):
+                var = getattr(safe.definitions, item)
+                if isinstance(var, dict) and 'key' in var:
+                    _DEFINITIONS_BY_KEY.setdefault(var['key'], var)
+    return _DEFINITIONS_BY_KEY.get(keyword)
 
 
 class KeywordIO(QObject):
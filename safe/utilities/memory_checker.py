@@ -37,6 +37,12 @@ KEYWORD_STYLE = styles.KEYWORD_STYLE
 
 LOGGER = logging.getLogger('InaSAFE')
 
+# If a single raster layer takes more than this percentage of the free memory
+# we could run out of memory (depending on the impact function). This is
+# because multiple in memory copies of the layer are often made during
+# processing.
+MEMORY_WARNING_LIMIT = 10
+
 
 def tr(string):
     """We implement this ourselves since we do not inherit QObject.
@@ -125,11 +131,8 @@ def check_memory_usage(buffered_geo_extent, cell_size):
         LOGGER.exception(message)
         return True  # still let the user try to run their analysis
 
-    # We work on the assumption that if more than 10% of the available
-    # memory is occupied by a single layer we could run out of memory
-    # (depending on the impact function). This is because multiple
-    # in memory copies of the layer are often made during processing.
-    warning_limit = 10
+    # See MEMORY_WARNING_LIMIT
+    warning_limit = MEMORY_WARNING_LIMIT
     usage_indicator = (float(requirement) / float(free_memory)) * 100
     counts_message = tr(
         'Memory requirement: about %d mb per raster layer ('
@@ -166,3 +169,46 @@ def check_memory_usage(buffered_geo_extent, cell_size):
     send_dynamic_message(dispatcher.Anonymous, message)
     # LOGGER.info(message.to_text())
     return True
+
+
+def max_cells_in_memory():
+    """Get how many raster cells a layer can have and still fit in memory.
+
+    This is the inverse of the estimate made by check_memory_usage.
+
+    .. versionadded:: 3.5
+
+    :returns: The number of cells.
+    :rtype: int
+
+    :raises: ValueError if the free memory can not be determined.
+    """
+    free_memory = get_free_memory()
+    return int(
+        free_memory * 1024 * 1024 * MEMORY_WARNING_LIMIT / 100 / 8)
+
+
+def tile_windows(columns, rows, max_cells):
+    """Split a raster into strips of rows having at most max_cells cells.
+
+    Strips of whole rows are read efficiently by GDAL. If a single row has
+    more than max_cells cells, each strip is a single row.
+
+    .. versionadded:: 3.5
+
+    :param columns: Number of columns in the raster.
+    :type columns: int
+
+    :param rows: Number of rows in the raster.
+    :type rows: int
+
+    :param max_cells: Maximum number of cells in a strip.
+    :type max_cells: int
+
+    :returns: A list of windows (x_offset, y_offset, columns, rows).
+    :rtype: list
+    """
+    rows_per_tile = max(1, int(max_cells) // max(columns, 1))
+    return [
+        (0, y_offset, columns, min(rows_per_tile, rows - y_offset))
+        for y_offset in range(0, rows, rows_per_tile)]
@@ -19,6 +19,8 @@ __date__ = '03/12/2015'
 __copyright__ = ('Copyright 2012, Australia Indonesia Facility for '
                  'Disaster Reduction')
 import os
+from copy import deepcopy
+
 from safe.common.exceptions import (
     MetadataReadError,
     KeywordNotFoundError,
@@ -34,6 +36,37 @@ from safe.metadata import (
 )
 from safe.definitions import inasafe_keyword_version
 
+# Keywords read from xml files, keyed on the absolute path of the xml file.
+# Each value is a tuple of the (mtime, size) of the file when it was read,
+# the keywords and the provenance (None if the layer is not an impact layer).
+_KEYWORDS_CACHE = {}
+
+
+def _file_signature(path):
+    """Get the modification time and size of a file.
+
+    :param path: Path to the file.
+    :type path: str
+
+    :returns: A tuple (mtime, size).
+    :rtype: tuple
+    """
+    stat = os.stat(path)
+    return stat.st_mtime, stat.st_size
+
+
+def clear_keywords_cache(layer_uri=None):
+    """Forget the keywords read for a layer, or for all layers.
+
+    :param layer_uri: Uri to layer. If None, the whole cache is cleared.
+    :type layer_uri: str
+    """
+    if layer_uri is None:
+        _KEYWORDS_CACHE.clear()
+    else:
+        xml_uri = os.path.abspath(os.path.splitext(layer_uri)[0] + '.xml')
+        _KEYWORDS_CACHE.pop(xml_uri, None)
+
 
 def write_iso19115_metadata(layer_uri, keywords):
     """Create metadata  object from a layer path and keywords dictionary.
@@ -65,6 +98,7 @@ def write_iso19115_metadata(layer_uri, keywords):
 
     if metadata.layer_is_file_based:
         xml_file_path = os.path.splitext(layer_uri)[0] + '.xml'
+        clear_keywords_cache(layer_uri)
         metadata.write_to_file(xml_file_path)
     else:
         metadata.write_to_db()
@@ -74,6 +108,11 @@ def write_iso19115_metadata(layer_uri, keywords):
 
 def read_iso19115_metadata(layer_uri, keyword=None):
     """Retrieve keywords from a metadata object
+
+    Keywords read from an xml file are cached until the size or the
+    modification time of the file changes, or the keywords are written again
+    with write_iso19115_metadata.
+
     :param layer_uri:
     :param keyword:
     :return:
@@ -85,6 +124,49 @@ def read_iso19115_metadata(layer_uri, keyword=None):
         message = 'Layer based file but no xml file.\n'
         message += 'Layer path: %s.' % layer_uri
         raise NoKeywordsFoundError(message)
+
+    if xml_uri:
+        cache_key = os.path.abspath(xml_uri)
+        signature = _file_signature(xml_uri)
+        cached = _KEYWORDS_CACHE.get(cache_key)
+        if cached is not None and cached[0] == signature:
+            keywords, provenance = cached[1:]
+        else:
+            keywords, provenance = _read_iso19115_keywords(layer_uri, xml_uri)
+            _KEYWORDS_CACHE[cache_key] = (signature, keywords, provenance)
+    else:
+        keywords, provenance = _read_iso19115_keywords(layer_uri, xml_uri)
+
+    # Callers may modify what we return, so never hand out the cached
+    # objects themselves.
+    if keyword:
+        try:
+            return deepcopy(keywords[keyword])
+        except KeyError:
+            message = 'Keyword with key %s is not found' % keyword
+            message += 'Layer path: %s' % layer_uri
+            raise KeywordNotFoundError(message)
+
+    keywords = deepcopy(keywords)
+    if provenance is not None:
+        keywords['if_provenance'] = deepcopy(provenance)
+    return keywords
+
+
+def _read_iso19115_keywords(layer_uri, xml_uri):
+    """Parse the keywords of a layer from its metadata.
+
+    :param layer_uri: Uri to layer.
+    :type layer_uri: str
+
+    :param xml_uri: Uri to the xml file, or None if the metadata are in the
+        metadata database.
+    :type xml_uri: str
+
+    :returns: A tuple of the keywords and the provenance (None if the layer
+        is not an impact layer).
+    :rtype: (dict, IFProvenance)
+    """
     metadata = GenericLayerMetadata(layer_uri, xml_uri)
     if metadata.layer_purpose == 'exposure':
         metadata = ExposureLayerMetadata(layer_uri, xml_uri)
@@ -125,14 +207,7 @@ def read_iso19115_metadata(layer_uri, keyword=None):
             if temp_keywords[key] is not None:
                 keywords[key] = temp_keywords[key]
 
-    if keyword:
-        try:
-            return keywords[keyword]
-        except KeyError:
-            message = 'Keyword with key %s is not found' % keyword
-            message += 'Layer path: %s' % layer_uri
-            raise KeywordNotFoundError(message)
-
+    provenance = None
     if isinstance(metadata, ImpactLayerMetadata):
-        keywords['if_provenance'] = metadata.provenance
-    return keywords
+        provenance = metadata.provenance
+    return keywords, provenance
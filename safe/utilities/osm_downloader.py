@@ -21,6 +21,12 @@ import zipfile
 import os
 import logging
 import tempfile
+import shutil
+import math
+import time
+from os.path import expanduser
+
+from osgeo import ogr
 
 from PyQt4.QtNetwork import QNetworkReply
 from PyQt4.QtGui import QDialog
@@ -43,14 +49,33 @@ else:
     URL_OSM_PREFIX = 'http://osm.inasafe.org/'
 URL_OSM_SUFFIX = '-shp'
 
+# Size in degrees of the tiles used to cache OSM downloads. Requested extents
+# are snapped outwards to this grid.
+OSM_TILE_SIZE = 0.05
+# Above this number of tiles we download the extent in one request instead.
+OSM_MAX_CACHED_TILES = 64
+# Number of days after which a cached tile is downloaded again.
+OSM_CACHE_EXPIRY = 7
+# Written in a tile directory once the tile is completely extracted.
+OSM_TILE_MARKER = 'tile.complete'
+# Extensions which belong to the shapefile itself. Any other file in a tile,
+# like the QML style, is copied next to the merged output as is.
+SHAPEFILE_EXTENSIONS = ['.shp', '.shx', '.dbf', '.prj', '.cpg']
+
 LOGGER = logging.getLogger('InaSAFE')
 
 
 def download(feature_type, output_base_path, extent, progress_dialog=None):
     """Download shapefiles from Kartoza server.
 
+    The extent is snapped to a grid of OSM_TILE_SIZE degree tiles which are
+    cached on disk for each feature type. Only missing or expired tiles are
+    downloaded, then the tiles are merged into the output shapefile.
+
     .. versionadded:: 3.2
 
+    .. versionchanged:: 3.5 tiles are cached between downloads.
+
     :param feature_type: What kind of features should be downloaded.
         Currently 'buildings', 'building-points' or 'roads' are supported.
     :type feature_type: str
@@ -67,7 +92,46 @@ def download(feature_type, output_base_path, extent, progress_dialog=None):
 
     :raises: ImportDialogError, CanceledImportDialogError
     """
+    tiles = tiles_for_extent(extent)
+    if len(tiles) > OSM_MAX_CACHED_TILES:
+        LOGGER.debug(
+            'Extent covers %s tiles, downloading without cache.' % len(tiles))
+        path = tempfile.mktemp('.shp.zip')
+
+        # download and extract it
+        fetch_zip(
+            build_url(feature_type, extent),
+            path,
+            feature_type,
+            progress_dialog)
+        extract_zip(path, output_base_path)
+    else:
+        tile_paths = []
+        for tile in tiles:
+            tile_paths.append(
+                fetch_tile(feature_type, tile, progress_dialog))
+        merge_tiles(tile_paths, output_base_path, extent)
+
+    if progress_dialog:
+        progress_dialog.done(QDialog.Accepted)
+
+
+def build_url(feature_type, extent):
+    """Build the URL to download an extent from the Kartoza server.
+
+    .. versionadded:: 3.5
+
+    :param feature_type: What kind of features should be downloaded.
+        Currently 'buildings', 'building-points' or 'roads' are supported.
+    :type feature_type: str
+
+    :param extent: A list in the form [xmin, ymin, xmax, ymax] where all
+    coordinates provided are in Geographic / EPSG:4326.
+    :type extent: list
 
+    :returns: The URL.
+    :rtype: str
+    """
     # preparing necessary data
     min_longitude = extent[0]
     min_latitude = extent[1]
@@ -94,14 +158,203 @@ def download(feature_type, output_base_path, extent, progress_dialog=None):
         env_lang = os.environ['LANG'].split('_')[0]
         url += '&lang=%s' % env_lang
 
-    path = tempfile.mktemp('.shp.zip')
+    return url
 
-    # download and extract it
-    fetch_zip(url, path, feature_type, progress_dialog)
-    extract_zip(path, output_base_path)
 
-    if progress_dialog:
-        progress_dialog.done(QDialog.Accepted)
+def osm_cache_directory():
+    """Get the directory where downloaded OSM tiles are cached.
+
+    .. versionadded:: 3.5
+
+    :returns: The path from the inasafe/osm_cache_directory setting, or
+        ~/.inasafe/osm_cache if it is not set.
+    :rtype: str
+    """
+    settings = QSettings()
+    path = settings.value('inasafe/osm_cache_directory', '', type=str)
+    if not path:
+        path = os.path.join(expanduser('~'), '.inasafe', 'osm_cache')
+    return os.path.abspath(path)
+
+
+def tiles_for_extent(extent):
+    """Snap an extent to the OSM tile grid.
+
+    .. versionadded:: 3.5
+
+    :param extent: A list in the form [xmin, ymin, xmax, ymax] where all
+    coordinates provided are in Geographic / EPSG:4326.
+    :type extent: list
+
+    :returns: The (column, row) indexes of the tiles covering the extent.
+    :rtype: list
+    """
+    min_column = int(math.floor(extent[0] / OSM_TILE_SIZE))
+    min_row = int(math.floor(extent[1] / OSM_TILE_SIZE))
+    # An extent ending exactly on a grid line does not need the next tile.
+    max_column = max(
+        int(math.ceil(extent[2] / OSM_TILE_SIZE)) - 1, min_column)
+    max_row = max(int(math.ceil(extent[3] / OSM_TILE_SIZE)) - 1, min_row)
+    return [
+        (column, row)
+        for row in range(min_row, max_row + 1)
+        for column in range(min_column, max_column + 1)]
+
+
+def tile_extent(tile):
+    """Get the extent of a tile.
+
+    .. versionadded:: 3.5
+
+    :param tile: The (column, row) index of the tile.
+    :type tile: tuple
+
+    :returns: A list in the form [xmin, ymin, xmax, ymax].
+    :rtype: list
+    """
+    column, row = tile
+    return [
+        round(column * OSM_TILE_SIZE, 6),
+        round(row * OSM_TILE_SIZE, 6),
+        round((column + 1) * OSM_TILE_SIZE, 6),
+        round((row + 1) * OSM_TILE_SIZE, 6)]
+
+
+def fetch_tile(feature_type, tile, progress_dialog=None):
+    """Get a tile from the cache, downloading it if missing or expired.
+
+    .. versionadded:: 3.5
+
+    :param feature_type: What kind of features should be downloaded.
+        Currently 'buildings', 'building-points' or 'roads' are supported.
+    :type feature_type: str
+
+    :param tile: The (column, row) index of the tile.
+    :type tile: tuple
+
+    :param progress_dialog: A progress dialog.
+    :type progress_dialog: QProgressDialog
+
+    :returns: The directory holding the tile files.
+    :rtype: str
+
+    :raises: ImportDialogError, CanceledImportDialogError
+    """
+    feature_directory = os.path.join(osm_cache_directory(), feature_type)
+    tile_directory = os.path.join(feature_directory, '%s_%s' % tile)
+    marker = os.path.join(tile_directory, OSM_TILE_MARKER)
+
+    settings = QSettings()
+    expiry = settings.value(
+        'inasafe/osm_cache_expiry', OSM_CACHE_EXPIRY, type=float)
+    if os.path.exists(marker):
+        age = time.time() - os.path.getmtime(marker)
+        if age < expiry * 24 * 3600:
+            LOGGER.debug('Using cached OSM tile %s' % tile_directory)
+            return tile_directory
+
+    if not os.path.exists(feature_directory):
+        os.makedirs(feature_directory)
+
+    # Extract to a temporary directory first so an interrupted download
+    # never leaves a partial tile in the cache.
+    temporary_directory = tempfile.mkdtemp(dir=feature_directory)
+    try:
+        path = os.path.join(temporary_directory, 'tile.shp.zip')
+        fetch_zip(
+            build_url(feature_type, tile_extent(tile)),
+            path,
+            feature_type,
+            progress_dialog)
+        extract_zip(path, os.path.join(temporary_directory, 'tile'))
+        os.remove(path)
+        open(os.path.join(temporary_directory, OSM_TILE_MARKER), 'w').close()
+
+        if os.path.exists(tile_directory):
+            shutil.rmtree(tile_directory)
+        os.rename(temporary_directory, tile_directory)
+    finally:
+        if os.path.exists(temporary_directory):
+            shutil.rmtree(temporary_directory)
+
+    return tile_directory
+
+
+def merge_tiles(tile_directories, output_base_path, extent):
+    """Merge cached tiles into a single shapefile.
+
+    Features crossing tile boundaries are downloaded with every tile they
+    intersect, so they are written once only, using their osm_id. Only
+    features intersecting the extent are kept.
+
+    If none of the tiles has a shapefile, no output is written.
+
+    .. versionadded:: 3.5
+
+    :param tile_directories: Directories of the tiles to merge.
+    :type tile_directories: list
+
+    :param output_base_path: The base path of the output shapefile.
+    :type output_base_path: str
+
+    :param extent: A list in the form [xmin, ymin, xmax, ymax] where all
+    coordinates provided are in Geographic / EPSG:4326.
+    :type extent: list
+    """
+    tile_paths = [
+        os.path.join(directory, 'tile.shp') for directory in tile_directories]
+    tile_paths = [path for path in tile_paths if os.path.exists(path)]
+    if not tile_paths:
+        return
+
+    driver = ogr.GetDriverByName('ESRI Shapefile')
+    output_path = '%s.shp' % output_base_path
+    if os.path.exists(output_path):
+        driver.DeleteDataSource(output_path)
+    output = None
+    output_layer = None
+    seen = set()
+
+    for tile_path in tile_paths:
+        source = ogr.Open(tile_path)
+        layer = source.GetLayer()
+        if output is None:
+            output = driver.CreateDataSource(output_path)
+            output_layer = output.CreateLayer(
+                os.path.basename(output_base_path),
+                layer.GetSpatialRef(),
+                layer.GetGeomType())
+            definition = layer.GetLayerDefn()
+            for index in range(definition.GetFieldCount()):
+                output_layer.CreateField(definition.GetFieldDefn(index))
+            id_index = definition.GetFieldIndex('osm_id')
+
+            # Styles and metadata shipped with the download.
+            directory = os.path.dirname(tile_path)
+            for name in os.listdir(directory):
+                base, extension = os.path.splitext(name)
+                if base == 'tile' and \
+                        extension.lower() not in SHAPEFILE_EXTENSIONS:
+                    shutil.copy(
+                        os.path.join(directory, name),
+                        '%s%s' % (output_base_path, extension))
+
+        layer.SetSpatialFilterRect(*extent)
+        for feature in layer:
+            if id_index >= 0:
+                key = feature.GetField(id_index)
+            else:
+                key = feature.GetGeometryRef().ExportToWkb()
+            if key in seen:
+                continue
+            seen.add(key)
+            output_feature = ogr.Feature(output_layer.GetLayerDefn())
+            output_feature.SetFrom(feature)
+            output_layer.CreateFeature(output_feature)
+        source = None
+
+    output_layer.SyncToDisk()
+    output = None
 
 
 def fetch_zip(url, output_path, feature_type, progress_dialog=None):
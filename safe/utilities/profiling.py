@@ -0,0 +1,194 @@
+# coding=utf-8
+"""
+InaSAFE Disaster risk assessment tool developed by AusAid - **Profiling.**
+
+Lightweight timing and memory instrumentation for the steps of an analysis.
+
+Contact : ole.moller.nielsen@gmail.com
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+import os
+import sys
+import time
+import ctypes
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+LOGGER = logging.getLogger('InaSAFE')
+
+
+def performance_summary(performance):
+    """Format the figures of an analysis as a table for the console or logs.
+
+    :param performance: Figures for each phase as given by
+        :meth:`AnalysisProfile.as_dict`.
+    :type performance: dict
+
+    :returns: A header line and one line per phase.
+    :rtype: str
+    """
+    lines = ['%-20s %10s %10s %14s' % (
+        'Phase', 'Wall (s)', 'CPU (s)', 'Peak RSS (MB)')]
+    for name, figures in performance.iteritems():
+        lines.append('%-20s %10.3f %10.3f %+14.1f' % (
+            name,
+            figures['wall_time'],
+            figures['cpu_time'],
+            figures['peak_memory_delta']))
+    return '\n'.join(lines)
+
+
+class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+    """Process memory counters as returned by GetProcessMemoryInfo."""
+    _fields_ = [
+        ('cb', ctypes.c_ulong),
+        ('PageFaultCount', ctypes.c_ulong),
+        ('PeakWorkingSetSize', ctypes.c_size_t),
+        ('WorkingSetSize', ctypes.c_size_t),
+        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+        ('QuotaPagedPoolUsage', ctypes.c_size_t),
+        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+        ('PagefileUsage', ctypes.c_size_t),
+        ('PeakPagefileUsage', ctypes.c_size_t)
+    ]
+
+
+def get_peak_memory():
+    """Return the peak resident memory of this process so far.
+
+    Currently supported for Windows, Linux and Mac.
+
+    :returns: Peak resident set size in MB, or None if it can not be
+        determined on this platform.
+    :rtype: float, None
+    """
+    try:
+        if 'win32' in sys.platform:
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            ctypes.windll.psapi.GetProcessMemoryInfo(
+                ctypes.windll.kernel32.GetCurrentProcess(),
+                ctypes.byref(counters),
+                counters.cb)
+            return counters.PeakWorkingSetSize / 1024.0 / 1024.0
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except (AttributeError, OSError, ValueError):
+        return None
+    if 'darwin' in sys.platform:
+        # Reported in bytes on Mac, kilobytes elsewhere
+        return peak / 1024.0 / 1024.0
+    return peak / 1024.0
+
+
+def get_cpu_time():
+    """Return the user and system CPU time used by this process so far.
+
+    :returns: CPU time in seconds.
+    :rtype: float
+    """
+    times = os.times()
+    return times[0] + times[1]
+
+
+class AnalysisProfile(object):
+    """Wall time, CPU time and peak memory growth of analysis phases.
+
+    Phases are recorded with the :meth:`phase` context manager and may be
+    nested. The figures of a phase exclude those of the phases nested in
+    it, so they add up to the total of the analysis.
+
+    .. versionadded:: 3.5
+    """
+
+    def __init__(self):
+        """Constructor."""
+        self._phases = OrderedDict()
+        # Stack of the phases currently running. Each item holds the totals
+        # of the phases nested in it so far.
+        self._running = []
+
+    @contextmanager
+    def phase(self, name):
+        """Record the time and memory used by a block of code.
+
+        A phase which runs more than once accumulates its figures.
+
+        :param name: Name of the phase.
+        :type name: str
+        """
+        nested = {'wall_time': 0.0, 'cpu_time': 0.0, 'peak_memory': 0.0}
+        self._running.append(nested)
+        start_wall = time.time()
+        start_cpu = get_cpu_time()
+        start_memory = get_peak_memory()
+        try:
+            yield
+        finally:
+            self._running.pop()
+            totals = {
+                'wall_time': time.time() - start_wall,
+                'cpu_time': get_cpu_time() - start_cpu,
+                'peak_memory': 0.0
+            }
+            end_memory = get_peak_memory()
+            if start_memory is not None and end_memory is not None:
+                totals['peak_memory'] = end_memory - start_memory
+
+            if self._running:
+                parent = self._running[-1]
+                for key, value in totals.iteritems():
+                    parent[key] += value
+
+            figures = self._phases.setdefault(name, OrderedDict([
+                ('wall_time', 0.0),
+                ('cpu_time', 0.0),
+                ('peak_memory_delta', 0.0)]))
+            figures['wall_time'] += totals['wall_time'] - nested['wall_time']
+            figures['cpu_time'] += totals['cpu_time'] - nested['cpu_time']
+            figures['peak_memory_delta'] += (
+                totals['peak_memory'] - nested['peak_memory'])
+            LOGGER.debug(
+                'Phase %s took %.3fs wall time, %.3fs CPU time.' % (
+                    name, totals['wall_time'], totals['cpu_time']))
+
+    @property
+    def phases(self):
+        """The figures recorded for each phase, in the order they ran.
+
+        Times are in seconds and the peak memory delta, the growth of the
+        peak resident memory of the process, is in MB.
+
+        :rtype: OrderedDict
+        """
+        return self._phases
+
+    def as_dict(self):
+        """Get the recorded figures as plain types, e.g. for json.
+
+        :returns: Figures for each phase rounded to milliseconds and to
+            tenths of a MB.
+        :rtype: OrderedDict
+        """
+        result = OrderedDict()
+        for name, figures in self._phases.iteritems():
+            result[name] = OrderedDict([
+                ('wall_time', round(figures['wall_time'], 3)),
+                ('cpu_time', round(figures['cpu_time'], 3)),
+                ('peak_memory_delta',
+                 round(figures['peak_memory_delta'], 1))])
+        return result
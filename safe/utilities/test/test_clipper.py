@@ -24,6 +24,7 @@ import os
 import shutil
 from unittest import expectedFailure
 import numpy
+from osgeo import gdal
 
 from qgis.core import (
     QgsVectorLayer,
@@ -133,6 +134,28 @@ class ClipperTest(unittest.TestCase):
             'Actual: %5f' % (size, new_raster_layer.rasterUnitsPerPixelX()))
         assert new_raster_layer.rasterUnitsPerPixelX() == size, message
 
+    def test_clip_raster_extent_and_type(self):
+        """Clipped rasters match the clip extent and keep their data type."""
+        raster_path = test_data_path(
+            'exposure', 'pop_binary_raster_20_20.asc')
+        raster_layer = QgsRasterLayer(raster_path, 'population')
+        bounding_box = [106.8095, -6.1915, 106.8215, -6.1675]
+
+        result = clip_layer(raster_layer, bounding_box)
+
+        dataset = gdal.Open(result.source())
+        source_dataset = gdal.Open(raster_path)
+        self.assertEqual(
+            dataset.GetRasterBand(1).DataType,
+            source_dataset.GetRasterBand(1).DataType)
+        origin_x, cell_x, _, origin_y, _, cell_y = dataset.GetGeoTransform()
+        self.assertAlmostEqual(origin_x, bounding_box[0])
+        self.assertAlmostEqual(origin_y, bounding_box[3])
+        self.assertAlmostEqual(
+            origin_x + dataset.RasterXSize * cell_x, bounding_box[2])
+        self.assertAlmostEqual(
+            origin_y + dataset.RasterYSize * cell_y, bounding_box[1])
+
     def test_clip_raster_with_no_extension(self):
         """Test we can clip a raster with no extension - see #659."""
         # Create a raster layer
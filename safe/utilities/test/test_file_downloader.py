@@ -1,6 +1,6 @@
 # coding=utf-8
 """
-Test for Save Scenario Dialog.
+Test for File Downloader.
 
 Contact : ole.moller.nielsen@gmail.com
 
@@ -18,6 +18,8 @@ __copyright__ = ('Copyright 2012, Australia Indonesia Facility for '
 
 import unittest
 import tempfile
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
 
 # AG: Although we don't use qgis here, qgis should be imported before PyQt to
 #  force this test to use SIP API V.2
@@ -30,6 +32,44 @@ from safe.test.utilities import assert_hash_for_file, get_qgis_app
 
 QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
 
+# Payload served by the stub server.
+PAYLOAD = ''.join(chr(i % 256) for i in range(256 * 1024))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serve PAYLOAD, honouring Range headers.
+
+    If the server's drop_first flag is set, the first response is cut off
+    halfway through to simulate an interrupted transfer.
+    """
+
+    def do_GET(self):
+        """Handle a GET request."""
+        self.server.ranges.append(self.headers.get('Range'))
+        start = 0
+        if self.headers.get('Range') and self.server.support_range:
+            start = int(self.headers['Range'].split('=')[1].split('-')[0])
+            self.send_response(206)
+            self.send_header(
+                'Content-Range',
+                'bytes %s-%s/%s' % (start, len(PAYLOAD) - 1, len(PAYLOAD)))
+        else:
+            self.send_response(200)
+        body = PAYLOAD[start:]
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.server.drop_first:
+            self.server.drop_first = False
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.connection.shutdown(2)
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Keep the test output quiet."""
+        pass
+
 
 class FileDownloaderTest(unittest.TestCase):
     """Test FileDownloader class."""
@@ -59,3 +99,52 @@ class FileDownloaderTest(unittest.TestCase):
             raise DownloadError(error_message)
 
         assert_hash_for_file(unique_hash, path)
+
+    def start_server(self, drop_first=False, support_range=True):
+        """Start a stub HTTP server on a free port.
+
+        :returns: The URL of the payload.
+        :rtype: str
+        """
+        server = HTTPServer(('127.0.0.1', 0), StubHandler)
+        server.drop_first = drop_first
+        server.support_range = support_range
+        server.ranges = []
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.shutdown)
+        self.server = server
+        return 'http://127.0.0.1:%s/payload' % server.server_port
+
+    def test_download_streamed(self):
+        """Test the reply is written to disk."""
+        url = self.start_server()
+        path = tempfile.mktemp()
+        result = FileDownloader(url, path).download()
+        self.assertEqual(result, (True, None))
+        with open(path, 'rb') as downloaded:
+            self.assertEqual(downloaded.read(), PAYLOAD)
+        self.assertEqual(self.server.ranges, [None])
+
+    def test_download_resumed(self):
+        """Test an interrupted download is resumed with a range request."""
+        url = self.start_server(drop_first=True)
+        path = tempfile.mktemp()
+        result = FileDownloader(url, path).download()
+        self.assertEqual(result, (True, None))
+        with open(path, 'rb') as downloaded:
+            self.assertEqual(downloaded.read(), PAYLOAD)
+        self.assertEqual(len(self.server.ranges), 2)
+        self.assertIsNone(self.server.ranges[0])
+        self.assertEqual(
+            self.server.ranges[1], 'bytes=%s-' % (len(PAYLOAD) // 2))
+
+    def test_download_resume_not_supported(self):
+        """Test the download restarts if the server ignores the range."""
+        url = self.start_server(drop_first=True, support_range=False)
+        path = tempfile.mktemp()
+        result = FileDownloader(url, path).download()
+        self.assertEqual(result, (True, None))
+        with open(path, 'rb') as downloaded:
+            self.assertEqual(downloaded.read(), PAYLOAD)
@@ -13,6 +13,9 @@ from safe.utilities.gis import (
     layer_attribute_names,
     is_polygon_layer,
     buffer_points,
+    circle_rings,
+    create_memory_layer,
+    EARTH_RADIUS,
     validate_geo_array)
 from safe.common.exceptions import RadiiException
 from safe.test.utilities import (
@@ -106,6 +109,37 @@ class TestQGIS(unittest.TestCase):
         message = ('%s raster layer should not be polygonal' % layer)
         self.assertFalse(is_polygon_layer(layer), message)
 
+    def test_create_memory_layer(self):
+        """Test copying a layer to memory with a subset of its data."""
+        layer = clone_shp_layer(
+            name='district_osm_jakarta',
+            include_keywords=True,
+            source_directory=test_data_path('boundaries'))
+
+        memory_layer = create_memory_layer(layer, chunk_size=2)
+        self.assertEqual(memory_layer.featureCount(), layer.featureCount())
+        self.assertEqual(
+            [field.name() for field in memory_layer.dataProvider().fields()],
+            [field.name() for field in layer.dataProvider().fields()])
+
+        memory_layer = create_memory_layer(layer, attributes=['TEST_INT'])
+        self.assertEqual(
+            [field.name() for field in memory_layer.dataProvider().fields()],
+            ['TEST_INT'])
+        expected = [
+            feature['TEST_INT'] for feature in layer.getFeatures()]
+        self.assertEqual(
+            [feature['TEST_INT'] for feature in memory_layer.getFeatures()],
+            expected)
+
+        # Only the features around the first one
+        feature = layer.getFeatures().next()
+        extent = feature.geometry().boundingBox()
+        memory_layer = create_memory_layer(layer, extent=extent)
+        self.assertGreater(memory_layer.featureCount(), 0)
+        self.assertLessEqual(
+            memory_layer.featureCount(), layer.featureCount())
+
     def test_validate_geo_array(self):
         """Test validate geographic extent method.
 
@@ -294,6 +328,51 @@ class TestQGIS(unittest.TestCase):
             message = 'Wrong input data should have raised an exception'
             raise Exception(message)
 
+    def assert_similar_buffers(self, control_layer, test_layer):
+        """Check buffers match those of a control layer within 5% of area.
+
+        :param control_layer: The control layer.
+        :type control_layer: QgsVectorLayer
+
+        :param test_layer: The layer being checked.
+        :type test_layer: QgsVectorLayer
+        """
+        self.assertEqual(
+            test_layer.crs().authid(), control_layer.crs().authid())
+        self.assertEqual(
+            test_layer.featureCount(), control_layer.featureCount())
+        for feature in test_layer.getFeatures():
+            for expected in control_layer.getFeatures():
+                if feature.attributes() == expected.attributes():
+                    break
+            else:
+                self.fail('A feature could not be found in the control layer.')
+            difference = feature.geometry().symDifference(expected.geometry())
+            self.assertLess(
+                difference.area(), 0.05 * expected.geometry().area())
+
+    def test_circle_rings(self):
+        """Test circles are at the right distance wherever they are."""
+        longitudes = [110.4, -60.0, 179.9]
+        latitudes = [-7.5, 70.0, 0.1]
+        radii = [3000, 5000, 10000]
+        ring_longitudes, ring_latitudes = circle_rings(
+            longitudes, latitudes, radii)
+        self.assertEqual(ring_longitudes.shape, (3, 3, 121))
+
+        # Haversine distance of the vertices to their centre
+        centre_longitudes = numpy.radians(longitudes)[:, None, None]
+        centre_latitudes = numpy.radians(latitudes)[:, None, None]
+        ring_longitudes = numpy.radians(ring_longitudes)
+        ring_latitudes = numpy.radians(ring_latitudes)
+        haversine = (
+            numpy.sin((ring_latitudes - centre_latitudes) / 2) ** 2 +
+            numpy.cos(ring_latitudes) * numpy.cos(centre_latitudes) *
+            numpy.sin((ring_longitudes - centre_longitudes) / 2) ** 2)
+        distances = 2 * EARTH_RADIUS * numpy.arcsin(numpy.sqrt(haversine))
+        expected = numpy.array(radii, dtype=float)[None, :, None]
+        self.assertTrue(numpy.allclose(distances, expected))
+
     def test_buffer_points(self):
         """Test if we can make buffers correctly, whatever the projection."""
         # Original data in 3857.
@@ -316,21 +395,21 @@ class TestQGIS(unittest.TestCase):
         is_equal, msg = compare_two_vector_layers(control_layer, result)
         self.assertFalse(is_equal, msg)
 
+        # The buffers are drawn around each point rather than in a single
+        # UTM zone, so they are close to the control ones, not identical.
         # Expected result in 4326.
         output_crs = qgis.core.QgsCoordinateReferenceSystem('EPSG:4326')
         result = buffer_points(layer, radii, 'test', output_crs)
         data_path = test_data_path('other', 'buffer_points_expected_4326.shp')
         control_layer, _ = load_layer(data_path)
-        is_equal, msg = compare_two_vector_layers(control_layer, result)
-        self.assertTrue(is_equal, msg)
+        self.assert_similar_buffers(control_layer, result)
 
         # Expected result in 3857.
         output_crs = qgis.core.QgsCoordinateReferenceSystem('EPSG:3857')
         result = buffer_points(layer, radii, 'test', output_crs)
         data_path = test_data_path('other', 'buffer_points_expected_3857.shp')
         control_layer, _ = load_layer(data_path)
-        is_equal, msg = compare_two_vector_layers(control_layer, result)
-        self.assertTrue(is_equal, msg)
+        self.assert_similar_buffers(control_layer, result)
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,8 @@
+import os
 import unittest
 
 from safe.test.utilities import test_data_path, clone_shp_layer
+from safe.utilities import metadata as metadata_utilities
 from safe.utilities.metadata import (
     write_iso19115_metadata,
     read_iso19115_metadata
@@ -83,5 +85,53 @@ class TestMetadataUtilities(unittest.TestCase):
             source_directory=test_data_path('exposure'))
         write_iso19115_metadata(layer.source(), keywords)
 
+    def test_read_iso19115_metadata_cached(self):
+        """Test keywords are cached until the xml file changes."""
+        layer = clone_shp_layer(
+            name='buildings',
+            include_keywords=False,
+            source_directory=test_data_path('exposure'))
+        keywords = {
+            'exposure': 'structure',
+            'keyword_version': inasafe_keyword_version,
+            'layer_geometry': 'polygon',
+            'layer_mode': 'classified',
+            'layer_purpose': 'exposure',
+            'title': 'Buildings'
+        }
+        source = layer.source()
+        write_iso19115_metadata(source, keywords)
+        parse = metadata_utilities._read_iso19115_keywords
+        calls = []
+
+        def counting_parse(*args):
+            calls.append(args)
+            return parse(*args)
+
+        metadata_utilities._read_iso19115_keywords = counting_parse
+        try:
+            read_keywords = read_iso19115_metadata(source)
+            self.assertEqual(read_keywords['title'], 'Buildings')
+            # Modifying what we got back does not change the cache.
+            read_keywords['title'] = 'Changed'
+            self.assertEqual(
+                read_iso19115_metadata(source, 'title'), 'Buildings')
+            self.assertEqual(len(calls), 1)
+
+            # Writing keywords invalidates the cache.
+            keywords['title'] = 'Houses'
+            write_iso19115_metadata(source, keywords)
+            self.assertEqual(
+                read_iso19115_metadata(source, 'title'), 'Houses')
+            self.assertEqual(len(calls), 2)
+
+            # So does changing the file behind our back.
+            xml_path = os.path.splitext(source)[0] + '.xml'
+            os.utime(xml_path, (0, 0))
+            read_iso19115_metadata(source)
+            self.assertEqual(len(calls), 3)
+        finally:
+            metadata_utilities._read_iso19115_keywords = parse
+
 if __name__ == '__main__':
     unittest.main()
@@ -25,11 +25,19 @@ import unittest
 import tempfile
 import shutil
 import os
-
-from PyQt4.QtCore import QObject, pyqtSignal, QVariant, QByteArray, QUrl
+import threading
+import zipfile
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from urlparse import urlparse, parse_qs
+
+from osgeo import ogr, osr
+from PyQt4.QtCore import (
+    QObject, pyqtSignal, QVariant, QByteArray, QUrl, QSettings)
 from PyQt4.QtNetwork import QNetworkReply
 
-from safe.utilities.osm_downloader import fetch_zip, extract_zip
+from safe.utilities import osm_downloader
+from safe.utilities.osm_downloader import (
+    fetch_zip, extract_zip, download, tiles_for_extent)
 from safe.test.utilities import test_data_path, get_qgis_app
 from safe.common.version import get_version
 from safe.utilities.gis import qgis_version
@@ -177,6 +185,87 @@ def read_all(path):
     return content
 
 
+# Roads served by the fake tile server as (osm_id, start, end).
+FAKE_ROADS = [
+    (1, (106.81, -6.21), (106.82, -6.21)),
+    # Crosses the boundary between two tiles.
+    (2, (106.84, -6.22), (106.86, -6.22)),
+    (3, (106.87, -6.23), (106.88, -6.23)),
+    (4, (106.81, -6.17), (106.82, -6.17))
+]
+
+
+def fake_roads_zip(bbox):
+    """Build a zipped shapefile of the fake roads intersecting a bbox.
+
+    :param bbox: A list in the form [xmin, ymin, xmax, ymax].
+    :type bbox: list
+
+    :returns: The content of the zip file.
+    :rtype: str
+    """
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'roads.shp')
+    spatial_reference = osr.SpatialReference()
+    spatial_reference.ImportFromEPSG(4326)
+    data_source = ogr.GetDriverByName('ESRI Shapefile').CreateDataSource(path)
+    layer = data_source.CreateLayer(
+        'roads', spatial_reference, ogr.wkbLineString)
+    layer.CreateField(ogr.FieldDefn('osm_id', ogr.OFTInteger))
+
+    ring = ogr.Geometry(ogr.wkbLinearRing)
+    for x, y in [(bbox[0], bbox[1]), (bbox[2], bbox[1]), (bbox[2], bbox[3]),
+                 (bbox[0], bbox[3]), (bbox[0], bbox[1])]:
+        ring.AddPoint_2D(x, y)
+    box = ogr.Geometry(ogr.wkbPolygon)
+    box.AddGeometry(ring)
+
+    for osm_id, start, end in FAKE_ROADS:
+        line = ogr.Geometry(ogr.wkbLineString)
+        line.AddPoint_2D(*start)
+        line.AddPoint_2D(*end)
+        if not line.Intersects(box):
+            continue
+        feature = ogr.Feature(layer.GetLayerDefn())
+        feature.SetField('osm_id', osm_id)
+        feature.SetGeometry(line)
+        layer.CreateFeature(feature)
+    data_source = None
+
+    with open(os.path.join(directory, 'roads.qml'), 'w') as style:
+        style.write('<qgis/>')
+
+    zip_path = os.path.join(directory, 'roads.zip')
+    with zipfile.ZipFile(zip_path, 'w') as zip_file:
+        for extension in ['.shp', '.shx', '.dbf', '.prj', '.qml']:
+            zip_file.write(
+                os.path.join(directory, 'roads' + extension),
+                'roads' + extension)
+    with open(zip_path, 'rb') as zip_file:
+        content = zip_file.read()
+    shutil.rmtree(directory)
+    return content
+
+
+class FakeTileServerHandler(BaseHTTPRequestHandler):
+    """Serve FAKE_ROADS for the bbox of each request."""
+
+    def do_GET(self):
+        """Handle a GET request."""
+        query = parse_qs(urlparse(self.path).query)
+        bbox = [float(value) for value in query['bbox'][0].split(',')]
+        self.server.requests.append(bbox)
+        content = fake_roads_zip(bbox)
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        """Keep the test output quiet."""
+        pass
+
+
 class OsmDownloaderTest(unittest.TestCase):
     """Test the OSM Downloader.
 
@@ -230,6 +319,69 @@ class OsmDownloaderTest(unittest.TestCase):
         # remove temporary folder and all of its content
         shutil.rmtree(base_path)
 
+    def test_tiles_for_extent(self):
+        """Test extents are snapped to the tile grid.
+
+        .. versionadded:: 3.5
+        """
+        self.assertEqual(
+            tiles_for_extent([106.805, -6.245, 106.845, -6.205]),
+            [(2136, -125)])
+        self.assertEqual(
+            tiles_for_extent([106.805, -6.245, 106.895, -6.195]),
+            [(2136, -125), (2137, -125), (2136, -124), (2137, -124)])
+
+    def test_download_cached_tiles(self):
+        """Test only missing tiles are downloaded and then merged.
+
+        .. versionadded:: 3.5
+        """
+        server = HTTPServer(('127.0.0.1', 0), FakeTileServerHandler)
+        server.requests = []
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.shutdown)
+
+        prefix = osm_downloader.URL_OSM_PREFIX
+        osm_downloader.URL_OSM_PREFIX = 'http://127.0.0.1:%s/' % (
+            server.server_port)
+        self.addCleanup(setattr, osm_downloader, 'URL_OSM_PREFIX', prefix)
+
+        settings = QSettings()
+        cache_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_directory)
+        settings.setValue('inasafe/osm_cache_directory', cache_directory)
+        self.addCleanup(settings.remove, 'inasafe/osm_cache_directory')
+        self.addCleanup(settings.remove, 'inasafe/osm_cache_expiry')
+        output_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_directory)
+
+        def osm_ids(base_path):
+            """Get the sorted osm_id of the features in a shapefile."""
+            layer = ogr.Open('%s.shp' % base_path).GetLayer()
+            return sorted(feature.GetField('osm_id') for feature in layer)
+
+        first_path = os.path.join(output_directory, 'first')
+        download('roads', first_path, [106.805, -6.245, 106.845, -6.205])
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(osm_ids(first_path), [1, 2])
+        self.assertTrue(os.path.exists('%s.qml' % first_path))
+
+        # Only the tile on the east is missing.
+        second_path = os.path.join(output_directory, 'second')
+        download('roads', second_path, [106.805, -6.245, 106.895, -6.205])
+        self.assertEqual(len(server.requests), 2)
+        self.assertAlmostEqual(server.requests[1][0], 106.85)
+        self.assertEqual(osm_ids(second_path), [1, 2, 3])
+
+        # Expired tiles are downloaded again.
+        settings.setValue('inasafe/osm_cache_expiry', 0)
+        third_path = os.path.join(output_directory, 'third')
+        download('roads', third_path, [106.805, -6.245, 106.845, -6.205])
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(osm_ids(third_path), [1, 2])
+
     def test_load_shapefile(self):
         """Test loading shape file to QGIS Main Window.
 
@@ -0,0 +1,57 @@
+# coding=utf-8
+"""Unit tests for the profiling module."""
+
+import time
+import unittest
+
+from safe.utilities.profiling import (
+    AnalysisProfile,
+    get_peak_memory,
+    performance_summary)
+
+
+class TestProfiling(unittest.TestCase):
+    """Tests for the analysis profile."""
+
+    def test_peak_memory(self):
+        """Test the peak memory grows with allocations."""
+        before = get_peak_memory()
+        self.assertGreater(before, 0)
+        data = ' ' * (64 * 1024 * 1024)
+        self.assertGreaterEqual(get_peak_memory() - before, 0)
+        del data
+
+    def test_phases(self):
+        """Test nested phases are excluded from their parent."""
+        profile = AnalysisProfile()
+        with profile.phase('outer'):
+            time.sleep(0.05)
+            with profile.phase('inner'):
+                time.sleep(0.1)
+        with profile.phase('inner'):
+            time.sleep(0.1)
+
+        performance = profile.as_dict()
+        self.assertEqual(performance.keys(), ['inner', 'outer'])
+        self.assertAlmostEqual(
+            performance['outer']['wall_time'], 0.05, delta=0.04)
+        self.assertAlmostEqual(
+            performance['inner']['wall_time'], 0.2, delta=0.08)
+        # Sleeping does not use the CPU
+        self.assertLess(performance['inner']['cpu_time'], 0.1)
+
+        summary = performance_summary(performance).splitlines()
+        self.assertEqual(len(summary), 3)
+        self.assertTrue(summary[1].startswith('inner'))
+
+    def test_phase_exception(self):
+        """Test a phase is recorded when its block raises."""
+        profile = AnalysisProfile()
+        with self.assertRaises(ValueError):
+            with profile.phase('failing'):
+                raise ValueError
+        self.assertIn('failing', profile.phases)
+
+
+if __name__ == '__main__':
+    unittest.main()